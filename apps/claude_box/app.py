@@ -1,14 +1,21 @@
 import logging
+import os
 
 from h2o_wave import Q, main, app, copy_expando, handle_on, on
-from llmbox.llms import ClaudeInstant1, Claude2
+from llmbox.llms.models import model_registry
 from llmbox.chat import Chat, Message, Role
+from llmbox.chat.intern import text_pool
+from llmbox.tracing import JSONLExporter, tracer
 
 import cards
 
 # Set up logging
 logging.basicConfig(format='%(levelname)s:\t[%(asctime)s]\t%(message)s', level=logging.INFO)
 
+# Set up tracing if a file for the traces is set
+if os.environ.get('LLMBOX_TRACES'):
+    tracer.add_exporter(JSONLExporter(path=os.environ['LLMBOX_TRACES']))
+
 
 @app('/')
 async def serve(q: Q):
@@ -16,33 +23,35 @@ async def serve(q: Q):
     Main serving function.
     """
 
-    try:
-        # Initialize the app if not already
-        if not q.app.initialized:
-            await initialize_app(q)
+    # Trace each query, from its handler to the updated page
+    with tracer.span('app.serve'):
+        try:
+            # Initialize the app if not already
+            if not q.app.initialized:
+                await initialize_app(q)
 
-        # Initialize the client if not already
-        if not q.client.initialized:
-            await initialize_client(q)
+            # Initialize the client if not already
+            if not q.client.initialized:
+                await initialize_client(q)
 
-        # Update theme if toggled
-        if q.args.theme_dark is not None and q.args.theme_dark != q.client.theme_dark:
-            await update_theme(q)
+            # Update theme if toggled
+            if q.args.theme_dark is not None and q.args.theme_dark != q.client.theme_dark:
+                await update_theme(q)
 
-        # Switch settings tab if clicked
-        elif q.args.settings_tab:
-            await settings(q)
+            # Switch settings tab if clicked
+            elif q.args.settings_tab:
+                await settings(q)
 
-        # Delegate query to query handlers
-        elif await handle_on(q):
-            pass
+            # Delegate query to query handlers
+            elif await handle_on(q):
+                pass
 
-        # Handle fallback
-        else:
-            await handle_fallback(q)
+            # Handle fallback
+            else:
+                await handle_fallback(q)
 
-    except Exception as error:
-        await display_error(q, error=str(error))
+        except Exception as error:
+            await display_error(q, error=str(error))
 
 
 async def initialize_app(q: Q):
@@ -76,7 +85,7 @@ async def initialize_client(q: Q):
 
     # Initialize llm data
     q.client.api_key = None
-    q.client.chat = Chat()
+    q.client.chat = Chat(pool=text_pool)
 
     # Add layouts and header
     q.page['meta'] = cards.meta
@@ -88,7 +97,7 @@ async def initialize_client(q: Q):
 
     # Check API
     try:
-        q.client.llm = Claude2(api_key=q.client.api_key)
+        q.client.llm = model_registry.get(q.client.model, api_key=q.client.api_key)
     except ValueError:
         q.page['meta'].dialog = cards.dialog_api
 
@@ -113,10 +122,7 @@ async def save_api(q: Q):
         q.client.api_key = q.args.api_key
 
         # Initialize LLM
-        if q.client.model == 'claude-instant-1':
-            q.client.llm = ClaudeInstant1(api_key=q.client.api_key)
-        else:
-            q.client.llm = Claude2(api_key=q.client.api_key)
+        q.client.llm = model_registry.get(q.client.model, api_key=q.client.api_key)
 
         # Remove dialog
         q.page['meta'].dialog = None
@@ -156,25 +162,27 @@ async def chat(q: Q):
 
     logging.info('Generating chat response from LLM')
 
-    # Add message to chat
-    q.client.chat.add_message(message=Message(text=q.args.chat, role=Role.User))
+    with tracer.span('app.chat', {'llm.model': q.client.model, 'chat.messages': len(q.client.chat.messages)}):
+        # Add message to chat
+        q.client.chat.add_message(message=Message(text=q.args.chat, role=Role.User))
 
-    # Generate LLM response
-    llm_response = q.client.llm.generate(
-        chat=q.client.chat,
-        max_tokens=q.client.max_tokens,
-        temperature=q.client.temperature,
-        top_p=q.client.top_p,
-        top_k=q.client.top_k
-    )
+        # Generate LLM response
+        llm_response = q.client.llm.generate(
+            chat=q.client.chat,
+            max_tokens=q.client.max_tokens,
+            temperature=q.client.temperature,
+            top_p=q.client.top_p,
+            top_k=q.client.top_k
+        )
 
-    # Add response to chat
-    q.client.chat.add_message(message=Message(text=llm_response, role=Role.Assistant))
+        # Add response to chat
+        q.client.chat.add_message(message=Message(text=llm_response, role=Role.Assistant))
 
-    # Update chat
-    q.page['chatbox'] = cards.chatbox(chat=q.client.chat)
+        # Update chat
+        with tracer.span('app.update'):
+            q.page['chatbox'] = cards.chatbox(chat=q.client.chat)
 
-    await q.page.save()
+            await q.page.save()
 
 
 @on('settings')
@@ -222,19 +230,13 @@ async def update_settings(q: Q):
         q.client.api_key = q.args.new_api_key
 
         # Initialize LLM
-        if q.client.model == 'claude-instant-1':
-            q.client.llm = ClaudeInstant1(api_key=q.client.api_key)
-        else:
-            q.client.llm = Claude2(api_key=q.client.api_key)
+        q.client.llm = model_registry.get(q.client.model, api_key=q.client.api_key)
     elif q.args.model:
         # Save new model
         q.client.model = q.args.model
 
         # Initialize LLM
-        if q.client.model == 'claude-instant-1':
-            q.client.llm = ClaudeInstant1(api_key=q.client.api_key)
-        else:
-            q.client.llm = Claude2(api_key=q.client.api_key)
+        q.client.llm = model_registry.get(q.client.model, api_key=q.client.api_key)
     else:
         # Copy settings to client if API key is not inputted
         copy_expando(q.args, q.client)
@@ -262,7 +264,7 @@ async def restart(q: Q):
     logging.info('Restarting chat')
 
     # Reset chat
-    q.client.chat = Chat()
+    q.client.chat = Chat(pool=text_pool)
 
     # Update chat
     q.page['chatbox'] = cards.chatbox(chat=q.client.chat)
@@ -0,0 +1,80 @@
+"""
+Benchmark of the memory a chat takes per message, text included.
+
+The baseline is measured alongside, a list of messages keeping their attributes in a dictionary as chats did before.
+Results with 100k messages on CPython 3.11, in bytes per message:
+
+    ==================================  =======
+    Text only                              33.9
+    Baseline, messages with dicts         178.9
+    Chat, slotted message objects         146.9
+    ColumnarChat                           45.3
+    ==================================  =======
+
+Usage:
+
+    python benchmarks/chat_memory.py --messages 100000
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+# Import llmbox from the repository when it is not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llmbox.chat import Chat, ColumnarChat, Message, Role
+
+
+class _BaselineMessage:
+    # Message with attributes in a dictionary, as messages were before they were slotted
+
+    def __init__(self, text: str, role: Role):
+        self.text = text
+        self.role = role
+
+
+class _BaselineChat:
+    # Chat keeping its messages in a list, as chats were before they cached renderings
+
+    def __init__(self):
+        self._messages = []
+
+    def add_message(self, message: _BaselineMessage) -> None:
+        self._messages.append(message)
+
+
+def measure(chat_class: type, message_class: type, messages: int) -> float:
+    tracemalloc.start()
+
+    chat = chat_class()
+    for i in range(messages):
+        role = Role.User if i % 2 == 0 else Role.Assistant
+        chat.add_message(message_class(text=f'Message {i} of the conversation.', role=role))
+
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return memory / messages
+
+
+def run(messages: int) -> None:
+    text = sum(len(f'Message {i} of the conversation.'.encode()) for i in range(messages)) / messages
+
+    baseline = measure(_BaselineChat, _BaselineMessage, messages)
+
+    print(f'{"chat":>14} {"bytes per message":>18} {"of baseline":>12}')
+    print(f'{"text only":>14} {text:>18.1f}')
+    print(f'{"baseline":>14} {baseline:>18.1f} {1:>12.0%}')
+    for chat_class in (Chat, ColumnarChat):
+        memory = measure(chat_class, Message, messages)
+        print(f'{chat_class.__name__:>14} {memory:>18.1f} {memory / baseline:>12.0%}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the memory a chat takes per message.')
+    parser.add_argument('--messages', type=int, default=100000, help='Number of messages in the chat.')
+    arguments = parser.parse_args()
+
+    run(messages=arguments.messages)
@@ -0,0 +1,74 @@
+"""
+Benchmark of rendering a chat in the formats of the LLM creators after every turn.
+
+A turn adds a message and renders it in both formats and counts its tokens, which should cost the same at any length
+of the chat since renderings are only appended to. The benchmark fails if the median cost of a turn in the last
+messages exceeds the median cost in the first messages by more than the tolerance.
+
+Reading a whole prompt or message list is reported too. It makes one copy of the rendering, the size of the request
+it is sent in, which grows with the chat.
+
+Usage:
+
+    python benchmarks/chat_rendering.py --messages 20000 --tolerance 2.0
+"""
+
+import argparse
+import os
+from statistics import median
+import sys
+import time
+
+# Import llmbox from the repository when it is not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llmbox.chat import Chat, Message, Role
+from llmbox.chat.chat import _extend_anthropic, _extend_openai
+
+
+def run(messages: int, step: int, tolerance: float) -> bool:
+    chat = Chat()
+    turns = []
+    medians = []
+
+    print(f'{"messages":>10} {"turn us":>9} {"anthropic read us":>18} {"openai read us":>15}')
+    for i in range(messages):
+        role = Role.User if i % 2 == 0 else Role.Assistant
+
+        # Add and render the message, as an LLM does before each request
+        start = time.perf_counter()
+        chat.add_message(Message(text=f'Message {i} of the conversation about the size of the earth.', role=role))
+        chat._render('anthropic', _extend_anthropic)
+        chat._render('openai_messages', _extend_openai)
+        chat.count_tokens_anthropic()
+        chat.count_tokens_openai()
+        turns.append(time.perf_counter() - start)
+
+        if (i + 1) % step == 0:
+            start = time.perf_counter()
+            chat.generate_prompt_anthropic()
+            anthropic = time.perf_counter() - start
+
+            start = time.perf_counter()
+            chat.generate_messages_openai()
+            openai = time.perf_counter() - start
+
+            medians.append(median(turns))
+            turns = []
+            print(f'{i + 1:>10} {medians[-1] * 1e6:>9.2f} {anthropic * 1e6:>18.1f} {openai * 1e6:>15.1f}')
+
+    ratio = medians[-1] / medians[0]
+    passed = ratio <= tolerance
+    print(f'Turn cost ratio, last to first messages: {ratio:.2f}{"" if passed else f"  FAIL: over {tolerance:.2f}"}')
+
+    return passed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark and guard the per-turn cost of rendering a chat.')
+    parser.add_argument('--messages', type=int, default=20000, help='Number of messages in the chat.')
+    parser.add_argument('--step', type=int, default=2000, help='Number of messages between reports.')
+    parser.add_argument('--tolerance', type=float, default=2.0, help='Maximum ratio of the last to the first turn cost.')
+    arguments = parser.parse_args()
+
+    sys.exit(0 if run(messages=arguments.messages, step=arguments.step, tolerance=arguments.tolerance) else 1)
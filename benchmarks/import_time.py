@@ -0,0 +1,71 @@
+"""
+Benchmark of the time a fresh interpreter takes to import llmbox, which also guards against imports loading clients
+they do not need.
+
+Each import runs in a new interpreter a few times, and the fastest time is reported. The benchmark fails if an import
+loads a client it should not, or takes longer than the budget when one is given.
+
+Usage:
+
+    python benchmarks/import_time.py --runs 5 --budget-ms 200
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+
+# Imports and the clients they must not load
+IMPORTS = {
+    'import llmbox.chat': ['anthropic', 'openai', 'httpx'],
+    'import llmbox.chat.store': ['anthropic', 'openai', 'httpx'],
+    'import llmbox.llms': ['anthropic', 'openai', 'httpx'],
+    'import llmbox.llms.models': ['anthropic', 'openai', 'httpx'],
+    'from llmbox.llms import Claude2': ['openai'],
+    'from llmbox.llms import GPT4': ['anthropic', 'httpx']
+}
+
+_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+{statement}
+print(json.dumps({{'seconds': time.perf_counter() - start, 'modules': sorted(sys.modules)}}))
+'''
+
+
+def measure(statement: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, '-c', _SCRIPT.format(statement=statement)], capture_output=True, text=True, check=True
+    ).stdout
+
+    return json.loads(output)
+
+
+def run(runs: int, budget_ms: float = None) -> bool:
+    passed = True
+
+    print(f'{"import":<36} {"ms":>8}  loaded clients')
+    for statement, forbidden in IMPORTS.items():
+        results = [measure(statement) for _ in range(runs)]
+        milliseconds = min(result['seconds'] for result in results) * 1000
+        loaded = [client for client in ('anthropic', 'openai', 'httpx') if client in results[0]['modules']]
+
+        failures = [client for client in loaded if client in forbidden]
+        if budget_ms is not None and milliseconds > budget_ms and not loaded:
+            failures.append(f'over {budget_ms:.0f} ms')
+        passed = passed and not failures
+
+        print(f'{statement:<36} {milliseconds:>8.1f}  {", ".join(loaded) or "-"}', end='')
+        print(f'  FAIL: {", ".join(failures)}' if failures else '')
+
+    return passed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark and guard the import time of llmbox.')
+    parser.add_argument('--runs', type=int, default=5, help='Number of runs of each import.')
+    parser.add_argument('--budget-ms', type=float, help='Maximum time of imports loading no client.')
+    arguments = parser.parse_args()
+
+    sys.exit(0 if run(runs=arguments.runs, budget_ms=arguments.budget_ms) else 1)
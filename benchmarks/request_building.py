@@ -0,0 +1,79 @@
+"""
+Benchmark of building the request arguments of a generation from its settings.
+
+Compares building the arguments by evaluating the name of each setting, as the LLMs used to, with the request
+builders, for new settings on every call and for settings reused across calls. The full path of an LLM, rendering
+a cached chat included, is measured too.
+
+Usage:
+
+    python benchmarks/request_building.py --calls 100000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+# Import llmbox from the repository when it is not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llmbox.chat import Chat, Message, Role
+from llmbox.llms.claude import Claude
+from llmbox.llms.config import GenerationConfig
+
+
+def _evaluated_arguments(
+    prompt: str,
+    max_tokens: int,
+    stop_sequences: list[str],
+    temperature: float,
+    top_p: float,
+    top_k: int
+) -> dict:
+    # Arguments built as the LLMs used to
+    generation_arguments = {'model': 'claude-2', 'prompt': prompt, 'max_tokens_to_sample': max_tokens}
+    generation_optionals = ['stop_sequences', 'temperature', 'top_p', 'top_k']
+    for argument in generation_optionals:
+        if eval(argument) is not None:
+            generation_arguments[argument] = eval(argument)
+
+    return generation_arguments
+
+
+def _built_arguments(prompt: str, config: GenerationConfig) -> dict:
+    generation_arguments = Claude._REQUEST_BUILDER.build(config)
+    generation_arguments['model'] = 'claude-2'
+    generation_arguments['prompt'] = prompt
+
+    return generation_arguments
+
+
+def run(calls: int) -> None:
+    prompt = '\n\nHuman: How big is the earth? \n\nAssistant:'
+    settings = {'max_tokens': 300, 'stop_sequences': ['\n\nHuman:'], 'temperature': 0.0, 'top_p': None, 'top_k': None}
+    config = GenerationConfig(**settings)
+
+    llm = Claude(api_key='benchmark', model='claude-2')
+    chat = Chat()
+    chat.add_message(Message(text='How big is the earth?', role=Role.User))
+
+    cases = {
+        'eval': lambda: _evaluated_arguments(prompt, **settings),
+        'builder, new settings': lambda: _built_arguments(prompt, GenerationConfig(**settings)),
+        'builder, shared settings': lambda: _built_arguments(prompt, config),
+        'llm, shared settings': lambda: llm._generation_arguments(chat, config)
+    }
+
+    print(f'{"path":<26} {"us per call":>12}')
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=calls, repeat=5))
+        print(f'{name:<26} {seconds / calls * 1e6:>12.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark building the request arguments of a generation.')
+    parser.add_argument('--calls', type=int, default=100000, help='Number of calls per measurement.')
+    arguments = parser.parse_args()
+
+    run(calls=arguments.calls)
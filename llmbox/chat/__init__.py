@@ -1 +1 @@
-from llmbox.chat.chat import Chat, Message, Role
+from llmbox.chat.chat import Chat, ColumnarChat, Message, Role
@@ -1,5 +1,18 @@
-from anthropic import HUMAN_PROMPT, AI_PROMPT
+from array import array
+from collections.abc import Sequence
 from enum import Enum
+from functools import cache, partial
+from itertools import islice
+from typing import Callable
+import weakref
+
+from .intern import TextPool
+from .tokens import OPENAI_TOKENS_PER_MESSAGE, OPENAI_TOKENS_PER_REPLY, TokenCounter, anthropic_counter, openai_counter
+
+
+# Turn prefixes of prompts in Anthropic's format, as in the Anthropic client which chats do not need to load
+HUMAN_PROMPT = '\n\nHuman:'
+AI_PROMPT = '\n\nAssistant:'
 
 
 class Role(Enum):
@@ -16,7 +29,7 @@ class Role(Enum):
 
 class Message:
     """
-    Class for a message.
+    Class for an immutable message.
 
     Args:
         text(str): Text of the message.
@@ -31,9 +44,70 @@ class Message:
             message = Message(text='How big is the earth?', role=Role.User)
     """
 
+    __slots__ = ('_text', '_role', '_token_counts')
+
     def __init__(self, text: str, role: Role):
-        self.text = text
-        self.role = role
+        self._text = text
+        self._role = role
+        self._token_counts = None
+
+    @property
+    def text(self) -> str:
+        """str: Text of the message."""
+
+        return self._text
+
+    @property
+    def role(self) -> Role:
+        """Role: Role of the message."""
+
+        return self._role
+
+    def count_tokens(self, counter: TokenCounter, render: Callable[['Message'], str] = None) -> int:
+        """
+        Count the tokens of the message. Counts are cached per counter.
+
+        Args:
+            counter(TokenCounter): Token counter.
+            render(:obj:`callable`, optional): Function rendering the message in the format of an LLM creator.
+                Defaults to the text of the message.
+
+        Returns:
+            int: Number of tokens.
+        """
+
+        key = (counter.name, render)
+        if self._token_counts is None:
+            self._token_counts = {}
+        elif key in self._token_counts:
+            return self._token_counts[key]
+
+        tokens = counter.count(render(self) if render is not None else self._text)
+        self._token_counts[key] = tokens
+
+        return tokens
+
+    def count_tokens_anthropic(self) -> int:
+        """
+        Count the tokens of the message as part of a prompt in Anthropic's format.
+
+        Returns:
+            int: Number of tokens.
+        """
+
+        return self.count_tokens(anthropic_counter(), _render_anthropic)
+
+    def count_tokens_openai(self) -> int:
+        """
+        Count the tokens of the message in OpenAI's format, including the tokens OpenAI adds around it.
+
+        Returns:
+            int: Number of tokens.
+        """
+
+        counter = openai_counter()
+
+        return self.count_tokens(counter) + _role_tokens(counter, self.role.value) + OPENAI_TOKENS_PER_MESSAGE
 
     def __repr__(self):
         return f'<Role: {self.role}, Text: {self.text}>'
@@ -42,10 +116,20 @@ class Message:
 class Chat:
     """
     Class for a chat session.
+
+    The prompts and token counts of the chat are kept up to date as messages are added, so each turn only renders and
+    counts the new messages. Messages are never removed from a chat, fork the chat instead to regenerate a reply, edit
+    a message or explore another branch of the conversation.
+
+    Args:
+        pool(:obj:`TextPool`, optional): Pool sharing the texts of the messages with other chats, such as
+            `llmbox.chat.intern.text_pool`. Defaults to keeping the texts as they are.
     """
 
-    def __init__(self):
-        self._messages = []
+    def __init__(self, pool: TextPool = None):
+        self._messages = _MessageBranch(pool=pool)
+        self._rendered = {}
+        self._prompt = (0, '')
 
     def add_message(self, message: Message) -> None:
         """
@@ -68,12 +152,11 @@ class Chat:
             str: Prompt string in Anthropic's format.
         """
 
-        prompt = ''
-        for i, message in enumerate(self._messages):
-            if message.role.value == 'user':
-                prompt += f'{HUMAN_PROMPT}: {message.text} {AI_PROMPT}:'
-            else:
-                prompt += message.text
+        # Join the cached fragments once per new message
+        count, prompt = self._prompt
+        if count != len(self._messages):
+            prompt = ''.join(self._render('anthropic', _extend_anthropic))
+            self._prompt = (len(self._messages), prompt)
 
         return prompt
 
@@ -82,21 +165,352 @@ class Chat:
         Generate message list from the chat in OpenAI's format.
 
         Returns:
-            list: List of messages in OpenAI's format.
+            list: List of messages in OpenAI's format. The messages are read-only, they are shared with later calls.
+        """
+
+        return list(self._render('openai_messages', _extend_openai))
+
+    def count_tokens_anthropic(self) -> int:
+        """
+        Count the tokens of the prompt in Anthropic's format.
+
+        Only the messages added since the last count are counted.
+
+        Returns:
+            int: Number of tokens in the prompt.
         """
 
-        return [{'role': message.role.value, 'content': message.text} for message in self._messages]
+        totals = self._render('anthropic_tokens', partial(_extend_tokens, Message.count_tokens_anthropic), _totals)
+
+        return totals[-1] if totals else 0
+
+    def count_tokens_openai(self) -> int:
+        """
+        Count the tokens of the messages in OpenAI's format, including the tokens OpenAI adds around them.
+
+        Only the messages added since the last count are counted.
+
+        Returns:
+            int: Number of tokens in the messages.
+        """
+
+        totals = self._render('openai_tokens', partial(_extend_tokens, Message.count_tokens_openai), _totals)
+
+        return (totals[-1] if totals else 0) + OPENAI_TOKENS_PER_REPLY
+
+    def message_tokens_anthropic(self) -> list[int]:
+        """
+        Count the tokens of each message in Anthropic's format.
+
+        Returns:
+            list: Number of tokens of each message.
+        """
+
+        return [message.count_tokens_anthropic() for message in self._messages]
+
+    def message_tokens_openai(self) -> list[int]:
+        """
+        Count the tokens of each message in OpenAI's format, including the tokens OpenAI adds around it.
+
+        Returns:
+            list: Number of tokens of each message.
+        """
+
+        return [message.count_tokens_openai() for message in self._messages]
+
+    def fork(self, length: int = None) -> 'Chat':
+        """
+        Create a branch of the chat with its first messages.
+
+        The branch shares the messages and the cached prompts and token counts of the chat rather than copying them,
+        so forking takes constant time and memory. Messages added to the branch or to the chat afterwards are not
+        seen by the other.
+
+        Args:
+            length(:obj:`int`, optional): Number of messages to keep. Defaults to all the messages.
+
+        Returns:
+            Chat: Branch of the chat.
+
+        Example:
+
+            .. code-block:: python
+
+                from llmbox.chat import Chat, Message, Role
+
+                chat = Chat()
+                chat.add_message(Message(text='How big is the earth?', role=Role.User))
+                chat.add_message(Message(text='About 12,742 km across.', role=Role.Assistant))
+
+                # Regenerate the reply
+                regenerated = chat.fork(length=1)
+
+                # Edit the question
+                edited = chat.fork(length=0)
+                edited.add_message(Message(text='How big is the moon?', role=Role.User))
+        """
+
+        length = len(self._messages) if length is None else length
+        if not 0 <= length <= len(self._messages):
+            raise ValueError(f'Length must be between 0 and the number of messages, {len(self._messages)}.')
+
+        chat = self._branch(length)
+
+        # Share the renderings of the first messages, a branch only keeps the part rendered before the fork
+        chat._rendered = {key: (min(count, length), rendering) for key, (count, rendering) in self._rendered.items()}
+
+        return chat
+
+    def _branch(self, length: int) -> 'Chat':
+        chat = type(self)()
+        chat._messages = self._messages.fork(length)
+
+        return chat
+
+    def _render(self, key: str, extend: Callable, initial: Callable = list) -> Sequence:
+        # Extend the cached rendering of a format with the messages added since. Renderings hold an entry per message
+        # and are only appended to, so a turn costs the same at any length. Branches of a chat share its renderings
+        # and copy the part they keep the first time the renderings run past their messages
+        count, rendering = self._rendered.get(key, (0, None))
+        if rendering is None:
+            rendering = initial()
+        elif len(rendering) > count:
+            rendering = rendering[:count]
+
+        if count < len(self._messages):
+            extend(rendering, self._messages[count:])
+
+        self._rendered[key] = (len(self._messages), rendering)
+
+        return rendering
 
     @property
     def messages(self):
         """
-        List of messages in the chat.
+        Read-only sequence of messages in the chat.
 
         Returns:
-            list: List of messages.
+            Sequence: Sequence of messages.
         """
 
         return self._messages
 
     def __repr__(self):
         return '\n'.join(f'Role: {message.role}\tContent: {message.text}' for message in self._messages)
+
+
+class ColumnarChat(Chat):
+    """
+    Class for a chat session stored in columns, for keeping many chats in memory.
+
+    Instead of a message object per message, the chat keeps the texts of all messages in a single UTF-8 buffer with
+    parallel arrays of roles and text offsets, and creates messages only when they are read. A message then takes
+    about 11 bytes on top of its text, against more than 100 bytes for a message object in a list. Forks copy the
+    columns, which are compact, and the messages read are new objects that do not keep their token counts.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.chat import ColumnarChat, Message, Role
+
+            chat = ColumnarChat()
+            chat.add_message(Message(text='How big is the earth?', role=Role.User))
+            print(chat.messages[-1].text)
+    """
+
+    def __init__(self):
+        # Initialize parent class
+        super().__init__()
+
+        self._roles = bytearray()
+        self._offsets = array('Q', [0])
+        self._texts = bytearray()
+        self._messages = _MessageColumns(self)
+
+    def add_message(self, message: Message) -> None:
+        """
+        Add a message to the chat.
+
+        Args:
+            message(Message): Message to be added to the chat.
+
+        Returns:
+            None: None
+        """
+
+        self._texts += message.text.encode()
+        self._offsets.append(len(self._texts))
+        self._roles.append(_ROLE_CODES[message.role])
+
+    def _branch(self, length: int) -> 'ColumnarChat':
+        # Columns are compact enough to copy
+        chat = ColumnarChat()
+        chat._roles = self._roles[:length]
+        chat._offsets = self._offsets[:length + 1]
+        chat._texts = self._texts[:self._offsets[length]]
+
+        return chat
+
+    @property
+    def messages(self):
+        """
+        Read-only sequence of messages in the chat.
+
+        Returns:
+            Sequence: Sequence of messages.
+        """
+
+        return self._messages
+
+
+class _MessageColumns(Sequence):
+    # Read-only view creating the messages of a columnar chat when they are read
+
+    __slots__ = ('_chat',)
+
+    def __init__(self, chat: ColumnarChat) -> None:
+        self._chat = chat
+
+    def __len__(self) -> int:
+        return len(self._chat._roles)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._message(i) for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Message index out of range.')
+
+        return self._message(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._message(i)
+
+    def _message(self, index: int) -> Message:
+        chat = self._chat
+        text = chat._texts[chat._offsets[index]:chat._offsets[index + 1]].decode()
+
+        return Message(text=text, role=_ROLES[chat._roles[index]])
+
+
+class _MessageBranch(Sequence):
+    # Append-only sequence of messages sharing the first messages of the branch it was forked from
+
+    __slots__ = ('_parent', '_length', '_messages', '_pool', '__weakref__')
+
+    def __init__(self, parent: '_MessageBranch' = None, length: int = 0, pool: TextPool = None) -> None:
+        self._parent = parent
+        self._length = length
+        self._messages = []
+        self._pool = pool
+
+        # Release the texts of the branch once neither its chat nor the branches forked from it hold them
+        if pool is not None:
+            weakref.finalize(self, _release, pool, self._messages).atexit = False
+
+    def append(self, message: Message) -> None:
+        # Keep the pooled text in a new message, the message added is left as it is
+        if self._pool is not None:
+            text = self._pool.intern(message.text)
+            if text is not message.text:
+                message = Message(text=text, role=message.role)
+        self._messages.append(message)
+
+    def fork(self, length: int) -> '_MessageBranch':
+        # Fork from the oldest branch holding the first messages, to keep lookups short
+        branch = self
+        while branch._parent is not None and length <= branch._length:
+            branch = branch._parent
+
+        return _MessageBranch(parent=branch, length=length, pool=self._pool)
+
+    def __len__(self) -> int:
+        return self._length + len(self._messages)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._message(i) for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Message index out of range.')
+
+        return self._message(index)
+
+    def __iter__(self):
+        if self._length > 0:
+            yield from islice(self._parent, self._length)
+        yield from self._messages
+
+    def _message(self, index: int) -> Message:
+        branch = self
+        while index < branch._length:
+            branch = branch._parent
+
+        return branch._messages[index - branch._length]
+
+
+def _render_anthropic(message: Message) -> str:
+    # Render a message as its part of the prompt in Anthropic's format
+    if message.role.value == 'user':
+        return f'{HUMAN_PROMPT}: {message.text} {AI_PROMPT}:'
+
+    return message.text
+
+
+def _extend_anthropic(fragments: list[str], messages: list[Message]) -> None:
+    # Append the part of the prompt in Anthropic's format of each message
+    fragments.extend(_render_anthropic(message) for message in messages)
+
+
+def _extend_openai(rendering: list[dict], messages: list[Message]) -> None:
+    # Append messages in OpenAI's format, read-only as they are shared by every rendering of the chat
+    rendering.extend(_OpenAIMessage(role=message.role.value, content=message.text) for message in messages)
+
+
+def _extend_tokens(count: Callable[[Message], int], totals: array, messages: list[Message]) -> None:
+    # Append the running total of tokens after each message
+    total = totals[-1] if totals else 0
+    for message in messages:
+        total += count(message)
+        totals.append(total)
+
+
+def _totals() -> array:
+    return array('q')
+
+
+class _OpenAIMessage(dict):
+    # Read-only message in OpenAI's format, a dictionary so it is sent as it is
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Messages rendered by a chat are read-only, copy them with dict() to change them.')
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        # Copies are plain dictionaries
+        return dict, (dict(self),)
+
+
+def _release(pool: TextPool, messages: list[Message]) -> None:
+    # Remove the references of messages to their pooled texts, the pool may be in use on this thread
+    for message in messages:
+        pool.release_later(message.text)
+
+
+# Roles of columnar chats are stored as their index
+_ROLES = tuple(Role)
+_ROLE_CODES = {role: code for code, role in enumerate(_ROLES)}
+
+
+@cache
+def _role_tokens(counter: TokenCounter, role: str) -> int:
+    return counter.count(role)
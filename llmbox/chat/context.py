@@ -0,0 +1,220 @@
+from itertools import islice
+from typing import Callable, Iterator
+
+from .chat import Chat, Message
+
+
+class ContextPolicy:
+    """
+    Base class for policies choosing which turns of a chat to send to an LLM.
+
+    A turn is a user message together with the assistant messages answering it, so turns are never split. The
+    latest turn is always kept. Policies keep the first and the latest turns of the chat and drop the oldest of the
+    latest turns first when the chat does not fit the token budget. The stored chat is left intact.
+
+    Args:
+        first_turns(:obj:`int`, defaults to 0): Number of turns to keep from the start of the chat.
+        last_turns(:obj:`int`, optional): Number of turns to keep from the end of the chat. Defaults to as many as
+            fit the token budget.
+    """
+
+    def __init__(self, first_turns: int = 0, last_turns: int = None) -> None:
+        # Verify turns
+        if first_turns < 0 or (last_turns is not None and last_turns < 1):
+            raise ValueError('Policies keep at least the latest turn and no negative number of turns.')
+
+        self._first_turns = first_turns
+        self._last_turns = last_turns
+
+    def apply(self, chat: Chat, max_tokens: int = None, count: Callable[[Message], int] = None) -> Chat:
+        """
+        Choose the turns of a chat to send to an LLM.
+
+        Only the turns that are kept are counted, so applying a policy to a long chat costs as much as the turns
+        sent.
+
+        Args:
+            chat(Chat): Chat containing the messages.
+            max_tokens(:obj:`int`, optional): Maximum number of tokens of the messages sent.
+            count(:obj:`callable`, optional): Function counting the tokens of a message, required with a token
+                budget.
+
+        Returns:
+            Chat: Chat with the turns to send, or the chat itself if every turn is kept.
+        """
+
+        messages = chat.messages
+        if len(messages) == 0:
+            return chat
+
+        # Always keep the latest turn
+        backward = _turns_backward(messages)
+        latest = next(backward)
+        tokens = self._tokens(messages, latest, max_tokens, count)
+
+        # Keep the first turns that fit
+        first = []
+        for turn in islice(_turns_forward(messages), self._first_turns):
+            if turn[0] >= latest[0]:
+                break
+            turn_tokens = self._tokens(messages, turn, max_tokens, count)
+            if max_tokens is not None and tokens + turn_tokens > max_tokens:
+                break
+            first.append(turn)
+            tokens += turn_tokens
+
+        # Keep the latest turns that fit, newest first
+        last = [latest]
+        first_end = first[-1][1] if first else 0
+        for turn in backward:
+            if turn[0] < first_end or (self._last_turns is not None and len(last) >= self._last_turns):
+                break
+            turn_tokens = self._tokens(messages, turn, max_tokens, count)
+            if max_tokens is not None and tokens + turn_tokens > max_tokens:
+                break
+            last.append(turn)
+            tokens += turn_tokens
+
+        turns = first + last[::-1]
+        if sum(end - start for start, end in turns) == len(messages):
+            return chat
+
+        # Create a chat sharing the kept messages, and their cached token counts
+        window = Chat()
+        for start, end in turns:
+            for message in messages[start:end]:
+                window.add_message(message)
+
+        return window
+
+    def _tokens(self, messages: list[Message], turn: tuple, max_tokens: int, count: Callable[[Message], int]) -> int:
+        if max_tokens is None:
+            return 0
+
+        return sum(count(message) for message in messages[turn[0]:turn[1]])
+
+    @property
+    def first_turns(self) -> int:
+        """int: Number of turns to keep from the start of the chat."""
+
+        return self._first_turns
+
+    @property
+    def last_turns(self) -> int:
+        """int: Number of turns to keep from the end of the chat."""
+
+        return self._last_turns
+
+
+class SlidingWindow(ContextPolicy):
+    """
+    Policy keeping the latest turns of a chat.
+
+    Args:
+        max_turns(:obj:`int`, defaults to 10): Number of latest turns to keep.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.chat.context import SlidingWindow
+
+            llm = Claude2(context_policy=SlidingWindow(max_turns=20))
+    """
+
+    def __init__(self, max_turns: int = 10) -> None:
+        # Initialize parent class
+        super().__init__(last_turns=max_turns)
+
+
+class FirstLastWindow(ContextPolicy):
+    """
+    Policy keeping the first and the latest turns of a chat, such as the instructions and the recent conversation.
+
+    Args:
+        first_turns(:obj:`int`, defaults to 1): Number of turns to keep from the start of the chat.
+        last_turns(:obj:`int`, defaults to 10): Number of turns to keep from the end of the chat.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.chat.context import FirstLastWindow
+
+            llm = Claude2(context_policy=FirstLastWindow(first_turns=1, last_turns=20))
+    """
+
+    def __init__(self, first_turns: int = 1, last_turns: int = 10) -> None:
+        # Initialize parent class
+        super().__init__(first_turns=first_turns, last_turns=last_turns)
+
+
+class TokenBudget(ContextPolicy):
+    """
+    Policy keeping as many of the latest turns of a chat as fit the token budget.
+
+    Args:
+        first_turns(:obj:`int`, defaults to 0): Number of turns to keep from the start of the chat.
+        max_tokens(:obj:`int`, optional): Maximum number of tokens of the messages sent. Defaults to the context
+            window of the model less the tokens to generate.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.chat.context import TokenBudget
+
+            llm = Claude2(context_policy=TokenBudget(first_turns=1, max_tokens=8000))
+    """
+
+    def __init__(self, first_turns: int = 0, max_tokens: int = None) -> None:
+        # Initialize parent class
+        super().__init__(first_turns=first_turns)
+
+        self._max_tokens = max_tokens
+
+    def apply(self, chat: Chat, max_tokens: int = None, count: Callable[[Message], int] = None) -> Chat:
+        """
+        Choose the turns of a chat to send to an LLM.
+
+        Args:
+            chat(Chat): Chat containing the messages.
+            max_tokens(:obj:`int`, optional): Maximum number of tokens of the messages sent, capped by the budget of
+                the policy.
+            count(callable): Function counting the tokens of a message.
+
+        Returns:
+            Chat: Chat with the turns to send, or the chat itself if every turn is kept.
+        """
+
+        if self._max_tokens is not None:
+            max_tokens = self._max_tokens if max_tokens is None else min(max_tokens, self._max_tokens)
+
+        return super().apply(chat, max_tokens=max_tokens, count=count)
+
+    @property
+    def max_tokens(self) -> int:
+        """int: Maximum number of tokens of the messages sent."""
+
+        return self._max_tokens
+
+
+def _turns_backward(messages: list[Message]) -> Iterator[tuple]:
+    # Yield the start and end of each turn from the latest, a turn starts at a user message
+    end = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        if i == 0 or messages[i].role.value == 'user':
+            yield i, end
+            end = i
+
+
+def _turns_forward(messages: list[Message]) -> Iterator[tuple]:
+    # Yield the start and end of each turn from the first
+    start = 0
+    for i in range(1, len(messages) + 1):
+        if i == len(messages) or messages[i].role.value == 'user':
+            yield start, i
+            start = i
@@ -0,0 +1,155 @@
+from collections import deque
+import sys
+import threading
+
+
+class TextPool:
+    """
+    Class for a pool of message texts stored once however many messages hold them.
+
+    Texts are addressed by their content, so a text added by several chats, such as a pasted document or a canned first
+    question, is kept once and shared. The pool counts the references to each text and forgets it once no chat holds
+    it anymore. Short texts are not pooled, they take less memory than their bookkeeping.
+
+    Args:
+        min_length(:obj:`int`, defaults to 64): Number of characters from which texts are pooled.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.chat import Chat, Message, Role
+            from llmbox.chat.intern import text_pool
+
+            document = open('document.txt').read()
+
+            for session in range(100):
+                chat = Chat(pool=text_pool)
+                chat.add_message(Message(text=document, role=Role.User))
+
+            print(text_pool.stats)
+    """
+
+    def __init__(self, min_length: int = 64) -> None:
+        self._min_length = min_length
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._entries = {}
+        self._referenced_bytes = 0
+        self._unique_bytes = 0
+
+    def intern(self, text: str) -> str:
+        """
+        Add a reference to a text.
+
+        Args:
+            text(str): Text to be pooled.
+
+        Returns:
+            str: Pooled text equal to the text, to be held instead of it.
+        """
+
+        if len(text) < self._min_length:
+            return text
+
+        with self._lock:
+            self._release_pending()
+            entry = self._entries.get(text)
+            if entry is None:
+                entry = [text, 0, sys.getsizeof(text)]
+                self._entries[text] = entry
+                self._unique_bytes += entry[2]
+
+            entry[1] += 1
+            self._referenced_bytes += entry[2]
+
+        return entry[0]
+
+    def release(self, text: str) -> None:
+        """
+        Remove a reference to a text, and forget the text once it has no reference left.
+
+        Args:
+            text(str): Pooled text.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._release_pending()
+            self._release(text)
+
+    def release_later(self, text: str) -> None:
+        """
+        Remove a reference to a text on the next use of the pool, without waiting for the pool. Finalizers release
+        texts this way, as they may run while the same thread is using the pool.
+
+        Args:
+            text(str): Pooled text.
+
+        Returns:
+            None: None
+        """
+
+        if len(text) >= self._min_length:
+            self._pending.append(text)
+
+    def clear(self) -> None:
+        """
+        Forget all texts.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._pending.clear()
+            self._entries.clear()
+            self._referenced_bytes = 0
+            self._unique_bytes = 0
+
+    @property
+    def min_length(self) -> int:
+        """int: Number of characters from which texts are pooled."""
+
+        return self._min_length
+
+    @property
+    def stats(self) -> dict:
+        """dict: Number of texts and references, bytes referenced and stored, bytes saved and deduplication ratio."""
+
+        with self._lock:
+            self._release_pending()
+            texts = len(self._entries)
+            references = sum(entry[1] for entry in self._entries.values())
+
+            return {
+                'texts': texts,
+                'references': references,
+                'referenced_bytes': self._referenced_bytes,
+                'stored_bytes': self._unique_bytes,
+                'bytes_saved': self._referenced_bytes - self._unique_bytes,
+                'dedup_ratio': self._referenced_bytes / self._unique_bytes if self._unique_bytes else 1.0
+            }
+
+    def _release_pending(self) -> None:
+        while self._pending:
+            self._release(self._pending.popleft())
+
+    def _release(self, text: str) -> None:
+        if len(text) < self._min_length:
+            return
+
+        entry = self._entries.get(text)
+        if entry is None:
+            return
+
+        entry[1] -= 1
+        self._referenced_bytes -= entry[2]
+        if entry[1] == 0:
+            del self._entries[text]
+            self._unique_bytes -= entry[2]
+
+
+text_pool = TextPool()
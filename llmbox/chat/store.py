@@ -0,0 +1,419 @@
+from collections import OrderedDict
+from collections.abc import Sequence
+import json
+import sqlite3
+import threading
+import uuid
+import zlib
+
+from .chat import Chat, Message, Role
+
+
+# Texts shorter than this are stored as they are, compression does not pay off
+_COMPRESS_MIN_BYTES = 64
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS chats (
+    chat_id TEXT PRIMARY KEY,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    chat_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    compressed INTEGER NOT NULL,
+    text BLOB NOT NULL,
+    PRIMARY KEY (chat_id, position)
+) WITHOUT ROWID;
+'''
+
+
+class ChatStore:
+    """
+    Class for a store keeping chats in a local SQLite database.
+
+    Messages are compressed and only ever appended, and stored chats load their messages lazily a page at a time, so
+    long histories need not be in memory to keep chatting. Chats can be imported and exported in bulk as JSONL, with a
+    line per message.
+
+    Args:
+        path(:obj:`str`, defaults to ':memory:'): Path of the database file.
+        page_size(:obj:`int`, defaults to 100): Number of messages loaded at a time.
+        max_pages(:obj:`int`, defaults to 10): Number of pages each chat keeps in memory.
+        compression_level(:obj:`int`, defaults to 6): Compression level of the texts, from 1 to 9.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.chat import Message, Role
+            from llmbox.chat.store import ChatStore
+            from llmbox.llms import Claude2
+
+            store = ChatStore(path='chats.db')
+
+            chat = store.create(chat_id='session-1')
+            chat.add_message(Message(text='How big is the earth?', role=Role.User))
+
+            # Resume the chat later, only the latest messages are loaded
+            chat = store.open(chat_id='session-1')
+            print(Claude2().generate(chat=chat))
+    """
+
+    def __init__(
+        self,
+        path: str = ':memory:',
+        page_size: int = 100,
+        max_pages: int = 10,
+        compression_level: int = 6
+    ) -> None:
+        # Verify arguments
+        if page_size < 1 or max_pages < 1:
+            raise ValueError('Page size and number of pages must be at least 1.')
+        if not 1 <= compression_level <= 9:
+            raise ValueError('Compression level must be between 1 and 9.')
+
+        self._path = path
+        self._page_size = page_size
+        self._max_pages = max_pages
+        self._compression_level = compression_level
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+
+    def create(self, chat_id: str = None, messages: Sequence = ()) -> 'StoredChat':
+        """
+        Create a chat in the store.
+
+        Args:
+            chat_id(:obj:`str`, optional): ID of the chat. Defaults to a random ID.
+            messages(:obj:`list(Message)`, optional): Messages of the chat, such as the messages of an in-memory chat.
+
+        Raises:
+            ValueError: If a chat with the ID already exists.
+
+        Returns:
+            StoredChat: Stored chat.
+        """
+
+        chat_id = chat_id or uuid.uuid4().hex
+        rows = [self._row(chat_id, position, message) for position, message in enumerate(messages)]
+
+        with self._lock, self._connection:
+            try:
+                self._connection.execute('INSERT INTO chats VALUES (?, ?)', (chat_id, len(rows)))
+            except sqlite3.IntegrityError:
+                raise ValueError(f'Chat {chat_id} already exists.') from None
+            self._connection.executemany('INSERT INTO messages VALUES (?, ?, ?, ?, ?)', rows)
+
+        return StoredChat(store=self, chat_id=chat_id, length=len(rows))
+
+    def open(self, chat_id: str) -> 'StoredChat':
+        """
+        Open a chat of the store. No message is loaded until it is read.
+
+        Args:
+            chat_id(str): ID of the chat.
+
+        Raises:
+            KeyError: If there is no chat with the ID.
+
+        Returns:
+            StoredChat: Stored chat.
+        """
+
+        with self._lock:
+            row = self._connection.execute('SELECT length FROM chats WHERE chat_id = ?', (chat_id,)).fetchone()
+        if row is None:
+            raise KeyError(f'Chat {chat_id} not found.')
+
+        return StoredChat(store=self, chat_id=chat_id, length=row[0])
+
+    def delete(self, chat_id: str) -> None:
+        """
+        Delete a chat and its messages from the store.
+
+        Args:
+            chat_id(str): ID of the chat.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM messages WHERE chat_id = ?', (chat_id,))
+            self._connection.execute('DELETE FROM chats WHERE chat_id = ?', (chat_id,))
+
+    def import_jsonl(self, path: str) -> int:
+        """
+        Import messages from a JSONL file with a line per message, holding its chat ID, role and text. Messages are
+        appended to their chat, which is created if needed.
+
+        Args:
+            path(str): Path of the JSONL file.
+
+        Returns:
+            int: Number of messages imported.
+        """
+
+        with self._lock, self._connection, open(path, 'r') as f:
+            lengths = dict(self._connection.execute('SELECT chat_id, length FROM chats'))
+            imported = set()
+
+            rows = []
+            for line in f:
+                if not line.strip():
+                    continue
+
+                record = json.loads(line)
+                chat_id = record['chat_id']
+                lengths.setdefault(chat_id, 0)
+                imported.add(chat_id)
+
+                message = Message(text=record['text'], role=Role(record['role']))
+                rows.append(self._row(chat_id, lengths[chat_id], message))
+                lengths[chat_id] += 1
+
+            self._connection.executemany('INSERT INTO messages VALUES (?, ?, ?, ?, ?)', rows)
+            self._connection.executemany(
+                'INSERT INTO chats VALUES (?, ?) ON CONFLICT (chat_id) DO UPDATE SET length = excluded.length',
+                [(chat_id, lengths[chat_id]) for chat_id in imported]
+            )
+
+        return len(rows)
+
+    def export_jsonl(self, path: str, chat_ids: list[str] = None) -> int:
+        """
+        Export messages to a JSONL file with a line per message, holding its chat ID, role and text.
+
+        Args:
+            path(str): Path of the JSONL file.
+            chat_ids(:obj:`list(str)`, optional): IDs of the chats to export. Defaults to all chats.
+
+        Returns:
+            int: Number of messages exported.
+        """
+
+        query = 'SELECT chat_id, role, compressed, text FROM messages'
+        parameters = ()
+        if chat_ids is not None:
+            query += f' WHERE chat_id IN ({", ".join("?" * len(chat_ids))})'
+            parameters = tuple(chat_ids)
+        query += ' ORDER BY chat_id, position'
+
+        exported = 0
+        with self._lock, open(path, 'w') as f:
+            for chat_id, role, compressed, text in self._connection.execute(query, parameters):
+                record = {'chat_id': chat_id, 'role': role, 'text': _decode(compressed, text)}
+                f.write(json.dumps(record) + '\n')
+                exported += 1
+
+        return exported
+
+    def close(self) -> None:
+        """
+        Close the database.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._connection.close()
+
+    def _append(self, chat_id: str, position: int, message: Message) -> None:
+        # Write a new message of a chat
+        with self._lock, self._connection:
+            row = self._row(chat_id, position, message)
+            self._connection.execute('INSERT INTO messages VALUES (?, ?, ?, ?, ?)', row)
+            self._connection.execute('UPDATE chats SET length = ? WHERE chat_id = ?', (position + 1, chat_id))
+
+    def _load(self, chat_id: str, start: int, stop: int) -> list[Message]:
+        # Read the messages of a chat between two positions
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT role, compressed, text FROM messages WHERE chat_id = ? AND position >= ? AND position < ? '
+                'ORDER BY position',
+                (chat_id, start, stop)
+            ).fetchall()
+
+        return [Message(text=_decode(compressed, text), role=Role(role)) for role, compressed, text in rows]
+
+    def _copy(self, chat_id: str, length: int) -> str:
+        # Copy the first messages of a chat into a new chat, without decompressing them
+        copy_id = uuid.uuid4().hex
+        with self._lock, self._connection:
+            self._connection.execute('INSERT INTO chats VALUES (?, ?)', (copy_id, length))
+            self._connection.execute(
+                'INSERT INTO messages SELECT ?, position, role, compressed, text FROM messages '
+                'WHERE chat_id = ? AND position < ?',
+                (copy_id, chat_id, length)
+            )
+
+        return copy_id
+
+    def _row(self, chat_id: str, position: int, message: Message) -> tuple:
+        text = message.text.encode()
+        compressed = len(text) >= _COMPRESS_MIN_BYTES
+        if compressed:
+            text = zlib.compress(text, self._compression_level)
+
+        return chat_id, position, message.role.value, int(compressed), text
+
+    @property
+    def chat_ids(self) -> list[str]:
+        """list: IDs of the chats in the store."""
+
+        with self._lock:
+            return [row[0] for row in self._connection.execute('SELECT chat_id FROM chats ORDER BY chat_id')]
+
+    @property
+    def page_size(self) -> int:
+        """int: Number of messages loaded at a time."""
+
+        return self._page_size
+
+    @property
+    def max_pages(self) -> int:
+        """int: Number of pages each chat keeps in memory."""
+
+        return self._max_pages
+
+    @property
+    def stats(self) -> dict:
+        """dict: Number of chats and messages, and size of the texts stored and before compression."""
+
+        with self._lock:
+            chats = self._connection.execute('SELECT COUNT(*) FROM chats').fetchone()[0]
+            messages, stored, compressed = self._connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(LENGTH(text)), 0), COALESCE(SUM(compressed), 0) FROM messages'
+            ).fetchone()
+
+        return {'chats': chats, 'messages': messages, 'compressed_messages': compressed, 'stored_bytes': stored}
+
+
+class StoredChat(Chat):
+    """
+    Class for a chat kept in a `ChatStore`, created by the store.
+
+    Messages added to the chat are written to the store right away. Messages are read from the store a page at a time
+    when they are first needed and only the latest pages read stay in memory, so a chat windowed by a context policy
+    loads only the turns it sends.
+
+    Args:
+        store(ChatStore): Store of the chat.
+        chat_id(str): ID of the chat.
+        length(int): Number of messages of the chat.
+    """
+
+    def __init__(self, store: ChatStore, chat_id: str, length: int):
+        # Initialize parent class
+        super().__init__()
+
+        self._store = store
+        self._chat_id = chat_id
+        self._messages = _StoredMessages(store=store, chat_id=chat_id, length=length)
+
+    def add_message(self, message: Message) -> None:
+        """
+        Add a message to the chat and write it to the store.
+
+        Args:
+            message(Message): Message to be added to the chat.
+
+        Returns:
+            None: None
+        """
+
+        self._store._append(self._chat_id, len(self._messages), message)
+        self._messages.append(message)
+
+    def unload(self) -> None:
+        """
+        Drop the messages and cached prompts held in memory, they are read from the store again when needed.
+
+        Returns:
+            None: None
+        """
+
+        self._messages.unload()
+        self._rendered.clear()
+
+    def _branch(self, length: int) -> 'StoredChat':
+        # Branches are new chats in the store
+        return StoredChat(store=self._store, chat_id=self._store._copy(self._chat_id, length), length=length)
+
+    @property
+    def chat_id(self) -> str:
+        """str: ID of the chat."""
+
+        return self._chat_id
+
+    @property
+    def store(self) -> ChatStore:
+        """ChatStore: Store of the chat."""
+
+        return self._store
+
+
+class _StoredMessages(Sequence):
+    # Read-only sequence of the messages of a stored chat, loaded a page at a time
+
+    __slots__ = ('_store', '_chat_id', '_length', '_pages')
+
+    def __init__(self, store: ChatStore, chat_id: str, length: int) -> None:
+        self._store = store
+        self._chat_id = chat_id
+        self._length = length
+        self._pages = OrderedDict()
+
+    def append(self, message: Message) -> None:
+        page = self._pages.get(self._length // self._store.page_size)
+        if page is not None:
+            page.append(message)
+        self._length += 1
+
+    def unload(self) -> None:
+        self._pages.clear()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._message(i) for i in range(*index.indices(self._length))]
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('Message index out of range.')
+
+        return self._message(index)
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self._message(i)
+
+    def _message(self, index: int) -> Message:
+        number, offset = divmod(index, self._store.page_size)
+
+        page = self._pages.get(number)
+        if page is None:
+            start = number * self._store.page_size
+            page = self._store._load(self._chat_id, start, min(start + self._store.page_size, self._length))
+            self._pages[number] = page
+
+            # Keep the latest pages read
+            while len(self._pages) > self._store.max_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(number)
+
+        return page[offset]
+
+
+def _decode(compressed: int, text: bytes) -> str:
+    return (zlib.decompress(text) if compressed else text).decode()
@@ -0,0 +1,237 @@
+from abc import ABC, abstractmethod
+from functools import cache
+import math
+from typing import Callable
+
+
+# Tokens OpenAI adds around every message and to prime the reply
+OPENAI_TOKENS_PER_MESSAGE = 3
+OPENAI_TOKENS_PER_REPLY = 3
+
+
+class TokenCounter(ABC):
+    """
+    Base class for token counters.
+
+    Args:
+        name(str): Name of the counter, counts are cached per name.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        pass
+
+    @property
+    def name(self) -> str:
+        """str: Name of the counter."""
+
+        return self._name
+
+    @property
+    @abstractmethod
+    def accurate(self) -> bool:
+        pass
+
+    def __repr__(self):
+        return f'<{type(self).__name__}: {self._name}>'
+
+
+class TokenizerCounter(TokenCounter):
+    """
+    Token counter that counts exactly with a tokenizer.
+
+    Args:
+        name(str): Name of the counter.
+        encode(callable): Function encoding a text into a list of tokens.
+
+    Example:
+
+        .. code-block:: python
+
+            import tiktoken
+
+            from llmbox.chat.tokens import TokenizerCounter
+
+            counter = TokenizerCounter(name='cl100k_base', encode=tiktoken.get_encoding('cl100k_base').encode)
+            print(counter.count('How big is the earth?'))
+    """
+
+    def __init__(self, name: str, encode: Callable[[str], list]) -> None:
+        # Initialize parent class
+        super().__init__(name=name)
+
+        self._encode = encode
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens of a text.
+
+        Args:
+            text(str): Text to count the tokens of.
+
+        Returns:
+            int: Number of tokens.
+        """
+
+        return len(self._encode(text))
+
+    @property
+    def accurate(self) -> bool:
+        """bool: Whether the counts are exact, always True."""
+
+        return True
+
+
+class EstimatedCounter(TokenCounter):
+    """
+    Token counter that estimates counts from the number of characters.
+
+    Args:
+        name(str): Name of the counter.
+        characters_per_token(:obj:`float`, defaults to 4.0): Average number of characters per token.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.chat.tokens import EstimatedCounter, anthropic_counter
+
+            estimator = EstimatedCounter(name='claude-estimate')
+            estimator.calibrate(texts=['How big is the earth?', 'What about the moon?'], counter=anthropic_counter())
+            print(estimator.count('How big is the sun?'))
+    """
+
+    def __init__(self, name: str, characters_per_token: float = 4.0) -> None:
+        # Initialize parent class
+        super().__init__(name=name)
+
+        # Verify ratio
+        if characters_per_token <= 0:
+            raise ValueError('Number of characters per token must be positive.')
+
+        self._characters_per_token = characters_per_token
+
+    def count(self, text: str) -> int:
+        """
+        Estimate the tokens of a text.
+
+        Args:
+            text(str): Text to estimate the tokens of.
+
+        Returns:
+            int: Estimated number of tokens.
+        """
+
+        return math.ceil(len(text) / self._characters_per_token)
+
+    def calibrate(self, texts: list[str], counter: TokenCounter) -> float:
+        """
+        Fit the number of characters per token to the counts of another counter on sample texts.
+
+        Args:
+            texts(:obj:`list(str)`): Sample texts, ideally like the ones to be counted.
+            counter(TokenCounter): Counter to fit to, usually a tokenizer.
+
+        Returns:
+            float: Number of characters per token.
+        """
+
+        tokens = sum(counter.count(text) for text in texts)
+        if tokens > 0:
+            self._characters_per_token = sum(len(text) for text in texts) / tokens
+
+        return self._characters_per_token
+
+    @property
+    def characters_per_token(self) -> float:
+        """float: Average number of characters per token."""
+
+        return self._characters_per_token
+
+    @property
+    def accurate(self) -> bool:
+        """bool: Whether the counts are exact, always False."""
+
+        return False
+
+
+@cache
+def anthropic_counter(accurate: bool = True) -> TokenCounter:
+    """
+    Get the token counter for Anthropic LLMs.
+
+    Counts with the tokenizer shipped with the Anthropic client when available, and estimates otherwise.
+
+    Args:
+        accurate(:obj:`bool`, defaults to True): Whether to use the tokenizer when available. Estimates are much
+            faster on long texts.
+
+    Returns:
+        TokenCounter: Token counter.
+    """
+
+    if accurate:
+        try:
+            from anthropic._tokenizers import sync_get_tokenizer
+
+            tokenizer = sync_get_tokenizer()
+            return TokenizerCounter(name='claude', encode=lambda text: tokenizer.encode(text).ids)
+        except (ImportError, OSError):
+            pass
+
+    # Calibrated on English prose and code
+    return EstimatedCounter(name='claude-estimate', characters_per_token=3.5)
+
+
+@cache
+def openai_counter(accurate: bool = True) -> TokenCounter:
+    """
+    Get the token counter for OpenAI LLMs.
+
+    Counts with tiktoken when it is installed, and estimates otherwise.
+
+    Args:
+        accurate(:obj:`bool`, defaults to True): Whether to use the tokenizer when available. Estimates are much
+            faster on long texts.
+
+    Returns:
+        TokenCounter: Token counter.
+    """
+
+    if accurate:
+        try:
+            import tiktoken
+
+            encoding = tiktoken.get_encoding('cl100k_base')
+            return TokenizerCounter(
+                name='cl100k_base',
+                encode=lambda text: encoding.encode(text, disallowed_special=())
+            )
+        except (ImportError, OSError, ValueError):
+            pass
+
+    # Calibrated on English prose and code
+    return EstimatedCounter(name='cl100k_base-estimate', characters_per_token=4.0)
+
+
+def count_messages_openai(messages: list[dict], counter: TokenCounter = None) -> int:
+    """
+    Count the prompt tokens of a list of messages in OpenAI's format.
+
+    Args:
+        messages(:obj:`list(dict)`): Messages in OpenAI's format.
+        counter(:obj:`TokenCounter`, optional): Token counter. Defaults to the counter for OpenAI LLMs.
+
+    Returns:
+        int: Number of prompt tokens.
+    """
+
+    counter = counter or openai_counter()
+
+    return sum(
+        OPENAI_TOKENS_PER_MESSAGE + counter.count(message['role']) + counter.count(message['content'])
+        for message in messages
+    ) + OPENAI_TOKENS_PER_REPLY
@@ -1,2 +1,27 @@
-from llmbox.llms.claude import ClaudeInstant1, Claude2
-from llmbox.llms.gpt import GPT35Turbo, GPT4
+import importlib
+
+# LLMs are imported on first use, so only the client of the LLMs used is loaded
+_LLMS = {
+    'Claude': 'llmbox.llms.claude',
+    'ClaudeInstant1': 'llmbox.llms.claude',
+    'Claude2': 'llmbox.llms.claude',
+    'GPT': 'llmbox.llms.gpt',
+    'GPT35Turbo': 'llmbox.llms.gpt',
+    'GPT4': 'llmbox.llms.gpt'
+}
+
+__all__ = list(_LLMS)
+
+
+def __getattr__(name: str):
+    if name not in _LLMS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    llm = getattr(importlib.import_module(_LLMS[name]), name)
+    globals()[name] = llm
+
+    return llm
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
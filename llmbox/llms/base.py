@@ -1,5 +1,28 @@
 from abc import ABC, abstractmethod
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import aclosing, closing
 from enum import Enum
+import time
+from typing import AsyncIterator, Callable, Iterator
+
+from .cache import BaseCache
+from .coalesce import SingleFlight
+from .config import GenerationConfig
+from .breaker import CircuitBreaker, CircuitOpenError, circuit_breakers
+from .concurrency import AdaptiveConcurrency, concurrency_limits, observing
+from .hedging import HedgingPolicy
+from .metrics import Measurement, metrics
+from .ratelimit import rate_limiters
+from ..chat import Chat, Message
+from ..chat.context import ContextPolicy
+from ..chat.tokens import OPENAI_TOKENS_PER_REPLY, anthropic_counter, count_messages_openai, openai_counter
+from ..tracing import Span, tracer
+
+
+# Number of tokens left for the response in the context window when the maximum is not set
+DEFAULT_COMPLETION_TOKENS = 300
 
 
 class LLMCreator(Enum):
@@ -9,23 +32,796 @@ class LLMCreator(Enum):
     OPENAI = 'openai'
 
 
+class StreamEvent:
+    """
+    Class for an event of a streamed response.
+
+    Args:
+        text(:obj:`str`, defaults to ''): Text generated since the previous event.
+        stop_reason(:obj:`str`, optional): Reason the LLM stopped generating.
+        prompt_tokens(:obj:`int`, optional): Number of tokens in the prompt.
+        completion_tokens(:obj:`int`, optional): Number of tokens in the generated response.
+        final(:obj:`bool`, defaults to False): Whether this is the final event of the stream.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.chat import Chat, Message, Role
+
+            llm = Claude2()
+            chat = Chat()
+
+            chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
+            for event in llm.generate_stream(chat=chat):
+                if event.final:
+                    print(event.stop_reason, event.prompt_tokens, event.completion_tokens)
+                else:
+                    print(event.text, end='')
+    """
+
+    def __init__(
+        self,
+        text: str = '',
+        stop_reason: str = None,
+        prompt_tokens: int = None,
+        completion_tokens: int = None,
+        final: bool = False
+    ) -> None:
+        self.text = text
+        self.stop_reason = stop_reason
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.final = final
+
+    def __repr__(self):
+        if self.final:
+            return (f'<Stop reason: {self.stop_reason}, Prompt tokens: {self.prompt_tokens}, '
+                    f'Completion tokens: {self.completion_tokens}>')
+
+        return f'<Text: {self.text}>'
+
+
 class BaseLLM(ABC):
     """
     Base class for LLMs.
 
+    Subclasses build the arguments of a generation and implement the requests to their creator's API, while this
+    class runs every request through the shared steps such as caching, sharing identical requests in flight,
+    hedging, circuit breaking, rate limiting and adaptive concurrency.
+
     Args:
         creator(:obj:`LLMCreator`): Creator of the LLM
+        api_key(:obj:`str`, optional): API key the requests are made with, LLMs with the same creator and API key
+            share rate limits.
+        base_url(:obj:`str`, optional): Base URL the requests are made to, LLMs with the same creator and base URL
+            share circuit breakers.
+        cache(:obj:`BaseCache`, optional): Cache for generated responses.
+        single_flight(:obj:`SingleFlight`, optional): Group through which identical requests in flight are shared.
+        hedging(:obj:`HedgingPolicy`, optional): Policy for hedging slow requests with a duplicate request.
+        fallback(:obj:`BaseLLM`, optional): LLM the requests divert to while the circuit breaker is open.
+        context_policy(:obj:`ContextPolicy`, optional): Policy choosing which turns of a chat are sent, within the
+            context window of the model.
     """
 
-    def __init__(self, creator: LLMCreator) -> None:
+    def __init__(
+        self,
+        creator: LLMCreator,
+        api_key: str = None,
+        base_url: str = None,
+        cache: BaseCache = None,
+        single_flight: SingleFlight = None,
+        hedging: HedgingPolicy = None,
+        fallback: 'BaseLLM' = None,
+        context_policy: ContextPolicy = None
+    ) -> None:
         self._creator = creator
+        self._rate_limit_key = api_key
+        self._base_url = base_url
+        self._cache = cache
+        self._single_flight = single_flight
+        self._hedging = hedging
+        self._fallback = fallback
+        self._context_policy = context_policy
 
     @abstractmethod
     def generate(self, **kwargs):
         pass
 
+    @abstractmethod
+    async def agenerate(self, **kwargs):
+        pass
+
+    @abstractmethod
+    def generate_stream(self, **kwargs):
+        pass
+
+    @abstractmethod
+    def agenerate_stream(self, **kwargs):
+        pass
+
+    @abstractmethod
+    def _create(self, arguments: dict) -> str:
+        pass
+
+    @abstractmethod
+    async def _acreate(self, arguments: dict) -> str:
+        pass
+
+    @abstractmethod
+    def _create_stream(self, arguments: dict) -> Iterator[StreamEvent]:
+        pass
+
+    @abstractmethod
+    def _acreate_stream(self, arguments: dict) -> AsyncIterator[StreamEvent]:
+        pass
+
+    def _complete(self, arguments: dict, use_cache: bool = None, fallback_arguments: dict = None) -> str:
+        key = self._request_key(arguments)
+        use_cache = self._use_cache(arguments, use_cache)
+
+        with tracer.span('llm.generate', self._span_attributes(arguments, stream=False)) as span:
+            with metrics.measure(self._creator, arguments.get('model')) as measurement:
+                # Look up response in cache
+                if use_cache:
+                    response = self._cache.get(key)
+                    if response is not None:
+                        measurement.cache_hit = True
+                        span.set_attribute('llm.cache_hit', True)
+                        return response
+
+                # Generate response, or divert to the fallback LLM while the API is failing
+                try:
+                    response = self._request(key, arguments)
+                except CircuitOpenError as error:
+                    if self._fallback is None or fallback_arguments is None:
+                        raise
+                    measurement.fail(error)
+                    span.set_attribute('llm.fallback', True)
+                    return self._fallback.generate(**fallback_arguments)
+
+                measurement.arguments = arguments
+                measurement.completion = response
+
+            span.set_attributes(_token_attributes(measurement))
+
+        if use_cache:
+            self._cache.set(key, response)
+
+        return response
+
+    async def _acomplete(self, arguments: dict, use_cache: bool = None, fallback_arguments: dict = None) -> str:
+        key = self._request_key(arguments)
+        use_cache = self._use_cache(arguments, use_cache)
+
+        with tracer.span('llm.generate', self._span_attributes(arguments, stream=False)) as span:
+            with metrics.measure(self._creator, arguments.get('model')) as measurement:
+                # Look up response in cache
+                if use_cache:
+                    response = self._cache.get(key)
+                    if response is not None:
+                        measurement.cache_hit = True
+                        span.set_attribute('llm.cache_hit', True)
+                        return response
+
+                # Generate response, or divert to the fallback LLM while the API is failing
+                try:
+                    response = await self._arequest(key, arguments)
+                except CircuitOpenError as error:
+                    if self._fallback is None or fallback_arguments is None:
+                        raise
+                    measurement.fail(error)
+                    span.set_attribute('llm.fallback', True)
+                    return await self._fallback.agenerate(**fallback_arguments)
+
+                measurement.arguments = arguments
+                measurement.completion = response
+
+            span.set_attributes(_token_attributes(measurement))
+
+        if use_cache:
+            self._cache.set(key, response)
+
+        return response
+
+    def _complete_stream(
+        self,
+        arguments: dict,
+        use_cache: bool = None,
+        fallback_arguments: dict = None
+    ) -> Iterator[StreamEvent]:
+        key = self._request_key(arguments)
+        use_cache = self._use_cache(arguments, use_cache)
+
+        # The span is only current while the stream is read, not while the caller holds an event
+        span = tracer.start_span('llm.generate', self._span_attributes(arguments, stream=True))
+        try:
+            with metrics.measure(self._creator, arguments.get('model'), stream=True) as measurement:
+                # Look up response in cache
+                if use_cache:
+                    response = self._cache.get(key)
+                    if response is not None:
+                        measurement.cache_hit = True
+                        measurement.mark_first_token()
+                        span.set_attribute('llm.cache_hit', True)
+                        yield StreamEvent(text=response)
+                        yield StreamEvent(final=True)
+                        return
+
+                # Stream response, or divert to the fallback LLM while the API is failing
+                completion = []
+                try:
+                    with closing(self._request_stream(key, arguments)) as stream:
+                        while True:
+                            with tracer.activate(span):
+                                event = next(stream, _END)
+                            if event is _END:
+                                break
+                            _measure_event(measurement, span, event)
+                            completion.append(event.text)
+                            yield event
+                except CircuitOpenError as error:
+                    if self._fallback is None or fallback_arguments is None:
+                        raise
+                    measurement.fail(error)
+                    span.set_attribute('llm.fallback', True)
+                    with closing(self._fallback.generate_stream(**fallback_arguments)) as stream:
+                        yield from stream
+                    return
+
+                measurement.arguments = arguments
+                measurement.completion = ''.join(completion)
+
+            span.set_attributes(_token_attributes(measurement))
+        except Exception as error:
+            span.fail(error)
+            raise
+        finally:
+            span.end()
+
+        # Only cache responses that were streamed to the end
+        if use_cache:
+            self._cache.set(key, measurement.completion)
+
+    async def _acomplete_stream(
+        self,
+        arguments: dict,
+        use_cache: bool = None,
+        fallback_arguments: dict = None
+    ) -> AsyncIterator[StreamEvent]:
+        key = self._request_key(arguments)
+        use_cache = self._use_cache(arguments, use_cache)
+
+        # The span is only current while the stream is read, not while the caller holds an event
+        span = tracer.start_span('llm.generate', self._span_attributes(arguments, stream=True))
+        try:
+            with metrics.measure(self._creator, arguments.get('model'), stream=True) as measurement:
+                # Look up response in cache
+                if use_cache:
+                    response = self._cache.get(key)
+                    if response is not None:
+                        measurement.cache_hit = True
+                        measurement.mark_first_token()
+                        span.set_attribute('llm.cache_hit', True)
+                        yield StreamEvent(text=response)
+                        yield StreamEvent(final=True)
+                        return
+
+                # Stream response, or divert to the fallback LLM while the API is failing
+                completion = []
+                try:
+                    async with aclosing(self._arequest_stream(key, arguments)) as stream:
+                        while True:
+                            with tracer.activate(span):
+                                event = await anext(stream, _END)
+                            if event is _END:
+                                break
+                            _measure_event(measurement, span, event)
+                            completion.append(event.text)
+                            yield event
+                except CircuitOpenError as error:
+                    if self._fallback is None or fallback_arguments is None:
+                        raise
+                    measurement.fail(error)
+                    span.set_attribute('llm.fallback', True)
+                    async with aclosing(self._fallback.agenerate_stream(**fallback_arguments)) as stream:
+                        async for event in stream:
+                            yield event
+                    return
+
+                measurement.arguments = arguments
+                measurement.completion = ''.join(completion)
+
+            span.set_attributes(_token_attributes(measurement))
+        except Exception as error:
+            span.fail(error)
+            raise
+        finally:
+            span.end()
+
+        # Only cache responses that were streamed to the end
+        if use_cache:
+            self._cache.set(key, measurement.completion)
+
+    def _request(self, key: str, arguments: dict) -> str:
+        # Share identical requests in flight
+        if self._single_flight is not None:
+            return self._single_flight.do(key, lambda: self._hedge(arguments))
+
+        return self._hedge(arguments)
+
+    async def _arequest(self, key: str, arguments: dict) -> str:
+        # Share identical requests in flight
+        if self._single_flight is not None:
+            return await self._single_flight.ado(key, lambda: self._ahedge(arguments))
+
+        return await self._ahedge(arguments)
+
+    def _request_stream(self, key: str, arguments: dict) -> Iterator[StreamEvent]:
+        # Share identical streams in flight
+        if self._single_flight is not None:
+            return self._single_flight.stream(key, lambda: self._hedge_stream(arguments))
+
+        return self._hedge_stream(arguments)
+
+    def _arequest_stream(self, key: str, arguments: dict) -> AsyncIterator[StreamEvent]:
+        # Share identical streams in flight
+        if self._single_flight is not None:
+            return self._single_flight.astream(key, lambda: self._ahedge_stream(arguments))
+
+        return self._ahedge_stream(arguments)
+
+    def _hedge(self, arguments: dict) -> str:
+        # Race a duplicate request against a slow one
+        if self._hedging is not None:
+            return self._hedging.run(lambda: self._call(arguments))
+
+        return self._call(arguments)
+
+    async def _ahedge(self, arguments: dict) -> str:
+        # Race a duplicate request against a slow one
+        if self._hedging is not None:
+            return await self._hedging.arun(lambda: self._acall(arguments))
+
+        return await self._acall(arguments)
+
+    def _hedge_stream(self, arguments: dict) -> Iterator[StreamEvent]:
+        # Race a duplicate stream against a slow one
+        if self._hedging is not None:
+            return self._hedging.stream(lambda: self._call_stream(arguments))
+
+        return self._call_stream(arguments)
+
+    def _ahedge_stream(self, arguments: dict) -> AsyncIterator[StreamEvent]:
+        # Race a duplicate stream against a slow one
+        if self._hedging is not None:
+            return self._hedging.astream(lambda: self._acall_stream(arguments))
+
+        return self._acall_stream(arguments)
+
+    def _call(self, arguments: dict) -> str:
+        with tracer.span('llm.admit'):
+            breaker, controller = self._admit(arguments)
+        try:
+            start = time.monotonic()
+            try:
+                with observing(controller), tracer.span('llm.api'):
+                    response = self._create(arguments)
+            except Exception as error:
+                self._record_error(error, breaker, controller)
+                raise
+            self._record_success(time.monotonic() - start, False, breaker, controller)
+
+            return response
+        finally:
+            if controller is not None:
+                controller.release()
+
+    async def _acall(self, arguments: dict) -> str:
+        with tracer.span('llm.admit'):
+            breaker, controller = await self._aadmit(arguments)
+        try:
+            start = time.monotonic()
+            try:
+                with observing(controller), tracer.span('llm.api'):
+                    response = await self._acreate(arguments)
+            except Exception as error:
+                self._record_error(error, breaker, controller)
+                raise
+            self._record_success(time.monotonic() - start, False, breaker, controller)
+
+            return response
+        finally:
+            if controller is not None:
+                controller.release()
+
+    def _call_stream(self, arguments: dict) -> Iterator[StreamEvent]:
+        with tracer.span('llm.admit'):
+            breaker, controller = self._admit(arguments)
+        try:
+            # Hold the slot until the stream ends, but judge the API by the time to the first event
+            start = time.monotonic()
+            with closing(self._create_stream(arguments)) as stream:
+                try:
+                    with observing(controller), tracer.span('llm.first_event'):
+                        event = next(stream, None)
+                except Exception as error:
+                    self._record_error(error, breaker, controller)
+                    raise
+                self._record_success(time.monotonic() - start, True, breaker, controller)
+
+                if event is not None:
+                    yield event
+                    yield from stream
+        finally:
+            if controller is not None:
+                controller.release()
+
+    async def _acall_stream(self, arguments: dict) -> AsyncIterator[StreamEvent]:
+        with tracer.span('llm.admit'):
+            breaker, controller = await self._aadmit(arguments)
+        try:
+            # Hold the slot until the stream ends, but judge the API by the time to the first event
+            start = time.monotonic()
+            async with aclosing(self._acreate_stream(arguments)) as stream:
+                try:
+                    with observing(controller), tracer.span('llm.first_event'):
+                        event = await anext(stream, None)
+                except Exception as error:
+                    self._record_error(error, breaker, controller)
+                    raise
+                self._record_success(time.monotonic() - start, True, breaker, controller)
+
+                if event is not None:
+                    yield event
+                    async for event in stream:
+                        yield event
+        finally:
+            if controller is not None:
+                controller.release()
+
+    def _admit(self, arguments: dict) -> tuple:
+        # Fail fast while the API endpoint is failing
+        breaker = circuit_breakers.breaker(self._creator, self._base_url)
+        if breaker is not None:
+            breaker.allow()
+
+        # Wait for the rate limits of the API key
+        limiter = rate_limiters.limiter(self._creator, self._rate_limit_key)
+        if limiter is not None:
+            limiter.acquire(tokens=self._estimate_tokens(arguments))
+
+        # Wait for a free slot of the model's adaptive concurrency limit
+        controller = concurrency_limits.controller(arguments.get('model'))
+        if controller is not None:
+            controller.acquire()
+
+        return breaker, controller
+
+    async def _aadmit(self, arguments: dict) -> tuple:
+        # Fail fast while the API endpoint is failing
+        breaker = circuit_breakers.breaker(self._creator, self._base_url)
+        if breaker is not None:
+            breaker.allow()
+
+        # Wait for the rate limits of the API key
+        limiter = rate_limiters.limiter(self._creator, self._rate_limit_key)
+        if limiter is not None:
+            await limiter.aacquire(tokens=self._estimate_tokens(arguments))
+
+        # Wait for a free slot of the model's adaptive concurrency limit
+        controller = concurrency_limits.controller(arguments.get('model'))
+        if controller is not None:
+            await controller.aacquire()
+
+        return breaker, controller
+
+    def _record_success(
+        self,
+        latency: float,
+        stream: bool,
+        breaker: CircuitBreaker,
+        controller: AdaptiveConcurrency
+    ) -> None:
+        if breaker is not None:
+            breaker.record_success(latency, stream=stream)
+        if controller is not None:
+            controller.record_success(latency, stream=stream)
+
+    def _record_error(self, error: Exception, breaker: CircuitBreaker, controller: AdaptiveConcurrency) -> None:
+        if breaker is not None:
+            breaker.record_error(error)
+        if controller is not None:
+            controller.record_error(error)
+
+    def _estimate_tokens(self, arguments: dict) -> int:
+        # Estimate the tokens in the prompt, plus the tokens the LLM may generate
+        if 'prompt' in arguments:
+            prompt_tokens = anthropic_counter(accurate=False).count(arguments['prompt'])
+        else:
+            prompt_tokens = count_messages_openai(arguments['messages'], counter=openai_counter(accurate=False))
+        max_tokens = arguments.get('max_tokens_to_sample', arguments.get('max_tokens')) or 0
+
+        return prompt_tokens + max_tokens
+
+    def _fit_context(self, chat: Chat, max_tokens: int) -> Chat:
+        if self._context_policy is None:
+            return chat
+
+        # Leave room in the context window for the tokens to generate, models of unknown size are not trimmed to it
+        if max_tokens is None:
+            max_tokens = DEFAULT_COMPLETION_TOKENS
+        budget = None
+        if self._creator is LLMCreator.ANTHROPIC:
+            if self.context_window is not None:
+                budget = self.context_window - max_tokens
+            count = Message.count_tokens_anthropic
+        else:
+            if self.context_window is not None:
+                budget = self.context_window - max_tokens - OPENAI_TOKENS_PER_REPLY
+            count = Message.count_tokens_openai
+
+        with tracer.span('chat.fit_context', {'chat.messages': len(chat.messages)}):
+            return self._context_policy.apply(chat, max_tokens=budget, count=count)
+
+    def _span_attributes(self, arguments: dict, stream: bool) -> dict:
+        return {
+            'llm.creator': self._creator.value,
+            'llm.model': arguments.get('model'),
+            'llm.stream': stream,
+            'llm.cache_hit': False
+        }
+
+    def _fallback_arguments(self, chat: Chat, config: GenerationConfig, use_cache: bool) -> dict:
+        if self._fallback is None:
+            return None
+
+        # Only pass the arguments every LLM takes, so any LLM can be the fallback
+        return {
+            'chat': chat,
+            'max_tokens': config.max_tokens,
+            'stop_sequences': list(config.stop_sequences) if config.stop_sequences is not None else None,
+            'temperature': config.temperature,
+            'top_p': config.top_p,
+            'use_cache': use_cache
+        }
+
+    def _request_key(self, arguments: dict) -> str:
+        if self._cache is None and self._single_flight is None:
+            return None
+
+        return BaseCache.key(arguments)
+
+    def _use_cache(self, arguments: dict, use_cache: bool) -> bool:
+        if self._cache is None:
+            return False
+
+        # Cache deterministic requests unless the caller decides otherwise
+        if use_cache is None:
+            return arguments.get('temperature') == 0
+
+        return use_cache
+
+    def generate_many(
+        self,
+        chats: list[Chat],
+        max_concurrency: int = 8,
+        return_exceptions: bool = False,
+        progress: Callable[[int, int], None] = None,
+        **kwargs
+    ) -> list:
+        """
+        Generate responses to many chats concurrently using a pool of threads.
+
+        Args:
+            chats(:obj:`list(Chat)`): Chats to generate responses for.
+            max_concurrency(:obj:`int`, defaults to 8): Maximum number of requests in flight at the same time.
+            return_exceptions(:obj:`bool`, defaults to False): Whether to return the exception of a failed chat in
+                place of its response instead of raising it.
+            progress(:obj:`callable`, optional): Function called with the number of completed chats and the total
+                number of chats every time a chat completes.
+            **kwargs: Generation arguments passed to `generate` for every chat.
+
+        Returns:
+            list: Generated responses from the LLM in the same order as the chats
+
+        Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.chat import Chat, Message, Role
+
+            llm = Claude2()
+            chats = []
+            for question in ['How big is the earth?', 'How big is the moon?']:
+                chat = Chat()
+                chat.add_message(message=Message(text=question, role=Role.User))
+                chats.append(chat)
+
+            responses = llm.generate_many(chats=chats, max_concurrency=2, return_exceptions=True)
+            print(responses)
+        """
+
+        # Verify concurrency
+        if max_concurrency < 1:
+            raise ValueError('Maximum concurrency must be at least 1.')
+
+        chats = list(chats)
+        responses = [None] * len(chats)
+        completed = 0
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            # Run each chat with the context of the caller, so its spans nest under the current one
+            futures = {
+                executor.submit(contextvars.copy_context().run, self.generate, chat=chat, **kwargs): i
+                for i, chat in enumerate(chats)
+            }
+            try:
+                for future in as_completed(futures):
+                    try:
+                        responses[futures[future]] = future.result()
+                    except Exception as error:
+                        if not return_exceptions:
+                            raise
+                        responses[futures[future]] = error
+
+                    # Report progress
+                    completed += 1
+                    if progress is not None:
+                        progress(completed, len(chats))
+            except BaseException:
+                # Fail fast by dropping the chats that have not started yet
+                for future in futures:
+                    future.cancel()
+                raise
+
+        return responses
+
+    async def agenerate_many(
+        self,
+        chats: list[Chat],
+        max_concurrency: int = 8,
+        return_exceptions: bool = False,
+        progress: Callable[[int, int], None] = None,
+        **kwargs
+    ) -> list:
+        """
+        Generate responses to many chats concurrently on the running event loop.
+
+        Args:
+            chats(:obj:`list(Chat)`): Chats to generate responses for.
+            max_concurrency(:obj:`int`, defaults to 8): Maximum number of requests in flight at the same time.
+            return_exceptions(:obj:`bool`, defaults to False): Whether to return the exception of a failed chat in
+                place of its response instead of raising it.
+            progress(:obj:`callable`, optional): Function called with the number of completed chats and the total
+                number of chats every time a chat completes.
+            **kwargs: Generation arguments passed to `agenerate` for every chat.
+
+        Returns:
+            list: Generated responses from the LLM in the same order as the chats
+
+        Example:
+
+        .. code-block:: python
+
+            import asyncio
+
+            from llmbox.llms import Claude2
+            from llmbox.chat import Chat, Message, Role
+
+            llm = Claude2()
+            chats = []
+            for question in ['How big is the earth?', 'How big is the moon?']:
+                chat = Chat()
+                chat.add_message(message=Message(text=question, role=Role.User))
+                chats.append(chat)
+
+            responses = asyncio.run(llm.agenerate_many(chats=chats, max_concurrency=2, return_exceptions=True))
+            print(responses)
+        """
+
+        # Verify concurrency
+        if max_concurrency < 1:
+            raise ValueError('Maximum concurrency must be at least 1.')
+
+        chats = list(chats)
+        responses = [None] * len(chats)
+        completed = 0
+        pending = iter(enumerate(chats))
+
+        async def worker():
+            nonlocal completed
+
+            # Workers share the iterator so at most `max_concurrency` requests are in flight
+            for i, chat in pending:
+                try:
+                    responses[i] = await self.agenerate(chat=chat, **kwargs)
+                except Exception as error:
+                    if not return_exceptions:
+                        raise
+                    responses[i] = error
+
+                # Report progress
+                completed += 1
+                if progress is not None:
+                    progress(completed, len(chats))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(max_concurrency, len(chats)))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            # Fail fast by cancelling the requests still in flight
+            for task in workers:
+                task.cancel()
+            raise
+
+        return responses
+
     @property
     def creator(self) -> str:
         """str: Creator of the LLM."""
 
         return self._creator.name
+
+    @property
+    def model(self) -> str:
+        """str: Name of the model."""
+
+        return None
+
+    @property
+    def context_window(self) -> int:
+        """int: Number of tokens the model can attend to, prompt and response included. None if unknown."""
+
+        return None
+
+    @property
+    def context_policy(self) -> ContextPolicy:
+        """ContextPolicy: Policy choosing which turns of a chat are sent."""
+
+        return self._context_policy
+
+    @property
+    def cache(self) -> BaseCache:
+        """BaseCache: Cache for generated responses."""
+
+        return self._cache
+
+    @property
+    def single_flight(self) -> SingleFlight:
+        """SingleFlight: Group through which identical requests in flight are shared."""
+
+        return self._single_flight
+
+    @property
+    def hedging(self) -> HedgingPolicy:
+        """HedgingPolicy: Policy for hedging slow requests with a duplicate request."""
+
+        return self._hedging
+
+    @property
+    def fallback(self) -> 'BaseLLM':
+        """BaseLLM: LLM the requests divert to while the circuit breaker is open."""
+
+        return self._fallback
+
+
+_END = object()
+
+
+def _measure_event(measurement: Measurement, span: Span, event: StreamEvent) -> None:
+    # Time the first text, and take the token usage the API reports at the end of a stream
+    if event.final:
+        if event.prompt_tokens is not None:
+            measurement.prompt_tokens = event.prompt_tokens
+        if event.completion_tokens is not None:
+            measurement.completion_tokens = event.completion_tokens
+    elif event.text and measurement.first_token is None:
+        measurement.mark_first_token()
+        span.add_event('llm.first_token')
+
+
+def _token_attributes(measurement: Measurement) -> dict:
+    return {'llm.prompt_tokens': measurement.prompt_tokens, 'llm.completion_tokens': measurement.completion_tokens}
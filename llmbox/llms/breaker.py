@@ -0,0 +1,322 @@
+from collections import deque
+from enum import Enum
+import threading
+import time
+
+
+class BreakerState(Enum):
+    """List of circuit breaker states."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Error raised instead of making a request while the circuit breaker of the API is open."""
+
+
+class CircuitBreaker:
+    """
+    Class for a circuit breaker guarding the requests to an API.
+
+    While closed, requests go through and their outcomes are recorded. Once the share of failed or slow requests in
+    the recent window reaches the threshold, the breaker opens and requests fail right away with a
+    `CircuitOpenError`. After a while it half-opens and lets a single probe request through, which closes the
+    breaker if it succeeds or opens it again if it fails. Server errors, timeouts and connection errors count as
+    failures, while client errors such as invalid requests do not.
+
+    Streamed requests are judged by the time to their first event, against a threshold of their own, since their
+    total duration grows with the length of the completion rather than with the load of the API.
+
+    Args:
+        failure_threshold(:obj:`float`, defaults to 0.5): Share of failed or slow requests that opens the breaker.
+        min_requests(:obj:`int`, defaults to 10): Number of requests in the window before the breaker can open.
+        window(:obj:`float`, defaults to 60.0): Number of seconds of recent requests the share is computed over.
+        open_duration(:obj:`float`, defaults to 30.0): Number of seconds the breaker stays open before a probe.
+        slow_latency(:obj:`float`, optional): Number of seconds after which a successful request counts as slow.
+        slow_first_event(:obj:`float`, optional): Number of seconds to the first event after which a successful
+            streamed request counts as slow.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms.breaker import CircuitBreaker, CircuitOpenError
+
+            breaker = CircuitBreaker(failure_threshold=0.5, open_duration=10.0)
+
+            breaker.allow()
+            try:
+                ...
+            except Exception as error:
+                breaker.record_error(error)
+            print(breaker.state)
+    """
+
+    def __init__(
+        self,
+        failure_threshold: float = 0.5,
+        min_requests: int = 10,
+        window: float = 60.0,
+        open_duration: float = 30.0,
+        slow_latency: float = None,
+        slow_first_event: float = None
+    ) -> None:
+        # Verify arguments
+        if not 0 < failure_threshold <= 1:
+            raise ValueError('Failure threshold must be between 0 and 1.')
+        if min_requests < 1:
+            raise ValueError('Minimum number of requests must be at least 1.')
+
+        self._failure_threshold = failure_threshold
+        self._min_requests = min_requests
+        self._window = window
+        self._open_duration = open_duration
+        self._slow_latency = slow_latency
+        self._slow_first_event = slow_first_event
+        self._lock = threading.Lock()
+        self._state = BreakerState.CLOSED
+        self._outcomes = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_at = None
+        self._opens = 0
+        self._rejected = 0
+
+    def allow(self) -> None:
+        """
+        Let a request through, or fail fast while the breaker is open.
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with a probe in flight.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            if self._state is BreakerState.CLOSED:
+                return
+
+            # Half-open once the breaker has been open long enough, and let a probe through
+            now = time.monotonic()
+            if self._state is BreakerState.OPEN and now - self._opened_at >= self._open_duration:
+                self._state = BreakerState.HALF_OPEN
+                self._probe_at = None
+
+            # Replace a probe that never reported back
+            if self._state is BreakerState.HALF_OPEN and (
+                self._probe_at is None or now - self._probe_at >= self._open_duration
+            ):
+                self._probe_at = now
+                return
+
+            self._rejected += 1
+
+        raise CircuitOpenError('Circuit breaker is open, the API is failing. Try again later.')
+
+    def record_success(self, latency: float = None, stream: bool = False) -> None:
+        """
+        Record a successful request.
+
+        Args:
+            latency(:obj:`float`, optional): Number of seconds the request took, or until the first event for streams.
+            stream(:obj:`bool`, defaults to False): Whether the request was streamed.
+
+        Returns:
+            None: None
+        """
+
+        # Compare with the threshold of the same kind of requests
+        slow_latency = self._slow_first_event if stream else self._slow_latency
+        slow = latency is not None and slow_latency is not None and latency > slow_latency
+        self._record(failed=slow)
+
+    def record_error(self, error: Exception) -> None:
+        """
+        Record a failed request. Client errors count as successes, since the API did respond.
+
+        Args:
+            error(Exception): Error raised by the request.
+
+        Returns:
+            None: None
+        """
+
+        status_code = getattr(error, 'status_code', None) or getattr(error, 'http_status', None)
+        self._record(failed=status_code is None or status_code >= 500)
+
+    def reset(self) -> None:
+        """
+        Close the breaker and forget the recent requests.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._close()
+
+    def _record(self, failed: bool) -> None:
+        with self._lock:
+            now = time.monotonic()
+
+            # Settle the probe of a half-open breaker
+            if self._state is BreakerState.HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    self._close()
+                return
+            if self._state is BreakerState.OPEN:
+                return
+
+            # Keep the outcomes of the recent window
+            self._outcomes.append((now, failed))
+            self._failures += failed
+            while self._outcomes and self._outcomes[0][0] < now - self._window:
+                self._failures -= self._outcomes.popleft()[1]
+
+            if len(self._outcomes) >= self._min_requests and \
+                    self._failures / len(self._outcomes) >= self._failure_threshold:
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        self._state = BreakerState.OPEN
+        self._opened_at = now
+        self._opens += 1
+
+    def _close(self) -> None:
+        self._state = BreakerState.CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+
+    @property
+    def state(self) -> BreakerState:
+        """BreakerState: Current state of the breaker."""
+
+        # Report an open breaker as half-open once a probe would be let through
+        if self._state is BreakerState.OPEN and time.monotonic() - self._opened_at >= self._open_duration:
+            return BreakerState.HALF_OPEN
+
+        return self._state
+
+    @property
+    def stats(self) -> dict:
+        """dict: State of the breaker, recent requests and failures, times opened and requests rejected."""
+
+        with self._lock:
+            requests = len(self._outcomes)
+
+            return {
+                'state': self.state.value,
+                'requests': requests,
+                'failures': self._failures,
+                'failure_rate': self._failures / requests if requests else 0.0,
+                'opens': self._opens,
+                'rejected': self._rejected
+            }
+
+
+class CircuitBreakerRegistry:
+    """
+    Class for a registry of circuit breakers shared by all LLMs calling the same API endpoint.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2, GPT4
+            from llmbox.llms.base import LLMCreator
+            from llmbox.llms.breaker import circuit_breakers
+
+            circuit_breakers.configure(
+                LLMCreator.ANTHROPIC, failure_threshold=0.5, slow_latency=30.0, slow_first_event=5.0
+            )
+
+            # Requests divert to GPT-4 while the Anthropic API is failing
+            llm = Claude2(fallback=GPT4())
+            print(circuit_breakers.stats)
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._settings = {}
+        self._breakers = {}
+
+    def configure(self, creator: Enum, base_url: str = None, **kwargs) -> None:
+        """
+        Guard the endpoints of a creator with circuit breakers. Settings for a specific base URL take precedence.
+
+        Args:
+            creator(LLMCreator): Creator of the LLMs.
+            base_url(:obj:`str`, optional): Base URL the settings apply to. Defaults to every base URL of the
+                creator.
+            **kwargs: Arguments of `CircuitBreaker`.
+
+        Returns:
+            None: None
+        """
+
+        # Verify arguments
+        CircuitBreaker(**kwargs)
+
+        with self._lock:
+            self._settings[(creator, base_url)] = kwargs
+
+            # Drop breakers with outdated settings, they are recreated on the next request
+            for key in list(self._breakers):
+                if key[0] == creator and (base_url is None or key[1] == base_url):
+                    del self._breakers[key]
+
+    def breaker(self, creator: Enum, base_url: str) -> CircuitBreaker:
+        """
+        Get the circuit breaker of an API endpoint.
+
+        Args:
+            creator(LLMCreator): Creator of the LLM.
+            base_url(str): Base URL of the LLM, None for the default endpoint.
+
+        Returns:
+            CircuitBreaker: Circuit breaker, or None if the endpoint is not guarded.
+        """
+
+        with self._lock:
+            breaker = self._breakers.get((creator, base_url))
+            if breaker is None:
+                settings = self._settings.get((creator, base_url), self._settings.get((creator, None)))
+                if settings is None:
+                    return None
+
+                breaker = CircuitBreaker(**settings)
+                self._breakers[(creator, base_url)] = breaker
+
+        return breaker
+
+    def clear(self) -> None:
+        """
+        Remove all settings and circuit breakers.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._settings.clear()
+            self._breakers.clear()
+
+    @property
+    def stats(self) -> list[dict]:
+        """list: Creator, base URL, state and statistics of each circuit breaker."""
+
+        with self._lock:
+            breakers = list(self._breakers.items())
+
+        return [
+            {'creator': creator.name, 'base_url': base_url, **breaker.stats}
+            for (creator, base_url), breaker in breakers
+        ]
+
+
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,361 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class BaseCache(ABC):
+    """
+    Base class for caches of generated responses.
+
+    Subclasses store and retrieve responses by key, while this class keeps count of hits and misses.
+    """
+
+    def __init__(self) -> None:
+        self._hits = 0
+        self._misses = 0
+        self._counter_lock = threading.Lock()
+
+    @abstractmethod
+    def _get(self, key: str) -> str:
+        pass
+
+    @abstractmethod
+    def _set(self, key: str, response: str) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    def get(self, key: str) -> str:
+        """
+        Get a response from the cache.
+
+        Args:
+            key(str): Key of the response.
+
+        Returns:
+            str: Cached response, or None if the key is not in the cache.
+        """
+
+        response = self._get(key)
+
+        # Update counters
+        with self._counter_lock:
+            if response is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+
+        return response
+
+    def set(self, key: str, response: str) -> None:
+        """
+        Add a response to the cache.
+
+        Args:
+            key(str): Key of the response.
+            response(str): Response to be cached.
+
+        Returns:
+            None: None
+        """
+
+        self._set(key, response)
+
+    @staticmethod
+    def key(arguments: dict) -> str:
+        """
+        Create a cache key from the arguments of an LLM generation.
+
+        The arguments contain the model name, the prompt in the format of the LLM creator and the sampling
+        parameters, so identical requests map to the same key across processes.
+
+        Args:
+            arguments(dict): Arguments of the LLM generation.
+
+        Returns:
+            str: Cache key.
+        """
+
+        return hashlib.sha256(json.dumps(arguments, sort_keys=True).encode()).hexdigest()
+
+    @property
+    def hits(self) -> int:
+        """int: Number of lookups that found a response."""
+
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """int: Number of lookups that did not find a response."""
+
+        return self._misses
+
+    @property
+    def stats(self) -> dict:
+        """dict: Hits, misses and hit rate of the cache."""
+
+        lookups = self._hits + self._misses
+
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate': self._hits / lookups if lookups else 0.0
+        }
+
+
+class LRUCache(BaseCache):
+    """
+    In-memory cache that evicts the least recently used response once full.
+
+    Args:
+        max_size(:obj:`int`, defaults to 1024): Maximum number of responses to keep.
+        ttl(:obj:`float`, optional): Number of seconds after which a response expires.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.llms.cache import LRUCache
+
+            llm = Claude2(cache=LRUCache(max_size=256))
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = None) -> None:
+        # Initialize parent class
+        super().__init__()
+
+        # Verify size
+        if max_size < 1:
+            raise ValueError('Maximum size of the cache must be at least 1.')
+
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> str:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            # Drop expired response
+            response, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+
+            return response
+
+    def _set(self, key: str, response: str) -> None:
+        expires_at = time.time() + self._ttl if self._ttl is not None else None
+
+        with self._lock:
+            self._entries[key] = (response, expires_at)
+            self._entries.move_to_end(key)
+
+            # Evict least recently used responses
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all responses from the cache."""
+
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def max_size(self) -> int:
+        """int: Maximum number of responses to keep."""
+
+        return self._max_size
+
+    @property
+    def ttl(self) -> float:
+        """float: Number of seconds after which a response expires."""
+
+        return self._ttl
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache(BaseCache):
+    """
+    Persistent cache stored in a SQLite database on disk.
+
+    Args:
+        path(:obj:`str`, defaults to 'llmbox_cache.sqlite'): Path of the SQLite database.
+        ttl(:obj:`float`, optional): Number of seconds after which a response expires.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.llms.cache import SQLiteCache
+
+            llm = Claude2(cache=SQLiteCache(path='responses.sqlite', ttl=24 * 60 * 60))
+    """
+
+    def __init__(self, path: str = 'llmbox_cache.sqlite', ttl: float = None) -> None:
+        # Initialize parent class
+        super().__init__()
+
+        self._path = path
+        self._ttl = ttl
+        self._lock = threading.Lock()
+
+        # Connect to database
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT, expires_at REAL)'
+            )
+
+        # Remove responses that expired while the database was closed
+        self.evict_expired()
+
+    def _get(self, key: str) -> str:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT response, expires_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            # Drop expired response
+            response, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                with self._connection:
+                    self._connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                return None
+
+            return response
+
+    def _set(self, key: str, response: str) -> None:
+        expires_at = time.time() + self._ttl if self._ttl is not None else None
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)',
+                (key, response, expires_at)
+            )
+
+    def evict_expired(self) -> int:
+        """
+        Remove expired responses from the database.
+
+        Returns:
+            int: Number of responses removed.
+        """
+
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?', (time.time(),)
+            )
+
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        """Remove all responses from the database."""
+
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM responses')
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+
+        with self._lock:
+            self._connection.close()
+
+    @property
+    def path(self) -> str:
+        """str: Path of the SQLite database."""
+
+        return self._path
+
+    @property
+    def ttl(self) -> float:
+        """float: Number of seconds after which a response expires."""
+
+        return self._ttl
+
+
+class TieredCache(BaseCache):
+    """
+    Cache that chains faster caches in front of slower ones.
+
+    Lookups go through the tiers in order and a response found in a slower tier is copied into the faster tiers.
+    New responses are written to every tier.
+
+    Args:
+        tiers(:obj:`list(BaseCache)`): Caches ordered from fastest to slowest.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.llms.cache import LRUCache, SQLiteCache, TieredCache
+
+            cache = TieredCache(tiers=[LRUCache(max_size=256), SQLiteCache(ttl=24 * 60 * 60)])
+            llm = Claude2(cache=cache)
+            print(cache.stats)
+    """
+
+    def __init__(self, tiers: list[BaseCache]) -> None:
+        # Initialize parent class
+        super().__init__()
+
+        # Verify tiers
+        if len(tiers) == 0:
+            raise ValueError('At least one cache tier is required.')
+
+        self._tiers = list(tiers)
+
+    def _get(self, key: str) -> str:
+        for i, tier in enumerate(self._tiers):
+            response = tier.get(key)
+            if response is not None:
+                # Promote response to the faster tiers
+                for faster_tier in self._tiers[:i]:
+                    faster_tier.set(key, response)
+
+                return response
+
+        return None
+
+    def _set(self, key: str, response: str) -> None:
+        for tier in self._tiers:
+            tier.set(key, response)
+
+    def clear(self) -> None:
+        """Remove all responses from every tier."""
+
+        for tier in self._tiers:
+            tier.clear()
+
+    @property
+    def tiers(self) -> list[BaseCache]:
+        """list: Caches ordered from fastest to slowest."""
+
+        return self._tiers
+
+    @property
+    def stats(self) -> dict:
+        """dict: Hits, misses and hit rate of the cache and of each tier."""
+
+        stats = super().stats
+        stats['tiers'] = [tier.stats for tier in self._tiers]
+
+        return stats
@@ -1,10 +1,17 @@
 from enum import Enum
 import os
-
-from anthropic import Anthropic
-
-from .base import BaseLLM, LLMCreator
+from typing import AsyncIterator, Iterator
+
+from .base import BaseLLM, LLMCreator, StreamEvent
+from .cache import BaseCache
+from .clients import registry
+from .config import GenerationConfig, RequestBuilder
+from .coalesce import SingleFlight
+from .hedging import HedgingPolicy
+from .models import model_registry
 from ..chat import Chat
+from ..chat.context import ContextPolicy
+from ..tracing import tracer
 
 
 class ClaudeModels(Enum):
@@ -14,9 +21,9 @@ class ClaudeModels(Enum):
     CLAUDE2 = 'claude-2'
 
 
-class ClaudeInstant1(BaseLLM):
+class Claude(BaseLLM):
     """
-    Class for Claude-Instant-1 LLM by Anthropic.
+    Class for Claude LLMs by Anthropic.
 
     Args:
         auth_token(:obj:`str`, optional): Authentication token for Anthropic client.
@@ -24,15 +31,23 @@ class ClaudeInstant1(BaseLLM):
         base_url(:obj:`str`, optional): Base URL for Anthropic client.
         timeout(:obj:`float`, optional): Maximum time to connect to Anthropic client.
         max_retries(:obj:`int`, optional): Maximum number of attempts to connect to Anthropic client.
+        cache(:obj:`BaseCache`, optional): Cache for generated responses.
+        single_flight(:obj:`SingleFlight`, optional): Group through which identical requests in flight are shared.
+        hedging(:obj:`HedgingPolicy`, optional): Policy for hedging slow requests with a duplicate request.
+        fallback(:obj:`BaseLLM`, optional): LLM the requests divert to while the circuit breaker of the API is open.
+        context_policy(:obj:`ContextPolicy`, optional): Policy choosing which turns of a chat are sent, within the
+            context window of the model.
+        model(:obj:`str`, optional): Name of the model, such as a value of `ClaudeModels`. Defaults to the model of
+            the class.
 
     Example:
 
         .. code-block:: python
 
-            from llmbox.llms import ClaudeInstant1
+            from llmbox.llms.claude import Claude, ClaudeModels
             from llmbox.chat import Chat, Message, Role
 
-            llm = ClaudeInstant1()
+            llm = Claude(model=ClaudeModels.CLAUDE2)
             chat = Chat()
 
             chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
@@ -45,16 +60,50 @@ class ClaudeInstant1(BaseLLM):
             print(next_response)
     """
 
+    # Model of the class, set by the classes of specific models
+    _MODEL = None
+
+    # Builder of the request arguments, naming the settings as Anthropic does
+    _REQUEST_BUILDER = RequestBuilder(arguments={
+        'max_tokens': 'max_tokens_to_sample',
+        'stop_sequences': 'stop_sequences',
+        'temperature': 'temperature',
+        'top_p': 'top_p',
+        'top_k': 'top_k'
+    })
+
     def __init__(
         self,
         auth_token: str = None,
         api_key: str = None,
         base_url: str = None,
         timeout: float = None,
-        max_retries: int = None
+        max_retries: int = None,
+        cache: BaseCache = None,
+        single_flight: SingleFlight = None,
+        hedging: HedgingPolicy = None,
+        fallback: BaseLLM = None,
+        context_policy: ContextPolicy = None,
+        model: str = None
     ) -> None:
+        # Verify model
+        model = model or self._MODEL
+        if model is None:
+            raise ValueError('Model not set. Pass the name of the model using the `model` argument, such as a value '
+                             'of `ClaudeModels`.')
+        self._model = model.value if isinstance(model, Enum) else model
+
         # Initialize parent class
-        super().__init__(creator=LLMCreator.ANTHROPIC)
+        super().__init__(
+            creator=LLMCreator.ANTHROPIC,
+            api_key=api_key or os.environ.get('ANTHROPIC_API_KEY') or auth_token,
+            base_url=base_url,
+            cache=cache,
+            single_flight=single_flight,
+            hedging=hedging,
+            fallback=fallback,
+            context_policy=context_policy
+        )
 
         # Verify authentication
         if auth_token is None and api_key is None and os.environ.get('ANTHROPIC_API_KEY') is None:
@@ -65,19 +114,20 @@ class ClaudeInstant1(BaseLLM):
         # Set input arguments
         self._auth_token = auth_token
         self._api_key = api_key
-        self._base_url = base_url
         self._timeout = timeout
         self._max_retries = max_retries
 
         # Create arguments for Anthropic client
-        anthropic_arguments = {}
-        anthropic_optionals = ['auth_token', 'api_key', 'base_url', 'timeout', 'max_retries']
-        for argument in anthropic_optionals:
-            if eval(argument) is not None:
-                anthropic_arguments[argument] = eval(argument)
+        self._anthropic_arguments = {
+            'auth_token': auth_token,
+            'api_key': api_key,
+            'base_url': base_url,
+            'timeout': timeout,
+            'max_retries': max_retries
+        }
 
-        # Initialize Anthropic client
-        self._anthropic = Anthropic(**anthropic_arguments)
+        # Get Anthropic client shared with the LLMs using the same credentials
+        self._anthropic = registry.anthropic(**self._anthropic_arguments)
 
     def generate(
         self,
@@ -86,7 +136,9 @@ class ClaudeInstant1(BaseLLM):
         stop_sequences: list[str] = None,
         temperature: float = None,
         top_p: float = None,
-        top_k: int = None
+        top_k: int = None,
+        use_cache: bool = None,
+        config: GenerationConfig = None
     ) -> str:
         """
         Generate response to a prompt.
@@ -98,6 +150,9 @@ class ClaudeInstant1(BaseLLM):
             temperature(:obj:`float`, optional): Amount of randomness injected into the response.
             top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
             top_k(:obj:`int`, optional): Number of options to sample from for each subsequent token.
+            use_cache(:obj:`bool`, optional): Whether to use the cache of the LLM. Defaults to caching only
+                requests with zero temperature.
+            config(:obj:`GenerationConfig`, optional): Generation settings, used instead of the settings above.
 
         Returns:
             str: Generated response from the LLM
@@ -118,116 +173,167 @@ class ClaudeInstant1(BaseLLM):
         """
 
         # Create arguments for LLM generation
-        generation_arguments = {
-            'model': 'claude-instant-1',
-            'prompt': chat.generate_prompt_anthropic(),
-            'max_tokens_to_sample': max_tokens
-        }
-        generation_optionals = ['stop_sequences', 'temperature', 'top_p', 'top_k']
-        for argument in generation_optionals:
-            if eval(argument) is not None:
-                generation_arguments[argument] = eval(argument)
+        config = config or GenerationConfig(
+            max_tokens=max_tokens,
+            stop_sequences=stop_sequences,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k
+        )
+        generation_arguments = self._generation_arguments(chat=chat, config=config)
 
         # Generate response
-        response = self._anthropic.completions.create(**generation_arguments).completion
+        response = self._complete(
+            generation_arguments,
+            use_cache=use_cache,
+            fallback_arguments=self._fallback_arguments(chat, config, use_cache)
+        )
 
         return response
 
-    @property
-    def base_url(self):
-        """str: Base URL for Anthropic client."""
-
-        return self._base_url
-
-    @property
-    def timeout(self):
-        """float: Maximum time to connect to Anthropic client."""
-
-        return self._timeout
-
-    @property
-    def max_retries(self):
-        """int: Maximum number of attempts to connect to Anthropic client."""
-
-        return self._max_retries
-
+    async def agenerate(
+        self,
+        chat: Chat,
+        max_tokens: int = 300,
+        stop_sequences: list[str] = None,
+        temperature: float = None,
+        top_p: float = None,
+        top_k: int = None,
+        use_cache: bool = None,
+        config: GenerationConfig = None
+    ) -> str:
+        """
+        Generate response to a prompt asynchronously.
 
-class Claude2(BaseLLM):
-    """
-    Class for Claude-2 LLM by Anthropic.
+        Args:
+            chat(Chat): Chat containing the messages.
+            max_tokens(:obj:`int`, defaults to 300): Maximum number of tokens to generate before stopping.
+            stop_sequences(:obj:`list(str)`, optional): Sequences to stop generating completion text.
+            temperature(:obj:`float`, optional): Amount of randomness injected into the response.
+            top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
+            top_k(:obj:`int`, optional): Number of options to sample from for each subsequent token.
+            use_cache(:obj:`bool`, optional): Whether to use the cache of the LLM. Defaults to caching only
+                requests with zero temperature.
+            config(:obj:`GenerationConfig`, optional): Generation settings, used instead of the settings above.
 
-    Args:
-        auth_token(:obj:`str`, optional): Authentication token for Anthropic client.
-        api_key(:obj:`str`, optional): API Key for Anthropic client.
-        base_url(:obj:`str`, optional): Base URL for Anthropic client.
-        timeout(:obj:`float`, optional): Maximum time to connect to Anthropic client.
-        max_retries(:obj:`int`, optional): Maximum number of attempts to connect to Anthropic client.
+        Returns:
+            str: Generated response from the LLM
 
-    Example:
+        Example:
 
         .. code-block:: python
 
-            from llmbox.llms import Claude2
+            import asyncio
+
+            from llmbox.llms import ClaudeInstant1
             from llmbox.chat import Chat, Message, Role
 
-            llm = Claude2()
+            llm = ClaudeInstant1()
             chat = Chat()
 
             chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
-            response = llm.generate(chat=chat)
+            response = asyncio.run(llm.agenerate(chat=chat))
             print(response)
+        """
 
-            chat.add_message(message=Message(text=response, role=Role.Assistant))
-            chat.add_message(message=Message(text='What about the moon?', role=Role.User))
-            next_response = llm.generate(chat=chat)
-            print(next_response)
-    """
+        # Create arguments for LLM generation
+        config = config or GenerationConfig(
+            max_tokens=max_tokens,
+            stop_sequences=stop_sequences,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k
+        )
+        generation_arguments = self._generation_arguments(chat=chat, config=config)
 
-    def __init__(
+        # Generate response
+        response = await self._acomplete(
+            generation_arguments,
+            use_cache=use_cache,
+            fallback_arguments=self._fallback_arguments(chat, config, use_cache)
+        )
+
+        return response
+
+    def generate_stream(
         self,
-        auth_token: str = None,
-        api_key: str = None,
-        base_url: str = None,
-        timeout: float = None,
-        max_retries: int = None
-    ) -> None:
-        # Initialize parent class
-        super().__init__(creator=LLMCreator.ANTHROPIC)
+        chat: Chat,
+        max_tokens: int = 300,
+        stop_sequences: list[str] = None,
+        temperature: float = None,
+        top_p: float = None,
+        top_k: int = None,
+        use_cache: bool = None,
+        config: GenerationConfig = None
+    ) -> Iterator[StreamEvent]:
+        """
+        Generate response to a prompt as a stream of events.
 
-        # Verify authentication
-        if auth_token is None and api_key is None and os.environ.get('ANTHROPIC_API_KEY') is None:
-            raise ValueError('API key not found. '
-                             'Set the environment variable ANTHROPIC_API_KEY with your API key (recommended) or '
-                             'pass the API key using the `api_key` argument while initializing the class.')
+        Each event carries the newly generated text. The final event carries the stop reason and the token usage
+        instead. Closing the iterator before it is exhausted closes the connection to the LLM.
 
-        # Set input arguments
-        self._auth_token = auth_token
-        self._api_key = api_key
-        self._base_url = base_url
-        self._timeout = timeout
-        self._max_retries = max_retries
+        Args:
+            chat(Chat): Chat containing the messages.
+            max_tokens(:obj:`int`, defaults to 300): Maximum number of tokens to generate before stopping.
+            stop_sequences(:obj:`list(str)`, optional): Sequences to stop generating completion text.
+            temperature(:obj:`float`, optional): Amount of randomness injected into the response.
+            top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
+            top_k(:obj:`int`, optional): Number of options to sample from for each subsequent token.
+            use_cache(:obj:`bool`, optional): Whether to use the cache of the LLM. Defaults to caching only
+                requests with zero temperature.
+            config(:obj:`GenerationConfig`, optional): Generation settings, used instead of the settings above.
 
-        # Create arguments for Anthropic client
-        anthropic_arguments = {}
-        anthropic_optionals = ['auth_token', 'api_key', 'base_url', 'timeout', 'max_retries']
-        for argument in anthropic_optionals:
-            if eval(argument) is not None:
-                anthropic_arguments[argument] = eval(argument)
+        Returns:
+            Iterator(StreamEvent): Stream of events with the generated response from the LLM
 
-        # Initialize Anthropic client
-        self._anthropic = Anthropic(**anthropic_arguments)
+        Example:
 
-    def generate(
+        .. code-block:: python
+
+            from llmbox.llms import ClaudeInstant1
+            from llmbox.chat import Chat, Message, Role
+
+            llm = ClaudeInstant1()
+            chat = Chat()
+
+            chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
+            for event in llm.generate_stream(chat=chat):
+                print(event.text, end='')
+        """
+
+        # Create arguments for LLM generation
+        config = config or GenerationConfig(
+            max_tokens=max_tokens,
+            stop_sequences=stop_sequences,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k
+        )
+        generation_arguments = self._generation_arguments(chat=chat, config=config)
+
+        # Stream response
+        return self._complete_stream(
+            generation_arguments,
+            use_cache=use_cache,
+            fallback_arguments=self._fallback_arguments(chat, config, use_cache)
+        )
+
+    def agenerate_stream(
         self,
         chat: Chat,
         max_tokens: int = 300,
         stop_sequences: list[str] = None,
         temperature: float = None,
         top_p: float = None,
-        top_k: int = None
-    ) -> str:
+        top_k: int = None,
+        use_cache: bool = None,
+        config: GenerationConfig = None
+    ) -> AsyncIterator[StreamEvent]:
         """
-        Generate response to a prompt.
+        Generate response to a prompt as an asynchronous stream of events.
+
+        Each event carries the newly generated text. The final event carries the stop reason and the token usage
+        instead. Closing the iterator before it is exhausted closes the connection to the LLM.
 
         Args:
             chat(Chat): Chat containing the messages.
@@ -236,40 +342,129 @@ class Claude2(BaseLLM):
             temperature(:obj:`float`, optional): Amount of randomness injected into the response.
             top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
             top_k(:obj:`int`, optional): Number of options to sample from for each subsequent token.
+            use_cache(:obj:`bool`, optional): Whether to use the cache of the LLM. Defaults to caching only
+                requests with zero temperature.
+            config(:obj:`GenerationConfig`, optional): Generation settings, used instead of the settings above.
 
         Returns:
-            str: Generated response from the LLM
+            AsyncIterator(StreamEvent): Stream of events with the generated response from the LLM
 
         Example:
 
         .. code-block:: python
 
-            from llmbox.llms import Claude2
+            import asyncio
+
+            from llmbox.llms import ClaudeInstant1
             from llmbox.chat import Chat, Message, Role
 
-            llm = Claude2()
-            chat = Chat()
+            async def main():
+                llm = ClaudeInstant1()
+                chat = Chat()
 
-            chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
-            response = llm.generate(chat=chat)
-            print(response)
+                chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
+                async for event in llm.agenerate_stream(chat=chat):
+                    print(event.text, end='')
+
+            asyncio.run(main())
         """
 
         # Create arguments for LLM generation
-        generation_arguments = {
-            'model': 'claude-2',
-            'prompt': chat.generate_prompt_anthropic(),
-            'max_tokens_to_sample': max_tokens
-        }
-        generation_optionals = ['stop_sequences', 'temperature', 'top_p', 'top_k']
-        for argument in generation_optionals:
-            if eval(argument) is not None:
-                generation_arguments[argument] = eval(argument)
+        config = config or GenerationConfig(
+            max_tokens=max_tokens,
+            stop_sequences=stop_sequences,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k
+        )
+        generation_arguments = self._generation_arguments(chat=chat, config=config)
+
+        # Stream response
+        return self._acomplete_stream(
+            generation_arguments,
+            use_cache=use_cache,
+            fallback_arguments=self._fallback_arguments(chat, config, use_cache)
+        )
+
+    def _generation_arguments(self, chat: Chat, config: GenerationConfig) -> dict:
+        with tracer.span('llm.build_request', {'llm.model': self._model}):
+            # Send only the turns chosen by the context policy
+            chat = self._fit_context(chat, config.max_tokens)
+
+            # Create arguments for LLM generation
+            generation_arguments = self._REQUEST_BUILDER.build(config)
+            generation_arguments['model'] = self._model
+            with tracer.span('chat.render', {'chat.format': 'anthropic', 'chat.messages': len(chat.messages)}):
+                generation_arguments['prompt'] = chat.generate_prompt_anthropic()
+
+        return generation_arguments
+
+    def _create(self, arguments: dict) -> str:
+        return self._anthropic.completions.create(**arguments).completion
+
+    async def _acreate(self, arguments: dict) -> str:
+        async_anthropic = registry.async_anthropic(**self._anthropic_arguments)
+
+        return (await async_anthropic.completions.create(**arguments)).completion
+
+    def _create_stream(self, arguments: dict) -> Iterator[StreamEvent]:
+        stream = self._anthropic.completions.create(**arguments, stream=True)
+        completion = []
+        stop_reason = None
+        try:
+            for event in stream:
+                if event.stop_reason is not None:
+                    stop_reason = event.stop_reason
+                if event.completion:
+                    completion.append(event.completion)
+                    yield StreamEvent(text=event.completion)
+        finally:
+            # Close the connection right away, also when the consumer stops iterating early
+            stream.response.close()
+
+        yield StreamEvent(
+            stop_reason=stop_reason,
+            prompt_tokens=self._anthropic.count_tokens(arguments['prompt']),
+            completion_tokens=self._anthropic.count_tokens(''.join(completion)),
+            final=True
+        )
+
+    async def _acreate_stream(self, arguments: dict) -> AsyncIterator[StreamEvent]:
+        async_anthropic = registry.async_anthropic(**self._anthropic_arguments)
+        stream = await async_anthropic.completions.create(**arguments, stream=True)
+        completion = []
+        stop_reason = None
+        try:
+            async for event in stream:
+                if event.stop_reason is not None:
+                    stop_reason = event.stop_reason
+                if event.completion:
+                    completion.append(event.completion)
+                    yield StreamEvent(text=event.completion)
+        finally:
+            # Close the connection right away, also when the consumer stops iterating early
+            await stream.response.aclose()
+
+        yield StreamEvent(
+            stop_reason=stop_reason,
+            prompt_tokens=await async_anthropic.count_tokens(arguments['prompt']),
+            completion_tokens=await async_anthropic.count_tokens(''.join(completion)),
+            final=True
+        )
 
-        # Generate response
-        response = self._anthropic.completions.create(**generation_arguments).completion
+    @property
+    def model(self):
+        """str: Name of the model."""
 
-        return response
+        return self._model
+
+    @property
+    def context_window(self):
+        """int: Number of tokens the model can attend to, prompt and response included. None if unknown."""
+
+        info = model_registry.find(self._model)
+
+        return info.context_window if info is not None else None
 
     @property
     def base_url(self):
@@ -288,3 +483,83 @@ class Claude2(BaseLLM):
         """int: Maximum number of attempts to connect to Anthropic client."""
 
         return self._max_retries
+
+
+class ClaudeInstant1(Claude):
+    """
+    Class for Claude-Instant-1 LLM by Anthropic.
+
+    Args:
+        auth_token(:obj:`str`, optional): Authentication token for Anthropic client.
+        api_key(:obj:`str`, optional): API Key for Anthropic client.
+        base_url(:obj:`str`, optional): Base URL for Anthropic client.
+        timeout(:obj:`float`, optional): Maximum time to connect to Anthropic client.
+        max_retries(:obj:`int`, optional): Maximum number of attempts to connect to Anthropic client.
+        cache(:obj:`BaseCache`, optional): Cache for generated responses.
+        single_flight(:obj:`SingleFlight`, optional): Group through which identical requests in flight are shared.
+        hedging(:obj:`HedgingPolicy`, optional): Policy for hedging slow requests with a duplicate request.
+        fallback(:obj:`BaseLLM`, optional): LLM the requests divert to while the circuit breaker of the API is open.
+        context_policy(:obj:`ContextPolicy`, optional): Policy choosing which turns of a chat are sent, within the
+            context window of the model.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import ClaudeInstant1
+            from llmbox.chat import Chat, Message, Role
+
+            llm = ClaudeInstant1()
+            chat = Chat()
+
+            chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
+            response = llm.generate(chat=chat)
+            print(response)
+
+            chat.add_message(message=Message(text=response, role=Role.Assistant))
+            chat.add_message(message=Message(text='What about the moon?', role=Role.User))
+            next_response = llm.generate(chat=chat)
+            print(next_response)
+    """
+
+    _MODEL = ClaudeModels.CLAUDEINSTANT1
+
+
+class Claude2(Claude):
+    """
+    Class for Claude-2 LLM by Anthropic.
+
+    Args:
+        auth_token(:obj:`str`, optional): Authentication token for Anthropic client.
+        api_key(:obj:`str`, optional): API Key for Anthropic client.
+        base_url(:obj:`str`, optional): Base URL for Anthropic client.
+        timeout(:obj:`float`, optional): Maximum time to connect to Anthropic client.
+        max_retries(:obj:`int`, optional): Maximum number of attempts to connect to Anthropic client.
+        cache(:obj:`BaseCache`, optional): Cache for generated responses.
+        single_flight(:obj:`SingleFlight`, optional): Group through which identical requests in flight are shared.
+        hedging(:obj:`HedgingPolicy`, optional): Policy for hedging slow requests with a duplicate request.
+        fallback(:obj:`BaseLLM`, optional): LLM the requests divert to while the circuit breaker of the API is open.
+        context_policy(:obj:`ContextPolicy`, optional): Policy choosing which turns of a chat are sent, within the
+            context window of the model.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.chat import Chat, Message, Role
+
+            llm = Claude2()
+            chat = Chat()
+
+            chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
+            response = llm.generate(chat=chat)
+            print(response)
+
+            chat.add_message(message=Message(text=response, role=Role.Assistant))
+            chat.add_message(message=Message(text='What about the moon?', role=Role.User))
+            next_response = llm.generate(chat=chat)
+            print(next_response)
+    """
+
+    _MODEL = ClaudeModels.CLAUDE2
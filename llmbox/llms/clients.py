@@ -0,0 +1,328 @@
+import asyncio
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import weakref
+
+from anthropic import Anthropic, AsyncAnthropic
+import httpx
+
+from .concurrency import observe_response
+from ..tracing import tracer
+
+
+class ClientRegistry:
+    """
+    Class for a registry of API clients shared across LLMs.
+
+    LLMs with the same credentials, base URL and client settings share one client, so its pool of keep-alive
+    connections is reused across LLM instances and sessions. Asynchronous clients are shared per event loop. Only the
+    most recently used clients are kept. Evicted clients are not closed, since LLMs may still use them, their
+    connections are closed when the client is garbage collected. Call `close` to close the synchronous clients right
+    away.
+
+    Args:
+        max_connections(:obj:`int`, defaults to 100): Maximum number of connections per client.
+        max_keepalive_connections(:obj:`int`, defaults to 20): Maximum number of idle connections kept alive per
+            client.
+        keepalive_expiry(:obj:`float`, defaults to 5.0): Number of seconds an idle connection is kept alive.
+        timeout(:obj:`float`, optional): Default maximum time to connect to the API, used when an LLM does not set
+            its own.
+        max_clients(:obj:`int`, defaults to 64): Maximum number of clients kept, per event loop for asynchronous
+            clients.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2, ClaudeInstant1
+            from llmbox.llms.clients import registry
+
+            registry.configure(max_connections=50, keepalive_expiry=30.0)
+
+            # Both LLMs use the same client and connection pool
+            llm = Claude2(api_key='...')
+            other_llm = ClaudeInstant1(api_key='...')
+            print(registry.stats)
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 5.0,
+        timeout: float = None,
+        max_clients: int = 64
+    ) -> None:
+        self._max_connections = max_connections
+        self._max_keepalive_connections = max_keepalive_connections
+        self._keepalive_expiry = keepalive_expiry
+        self._timeout = timeout
+        self._max_clients = max_clients
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._hits = 0
+        self._misses = 0
+
+    def configure(
+        self,
+        max_connections: int = None,
+        max_keepalive_connections: int = None,
+        keepalive_expiry: float = None,
+        timeout: float = None,
+        max_clients: int = None
+    ) -> None:
+        """
+        Update the settings of the registry. Settings apply to clients created afterwards.
+
+        Args:
+            max_connections(:obj:`int`, optional): Maximum number of connections per client.
+            max_keepalive_connections(:obj:`int`, optional): Maximum number of idle connections kept alive per
+                client.
+            keepalive_expiry(:obj:`float`, optional): Number of seconds an idle connection is kept alive.
+            timeout(:obj:`float`, optional): Default maximum time to connect to the API, used when an LLM does not
+                set its own.
+            max_clients(:obj:`int`, optional): Maximum number of clients kept, per event loop for asynchronous
+                clients.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            if max_connections is not None:
+                self._max_connections = max_connections
+            if max_keepalive_connections is not None:
+                self._max_keepalive_connections = max_keepalive_connections
+            if keepalive_expiry is not None:
+                self._keepalive_expiry = keepalive_expiry
+            if timeout is not None:
+                self._timeout = timeout
+            if max_clients is not None:
+                self._max_clients = max_clients
+
+    def anthropic(
+        self,
+        auth_token: str = None,
+        api_key: str = None,
+        base_url: str = None,
+        timeout: float = None,
+        max_retries: int = None
+    ) -> Anthropic:
+        """
+        Get the shared Anthropic client for the given credentials and settings.
+
+        Args:
+            auth_token(:obj:`str`, optional): Authentication token for Anthropic client.
+            api_key(:obj:`str`, optional): API Key for Anthropic client.
+            base_url(:obj:`str`, optional): Base URL for Anthropic client.
+            timeout(:obj:`float`, optional): Maximum time to connect to Anthropic client.
+            max_retries(:obj:`int`, optional): Maximum number of attempts to connect to Anthropic client.
+
+        Returns:
+            Anthropic: Anthropic client
+        """
+
+        key = self._key(auth_token, api_key, base_url, timeout, max_retries)
+
+        with tracer.span('client.get', {'client.asynchronous': False}) as span, self._lock:
+            entry = self._clients.get(key)
+            span.set_attribute('client.created', entry is None)
+            if entry is None:
+                self._misses += 1
+                transport = _PoolTransport(limits=self._limits())
+                entry = self._clients[key] = (Anthropic(transport=transport, **self._arguments(key)), transport)
+                _evict(self._clients, self._max_clients)
+            else:
+                self._hits += 1
+                self._clients.move_to_end(key)
+
+        return entry[0]
+
+    def async_anthropic(
+        self,
+        auth_token: str = None,
+        api_key: str = None,
+        base_url: str = None,
+        timeout: float = None,
+        max_retries: int = None
+    ) -> AsyncAnthropic:
+        """
+        Get the shared asynchronous Anthropic client for the given credentials and settings on the running event loop.
+
+        Args:
+            auth_token(:obj:`str`, optional): Authentication token for Anthropic client.
+            api_key(:obj:`str`, optional): API Key for Anthropic client.
+            base_url(:obj:`str`, optional): Base URL for Anthropic client.
+            timeout(:obj:`float`, optional): Maximum time to connect to Anthropic client.
+            max_retries(:obj:`int`, optional): Maximum number of attempts to connect to Anthropic client.
+
+        Returns:
+            AsyncAnthropic: Asynchronous Anthropic client
+        """
+
+        key = self._key(auth_token, api_key, base_url, timeout, max_retries)
+        loop = asyncio.get_running_loop()
+
+        with tracer.span('client.get', {'client.asynchronous': True}) as span, self._lock:
+            clients = self._async_clients.setdefault(loop, OrderedDict())
+            entry = clients.get(key)
+            span.set_attribute('client.created', entry is None)
+            if entry is None:
+                self._misses += 1
+                transport = _AsyncPoolTransport(limits=self._limits())
+                entry = clients[key] = (AsyncAnthropic(transport=transport, **self._arguments(key)), transport)
+                _evict(clients, self._max_clients)
+            else:
+                self._hits += 1
+                clients.move_to_end(key)
+
+        return entry[0]
+
+    def close(self) -> None:
+        """
+        Close the synchronous clients and remove all clients from the registry.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+            self._async_clients.clear()
+
+        for client, _ in entries:
+            client.close()
+
+    def _key(self, auth_token: str, api_key: str, base_url: str, timeout: float, max_retries: int) -> tuple:
+        # Resolve credentials from the environment like the Anthropic client does
+        return (
+            auth_token or os.environ.get('ANTHROPIC_AUTH_TOKEN'),
+            api_key or os.environ.get('ANTHROPIC_API_KEY'),
+            base_url,
+            timeout if timeout is not None else self._timeout,
+            max_retries
+        )
+
+    def _arguments(self, key: tuple) -> dict:
+        # Create arguments for Anthropic client
+        arguments = {}
+        for argument, value in zip(['auth_token', 'api_key', 'base_url', 'timeout', 'max_retries'], key):
+            if value is not None:
+                arguments[argument] = value
+
+        return arguments
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self._max_connections,
+            max_keepalive_connections=self._max_keepalive_connections,
+            keepalive_expiry=self._keepalive_expiry
+        )
+
+    @property
+    def hits(self) -> int:
+        """int: Number of lookups that reused a client."""
+
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """int: Number of lookups that created a client."""
+
+        return self._misses
+
+    @property
+    def stats(self) -> dict:
+        """dict: Hits and misses of the registry and the connection pool statistics of each client."""
+
+        with self._lock:
+            entries = list(self._clients.items())
+            for async_clients in self._async_clients.values():
+                entries.extend(async_clients.items())
+
+        pools = []
+        for key, (client, transport) in entries:
+            pool = transport.stats
+            pool['base_url'] = str(client.base_url)
+            pool['credentials'] = hashlib.sha256(str(key[:2]).encode()).hexdigest()[:8]
+            pool['asynchronous'] = isinstance(client, AsyncAnthropic)
+            pools.append(pool)
+
+        return {'clients': len(entries), 'hits': self._hits, 'misses': self._misses, 'pools': pools}
+
+
+def _evict(clients: OrderedDict, max_clients: int) -> None:
+    # Drop the least recently used clients, LLMs may still hold them so they are left to the garbage collector
+    while len(clients) > max_clients:
+        clients.popitem(last=False)
+
+
+class _PoolTransport(httpx.HTTPTransport):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._requests = 0
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self._requests += 1
+
+        # Time the request to the response headers, the body is read by the caller
+        with tracer.span('http.request', _request_attributes(request)) as span:
+            response = super().handle_request(request)
+            span.set_attribute('http.status_code', response.status_code)
+
+        # Report rate limit headers and overload to the adaptive concurrency limit of the request
+        observe_response(response.status_code, response.headers)
+
+        return response
+
+    @property
+    def stats(self) -> dict:
+        return _pool_stats(self._pool, self._requests)
+
+
+class _AsyncPoolTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._requests += 1
+
+        # Time the request to the response headers, the body is read by the caller
+        with tracer.span('http.request', _request_attributes(request)) as span:
+            response = await super().handle_async_request(request)
+            span.set_attribute('http.status_code', response.status_code)
+
+        # Report rate limit headers and overload to the adaptive concurrency limit of the request
+        observe_response(response.status_code, response.headers)
+
+        return response
+
+    @property
+    def stats(self) -> dict:
+        return _pool_stats(self._pool, self._requests)
+
+
+def _request_attributes(request: httpx.Request) -> dict:
+    return {'http.method': request.method, 'http.url': str(request.url.copy_with(query=None))}
+
+
+def _pool_stats(pool, requests: int) -> dict:
+    connections = list(pool.connections)
+    idle = sum(1 for connection in connections if connection.is_idle())
+
+    return {
+        'requests': requests,
+        'connections': len(connections),
+        'active_connections': len(connections) - idle,
+        'idle_connections': idle
+    }
+
+
+registry = ClientRegistry()
@@ -0,0 +1,344 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Iterator
+
+
+class SingleFlight:
+    """
+    Class for a group of in-flight requests shared by identical callers.
+
+    Callers that make a request with the same key while one is already in flight wait for that request and receive
+    its result instead of making their own. Streams are shared as well, every subscriber receives the same events
+    from the start of the stream.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.llms.coalesce import SingleFlight
+
+            single_flight = SingleFlight()
+
+            # LLMs sharing the group share identical requests in flight
+            llm = Claude2(single_flight=single_flight)
+            other_llm = Claude2(single_flight=single_flight)
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self._streams = {}
+        self._async_streams = {}
+        self._requests = 0
+        self._shared = 0
+
+    def do(self, key: str, function: Callable[[], object]) -> object:
+        """
+        Call a function, or wait for the result of the call in flight with the same key.
+
+        Args:
+            key(str): Key of the request.
+            function(callable): Function making the request.
+
+        Returns:
+            object: Result of the request.
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._requests += 1
+            else:
+                self._shared += 1
+
+        # Wait for the request in flight
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            self._forget(self._calls, key, call)
+            call.done.set()
+
+        return call.result
+
+    async def ado(self, key: str, function: Callable[[], Awaitable]) -> object:
+        """
+        Await a coroutine function, or the result of the call in flight with the same key.
+
+        The request runs in its own task, so a caller being cancelled does not cancel it for the other callers.
+
+        Args:
+            key(str): Key of the request.
+            function(callable): Coroutine function making the request.
+
+        Returns:
+            object: Result of the request.
+        """
+
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            task = self._async_calls.get((loop, key))
+            if task is None:
+                task = loop.create_task(function())
+                task.add_done_callback(lambda _: self._forget(self._async_calls, (loop, key), task))
+                self._async_calls[(loop, key)] = task
+                self._requests += 1
+            else:
+                self._shared += 1
+
+        return await asyncio.shield(task)
+
+    def stream(self, key: str, function: Callable[[], Iterator]) -> Iterator:
+        """
+        Subscribe to a stream, or to the stream in flight with the same key.
+
+        Args:
+            key(str): Key of the request.
+            function(callable): Function returning the stream.
+
+        Returns:
+            Iterator: Events of the stream from its start.
+        """
+
+        with self._lock:
+            broadcast = self._streams.get(key)
+            if broadcast is None or not broadcast.subscribe():
+                broadcast = _Broadcast(source=function(), on_finish=lambda: self._forget(self._streams, key, broadcast))
+                broadcast.subscribe()
+                self._streams[key] = broadcast
+                self._requests += 1
+            else:
+                self._shared += 1
+
+        return broadcast.iterate()
+
+    async def astream(self, key: str, function: Callable[[], AsyncIterator]) -> AsyncIterator:
+        """
+        Subscribe to an asynchronous stream, or to the stream in flight with the same key.
+
+        The stream is consumed by its own task and is only cancelled once every subscriber has stopped iterating.
+
+        Args:
+            key(str): Key of the request.
+            function(callable): Function returning the asynchronous stream.
+
+        Returns:
+            AsyncIterator: Events of the stream from its start.
+        """
+
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            broadcast = self._async_streams.get((loop, key))
+            if broadcast is None or not broadcast.subscribe():
+                broadcast = _AsyncBroadcast(
+                    source=function(),
+                    on_finish=lambda: self._forget(self._async_streams, (loop, key), broadcast)
+                )
+                broadcast.subscribe()
+                self._async_streams[(loop, key)] = broadcast
+                self._requests += 1
+            else:
+                self._shared += 1
+
+        iterator = broadcast.aiterate()
+        try:
+            async for event in iterator:
+                yield event
+        finally:
+            await iterator.aclose()
+
+    def _forget(self, flights: dict, key: object, flight: object) -> None:
+        with self._lock:
+            if flights.get(key) is flight:
+                del flights[key]
+
+    @property
+    def requests(self) -> int:
+        """int: Number of requests made."""
+
+        return self._requests
+
+    @property
+    def shared(self) -> int:
+        """int: Number of callers that shared a request in flight instead of making their own."""
+
+        return self._shared
+
+    @property
+    def stats(self) -> dict:
+        """dict: Requests made, callers that shared a request and requests currently in flight."""
+
+        with self._lock:
+            in_flight = len(self._calls) + len(self._async_calls) + len(self._streams) + len(self._async_streams)
+
+        return {'requests': self._requests, 'shared': self._shared, 'in_flight': in_flight}
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Broadcast:
+    # Replays one stream to many subscribers. Whichever subscriber needs the next event first pulls it from the
+    # source, so the stream keeps going when any single subscriber stops.
+
+    def __init__(self, source: Iterator, on_finish: Callable[[], None]) -> None:
+        self._source = source
+        self._on_finish = on_finish
+        self._condition = threading.Condition()
+        self._events = []
+        self._error = None
+        self._done = False
+        self._closed = False
+        self._pulling = False
+        self._subscribers = 0
+
+    def subscribe(self) -> bool:
+        with self._condition:
+            if self._done or self._closed:
+                return False
+            self._subscribers += 1
+
+            return True
+
+    def iterate(self) -> Iterator:
+        i = 0
+        try:
+            while True:
+                with self._condition:
+                    while i >= len(self._events) and not self._done and self._pulling:
+                        self._condition.wait()
+
+                    pull = i >= len(self._events) and not self._done
+                    if pull:
+                        self._pulling = True
+                    elif i < len(self._events):
+                        event = self._events[i]
+                    elif self._error is not None:
+                        raise self._error
+                    else:
+                        return
+
+                if pull:
+                    self._pull()
+                    continue
+
+                i += 1
+                yield event
+        finally:
+            with self._condition:
+                self._subscribers -= 1
+                abandoned = self._subscribers == 0 and not self._done
+                if abandoned:
+                    self._closed = True
+
+            # Close the source once nobody listens anymore
+            if abandoned:
+                self._on_finish()
+                self._source.close()
+
+    def _pull(self) -> None:
+        finished = False
+        try:
+            event = next(self._source)
+        except StopIteration:
+            finished = True
+        except BaseException as error:
+            finished = True
+            self._error = error
+
+        with self._condition:
+            if finished:
+                self._done = True
+            else:
+                self._events.append(event)
+            self._pulling = False
+            self._condition.notify_all()
+
+        if finished:
+            self._on_finish()
+
+
+class _AsyncBroadcast:
+    # Replays one asynchronous stream to many subscribers. A separate task consumes the source so cancelling a
+    # subscriber does not interrupt the stream for the others.
+
+    def __init__(self, source: AsyncIterator, on_finish: Callable[[], None]) -> None:
+        self._source = source
+        self._on_finish = on_finish
+        self._condition = asyncio.Condition()
+        self._events = []
+        self._error = None
+        self._done = False
+        self._closed = False
+        self._subscribers = 0
+        self._task = None
+
+    def subscribe(self) -> bool:
+        if self._done or self._closed:
+            return False
+        self._subscribers += 1
+
+        return True
+
+    async def aiterate(self) -> AsyncIterator:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._pump())
+
+        i = 0
+        try:
+            while True:
+                async with self._condition:
+                    await self._condition.wait_for(lambda: i < len(self._events) or self._done)
+                    if i < len(self._events):
+                        event = self._events[i]
+                    elif self._error is not None:
+                        raise self._error
+                    else:
+                        return
+
+                i += 1
+                yield event
+        finally:
+            self._subscribers -= 1
+
+            # Cancel the stream once nobody listens anymore
+            if self._subscribers == 0 and not self._done:
+                self._closed = True
+                self._on_finish()
+                self._task.cancel()
+
+    async def _pump(self) -> None:
+        try:
+            async for event in self._source:
+                async with self._condition:
+                    self._events.append(event)
+                    self._condition.notify_all()
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            self._error = error
+        finally:
+            await self._source.aclose()
+            self._on_finish()
+            self._done = True
+            async with self._condition:
+                self._condition.notify_all()
@@ -0,0 +1,279 @@
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import threading
+from typing import Callable
+import weakref
+
+from .base import BaseLLM
+from ..chat import Chat, Message, Role
+from ..chat.context import ContextPolicy, _turns_backward
+from ..chat.tokens import anthropic_counter
+from ..tracing import tracer
+
+
+_INSTRUCTION = (
+    'Summarize the conversation below in a few sentences. Keep the facts, names, numbers, decisions and open questions '
+    'needed to continue it, and leave out pleasantries.'
+)
+
+
+class SummaryCompaction(ContextPolicy):
+    """
+    Policy compacting the older turns of a chat into a running summary written by a cheaper LLM.
+
+    Once the tokens of a chat not yet summarized pass the threshold, the turns older than the latest ones are
+    summarized in the background, folding in the previous summary, so compaction adds no latency to the turn. The
+    summary is cached per chat, and requests send it with the first turn kept followed by the turns since. Until a
+    summary is ready, requests keep as many of the latest turns as fit the context window. Summaries not started yet
+    are cancelled when the policy is closed or the process exits.
+
+    Args:
+        summarizer(BaseLLM): LLM writing the summaries, such as `ClaudeInstant1` or `GPT35Turbo`.
+        threshold_tokens(:obj:`int`, defaults to 2000): Number of tokens not yet summarized that triggers a
+            compaction.
+        recent_turns(:obj:`int`, defaults to 4): Number of latest turns never summarized.
+        summary_tokens(:obj:`int`, defaults to 300): Maximum number of tokens of a summary.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import ClaudeInstant1, Claude2
+            from llmbox.llms.compaction import SummaryCompaction
+
+            with SummaryCompaction(summarizer=ClaudeInstant1(), threshold_tokens=4000) as policy:
+                llm = Claude2(context_policy=policy)
+    """
+
+    def __init__(
+        self,
+        summarizer: BaseLLM,
+        threshold_tokens: int = 2000,
+        recent_turns: int = 4,
+        summary_tokens: int = 300
+    ) -> None:
+        # Initialize parent class, the first turn kept carries the summary
+        super().__init__(first_turns=1)
+
+        # Verify arguments
+        if recent_turns < 1:
+            raise ValueError('Number of recent turns must be at least 1.')
+
+        self._summarizer = summarizer
+        self._threshold_tokens = threshold_tokens
+        self._recent_turns = recent_turns
+        self._summary_tokens = summary_tokens
+        self._lock = threading.Lock()
+        self._summaries = weakref.WeakKeyDictionary()
+        self._pending = weakref.WeakKeyDictionary()
+        self._executor = None
+        self._registered = False
+        self._compactions = 0
+        self._failures = 0
+        self._last_error = None
+
+    def apply(self, chat: Chat, max_tokens: int = None, count: Callable[[Message], int] = None) -> Chat:
+        """
+        Choose the turns of a chat to send to an LLM, replacing the older turns with their summary when it is ready,
+        and start a compaction when the chat has grown past the threshold.
+
+        Args:
+            chat(Chat): Chat containing the messages.
+            max_tokens(:obj:`int`, optional): Maximum number of tokens of the messages sent.
+            count(:obj:`callable`, optional): Function counting the tokens of a message. Defaults to estimating the
+                tokens in Anthropic's format.
+
+        Returns:
+            Chat: Chat with the summary and the turns to send, or the chat itself if it is sent as it is.
+        """
+
+        count = count or _estimate_tokens
+        messages = chat.messages
+        if len(messages) == 0:
+            return chat
+
+        with self._lock:
+            summarized, summary = self._summaries.get(chat, (0, None))
+            pending = chat in self._pending
+
+        # Summarize the turns older than the latest ones once the chat has grown enough
+        recent = _recent_start(messages, self._recent_turns)
+        if not pending and recent > summarized:
+            tokens = sum(count(message) for message in messages[summarized:])
+            if summary is not None:
+                tokens += count(Message(text=summary, role=Role.User))
+            if tokens >= self._threshold_tokens:
+                self._compact(chat, summarized, recent, summary)
+
+        if summary is None:
+            return super().apply(chat, max_tokens=max_tokens, count=count)
+
+        # Fold the summary into the first turn not summarized
+        compacted = Chat()
+        first = messages[summarized]
+        compacted.add_message(Message(text=_with_summary(summary, first.text), role=first.role))
+        for message in messages[summarized + 1:]:
+            compacted.add_message(message)
+
+        return super().apply(compacted, max_tokens=max_tokens, count=count)
+
+    def summary(self, chat: Chat) -> str:
+        """
+        Get the cached summary of a chat.
+
+        Args:
+            chat(Chat): Chat containing the messages.
+
+        Returns:
+            str: Summary of the older turns of the chat, or None if they have not been summarized yet.
+        """
+
+        with self._lock:
+            return self._summaries.get(chat, (0, None))[1]
+
+    def wait(self, chat: Chat) -> None:
+        """
+        Wait for the compaction of a chat in progress, if any.
+
+        Args:
+            chat(Chat): Chat containing the messages.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            future = self._pending.get(chat)
+        if future is not None:
+            future.result()
+
+    def close(self) -> None:
+        """
+        Stop the background compactions, cancelling the summaries not started yet. A summary in progress still
+        completes, and compactions started afterwards use a new worker.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._pending.clear()
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self) -> 'SummaryCompaction':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.close()
+
+        return False
+
+    def _compact(self, chat: Chat, start: int, end: int, summary: str) -> None:
+        # Summarize the turns in the background, the messages are immutable so they are read now
+        messages = list(chat.messages[start:end])
+
+        with self._lock:
+            if chat in self._pending:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='llmbox-compaction')
+
+                # Cancel the summaries left when the process exits, before the interpreter waits for the worker
+                if not self._registered:
+                    threading._register_atexit(_close, weakref.ref(self))
+                    self._registered = True
+
+            # Summarize with the context of the request, so the summary shows in its trace
+            chat_ref = weakref.ref(chat)
+            self._pending[chat] = self._executor.submit(
+                contextvars.copy_context().run, self._summarize, chat_ref, end, messages, summary
+            )
+
+    def _summarize(self, chat_ref: weakref.ref, end: int, messages: list[Message], summary: str) -> None:
+        try:
+            request = Chat()
+            request.add_message(Message(text=_summary_request(messages, summary), role=Role.User))
+            with tracer.span('chat.compact', {'chat.messages': len(messages)}):
+                text = self._summarizer.generate(request, max_tokens=self._summary_tokens, temperature=0.0).strip()
+        except Exception as error:
+            with self._lock:
+                self._failures += 1
+                self._last_error = repr(error)
+                chat = chat_ref()
+                if chat is not None:
+                    self._pending.pop(chat, None)
+            return
+
+        with self._lock:
+            self._compactions += 1
+            chat = chat_ref()
+            if chat is not None:
+                self._summaries[chat] = (end, text)
+                self._pending.pop(chat, None)
+
+    @property
+    def summarizer(self) -> BaseLLM:
+        """BaseLLM: LLM writing the summaries."""
+
+        return self._summarizer
+
+    @property
+    def threshold_tokens(self) -> int:
+        """int: Number of tokens not yet summarized that triggers a compaction."""
+
+        return self._threshold_tokens
+
+    @property
+    def recent_turns(self) -> int:
+        """int: Number of latest turns never summarized."""
+
+        return self._recent_turns
+
+    @property
+    def stats(self) -> dict:
+        """dict: Number of chats summarized and in progress, compactions, failures and the last error."""
+
+        with self._lock:
+            return {
+                'chats': len(self._summaries),
+                'pending': len(self._pending),
+                'compactions': self._compactions,
+                'failures': self._failures,
+                'last_error': self._last_error
+            }
+
+
+def _close(policy_ref: weakref.ref) -> None:
+    policy = policy_ref()
+    if policy is not None:
+        policy.close()
+
+
+def _recent_start(messages: list[Message], turns: int) -> int:
+    # Index of the first message of the latest turns
+    start = len(messages)
+    for i, (start, _) in enumerate(_turns_backward(messages)):
+        if i + 1 >= turns:
+            break
+
+    return start
+
+
+def _summary_request(messages: list[Message], summary: str) -> str:
+    parts = [_INSTRUCTION]
+    if summary is not None:
+        parts.append(f'Summary of the conversation before:\n{summary}')
+    parts.append('Conversation:\n' + '\n'.join(f'{message.role}: {message.text}' for message in messages))
+
+    return '\n\n'.join(parts)
+
+
+def _with_summary(summary: str, text: str) -> str:
+    return f'Summary of the earlier conversation:\n{summary}\n\n{text}'
+
+
+def _estimate_tokens(message: Message) -> int:
+    return anthropic_counter(accurate=False).count(message.text)
@@ -0,0 +1,402 @@
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+from typing import Iterator
+
+
+class AdaptiveConcurrency:
+    """
+    Class for an adaptive limit on the number of requests in flight.
+
+    The limit follows an AIMD policy. It grows additively while requests succeed and the limit is in use, and shrinks
+    multiplicatively when the API signals overload through 429 or 529 responses, timeouts, rate limit headers or a
+    jump in latency. Requests over the limit wait in line for a free slot. Works for both threads and asyncio tasks.
+
+    Args:
+        initial_limit(:obj:`int`, defaults to 4): Number of requests allowed in flight at the start.
+        min_limit(:obj:`int`, defaults to 1): Lowest the limit can go.
+        max_limit(:obj:`int`, defaults to 64): Highest the limit can go.
+        increase(:obj:`float`, defaults to 1.0): Amount the limit grows by for every limit's worth of successful
+            requests.
+        decrease(:obj:`float`, defaults to 0.5): Factor the limit is multiplied by on overload.
+        latency_tolerance(:obj:`float`, defaults to 3.0): Multiple of the average latency above which a request is
+            considered a sign of overload.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms.concurrency import AdaptiveConcurrency
+
+            concurrency = AdaptiveConcurrency(initial_limit=4, max_limit=32)
+
+            concurrency.acquire()
+            try:
+                ...
+            finally:
+                concurrency.release()
+            print(concurrency.stats)
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_tolerance: float = 3.0
+    ) -> None:
+        # Verify limits
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError('Limits must satisfy 1 <= min_limit <= initial_limit <= max_limit.')
+        if not 0 < decrease < 1:
+            raise ValueError('Decrease factor must be between 0 and 1.')
+
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._increase = increase
+        self._decrease = decrease
+        self._latency_tolerance = latency_tolerance
+        self._lock = threading.Lock()
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiters = deque()
+        self._latencies = {}
+        self._last_decrease = 0.0
+        self._hold_until = 0.0
+        self._remaining = None
+        self._changes = {}
+        self._history = deque(maxlen=100)
+
+    def acquire(self) -> None:
+        """
+        Wait for a free slot.
+
+        Returns:
+            None: None
+        """
+
+        event = threading.Event()
+        with self._lock:
+            if self._try_acquire():
+                return
+            self._waiters.append(event.set)
+
+        event.wait()
+
+    async def aacquire(self) -> None:
+        """
+        Wait asynchronously for a free slot.
+
+        Returns:
+            None: None
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        with self._lock:
+            if self._try_acquire():
+                return
+            self._waiters.append(wake)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = wake not in self._waiters
+                if not granted:
+                    self._waiters.remove(wake)
+
+            # Hand over a slot granted while being cancelled
+            if granted:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """
+        Free a slot.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._in_flight -= 1
+            self._grant()
+
+    def record_success(self, latency: float, stream: bool = False) -> None:
+        """
+        Record a successful request.
+
+        Args:
+            latency(float): Number of seconds the request took, or until the first event for streams.
+            stream(:obj:`bool`, defaults to False): Whether the request was streamed.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            # Compare with the average latency of the same kind of requests
+            average = self._latencies.get(stream)
+            self._latencies[stream] = latency if average is None else 0.9 * average + 0.1 * latency
+            if average is not None and latency > self._latency_tolerance * average:
+                self._decrease_limit('latency')
+                return
+
+            # Grow the limit only while it is in use and the API has requests left
+            if time.monotonic() >= self._hold_until and self._in_flight + len(self._waiters) >= int(self._limit):
+                limit = self._limit + self._increase / self._limit
+                if self._remaining is not None:
+                    limit = min(limit, max(self._limit, self._remaining))
+                self._set_limit(limit, 'success')
+
+    def record_error(self, error: Exception) -> None:
+        """
+        Record a failed request. Only errors that signal overload shrink the limit.
+
+        Args:
+            error(Exception): Error raised by the request.
+
+        Returns:
+            None: None
+        """
+
+        status_code = getattr(error, 'status_code', None) or getattr(error, 'http_status', None)
+        headers = getattr(error, 'headers', None)
+        if headers is None and getattr(error, 'response', None) is not None:
+            headers = error.response.headers
+
+        if status_code is not None:
+            self.observe(status_code, headers or {})
+        elif 'Timeout' in type(error).__name__:
+            with self._lock:
+                self._decrease_limit('timeout')
+
+    def observe(self, status_code: int, headers: dict) -> None:
+        """
+        Adjust the limit to a response of the API.
+
+        Args:
+            status_code(int): HTTP status code of the response.
+            headers(dict): HTTP headers of the response.
+
+        Returns:
+            None: None
+        """
+
+        retry_after = _number(headers.get('retry-after'))
+        remaining = _number(
+            headers.get('anthropic-ratelimit-requests-remaining', headers.get('x-ratelimit-remaining-requests'))
+        )
+
+        with self._lock:
+            self._remaining = remaining
+            if status_code in (429, 529, 503):
+                # Stop growing until the API is ready again
+                if retry_after is not None:
+                    self._hold_until = max(self._hold_until, time.monotonic() + retry_after)
+                self._decrease_limit('rate_limited' if status_code == 429 else 'overloaded')
+            elif remaining is not None and remaining < int(self._limit):
+                # Keep no more requests in flight than the API has left
+                self._set_limit(max(self._min_limit, remaining), 'remaining_requests')
+
+    def _try_acquire(self) -> bool:
+        if self._in_flight < int(self._limit) and not self._waiters:
+            self._in_flight += 1
+            return True
+
+        return False
+
+    def _grant(self) -> None:
+        while self._waiters and self._in_flight < int(self._limit):
+            self._in_flight += 1
+            self._waiters.popleft()()
+
+    def _decrease_limit(self, reason: str) -> None:
+        # Shrink at most once per average latency, as the requests in flight report the same overload
+        now = time.monotonic()
+        if now - self._last_decrease < max(self._latencies.values(), default=1.0):
+            return
+        self._last_decrease = now
+
+        self._set_limit(self._limit * self._decrease, reason)
+
+    def _set_limit(self, limit: float, reason: str) -> None:
+        limit = min(self._max_limit, max(self._min_limit, limit))
+        if int(limit) != int(self._limit):
+            self._changes[reason] = self._changes.get(reason, 0) + 1
+            self._history.append({'time': time.time(), 'from': int(self._limit), 'to': int(limit), 'reason': reason})
+        self._limit = limit
+
+        self._grant()
+
+    @property
+    def limit(self) -> int:
+        """int: Number of requests currently allowed in flight."""
+
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """int: Number of requests in flight."""
+
+        return self._in_flight
+
+    @property
+    def stats(self) -> dict:
+        """dict: Current limit, requests in flight and waiting, and the changes of the limit with their reasons."""
+
+        with self._lock:
+            return {
+                'limit': int(self._limit),
+                'in_flight': self._in_flight,
+                'waiting': len(self._waiters),
+                'changes': dict(self._changes),
+                'history': list(self._history)
+            }
+
+
+class ConcurrencyRegistry:
+    """
+    Class for a registry of adaptive concurrency limits per model.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.llms.concurrency import concurrency_limits
+
+            concurrency_limits.configure(model='claude-2', initial_limit=8, max_limit=64)
+
+            llm = Claude2()
+            responses = llm.generate_many(chats=chats, max_concurrency=64)
+            print(concurrency_limits.stats)
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._settings = {}
+        self._controllers = {}
+
+    def configure(self, model: str = None, **kwargs) -> None:
+        """
+        Enable adaptive concurrency for a model.
+
+        Args:
+            model(:obj:`str`, optional): Name of the model. Defaults to every model.
+            **kwargs: Arguments of `AdaptiveConcurrency`.
+
+        Returns:
+            None: None
+        """
+
+        # Verify arguments
+        AdaptiveConcurrency(**kwargs)
+
+        with self._lock:
+            self._settings[model] = kwargs
+
+            # Drop controllers with outdated settings, they are recreated on the next request
+            for key in list(self._controllers):
+                if model is None or key == model:
+                    del self._controllers[key]
+
+    def controller(self, model: str) -> AdaptiveConcurrency:
+        """
+        Get the adaptive concurrency limit of a model.
+
+        Args:
+            model(str): Name of the model.
+
+        Returns:
+            AdaptiveConcurrency: Adaptive concurrency limit, or None if not enabled for the model.
+        """
+
+        with self._lock:
+            controller = self._controllers.get(model)
+            if controller is None:
+                settings = self._settings.get(model, self._settings.get(None))
+                if settings is None:
+                    return None
+
+                controller = AdaptiveConcurrency(**settings)
+                self._controllers[model] = controller
+
+        return controller
+
+    def clear(self) -> None:
+        """
+        Disable adaptive concurrency for every model.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._settings.clear()
+            self._controllers.clear()
+
+    @property
+    def stats(self) -> dict:
+        """dict: Statistics of the adaptive concurrency limit of each model."""
+
+        with self._lock:
+            controllers = list(self._controllers.items())
+
+        return {model: controller.stats for model, controller in controllers}
+
+
+_observer = ContextVar('llmbox_concurrency_observer', default=None)
+
+
+@contextmanager
+def observing(controller: AdaptiveConcurrency) -> Iterator[None]:
+    """
+    Report the API responses received in this context to an adaptive concurrency limit.
+
+    Args:
+        controller(AdaptiveConcurrency): Adaptive concurrency limit to report to.
+    """
+
+    token = _observer.set(controller)
+    try:
+        yield
+    finally:
+        _observer.reset(token)
+
+
+def observe_response(status_code: int, headers: dict) -> None:
+    """
+    Report an API response to the adaptive concurrency limit of the current context, if any.
+
+    Args:
+        status_code(int): HTTP status code of the response.
+        headers(dict): HTTP headers of the response.
+
+    Returns:
+        None: None
+    """
+
+    controller = _observer.get()
+    if controller is not None:
+        controller.observe(status_code, headers)
+
+
+def _number(value: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+concurrency_limits = ConcurrencyRegistry()
@@ -0,0 +1,111 @@
+from dataclasses import astuple, dataclass, fields
+from functools import lru_cache
+import json
+
+
+@dataclass(frozen=True, slots=True)
+class GenerationConfig:
+    """
+    Class for the settings of a generation, immutable and hashable so it can be shared and used as a key.
+
+    Args:
+        max_tokens(:obj:`int`, defaults to 300): Maximum number of tokens to generate before stopping.
+        stop_sequences(:obj:`tuple(str)`, optional): Sequences to stop generating completion text.
+        temperature(:obj:`float`, optional): Amount of randomness injected into the response.
+        top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
+        top_k(:obj:`int`, optional): Number of options to sample from for each subsequent token.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.llms.config import GenerationConfig
+            from llmbox.chat import Chat, Message, Role
+
+            config = GenerationConfig(max_tokens=500, temperature=0.0)
+
+            llm = Claude2()
+            chat = Chat()
+
+            chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
+            response = llm.generate(chat=chat, config=config)
+    """
+
+    max_tokens: int = 300
+    stop_sequences: tuple[str, ...] = None
+    temperature: float = None
+    top_p: float = None
+    top_k: int = None
+
+    def __post_init__(self) -> None:
+        # Keep the stop sequences hashable
+        if self.stop_sequences is not None and not isinstance(self.stop_sequences, tuple):
+            object.__setattr__(self, 'stop_sequences', tuple(self.stop_sequences))
+
+    @property
+    def key(self) -> str:
+        """str: Stable key of the settings, the same across processes."""
+
+        return json.dumps(astuple(self))
+
+
+class RequestBuilder:
+    """
+    Class for a builder of the request arguments of an LLM creator from generation settings.
+
+    The mapping from settings to request arguments is compiled once, and the arguments of each settings are built
+    once and copied afterwards, so requests with the same settings cost a dictionary copy.
+
+    Args:
+        arguments(dict): Name of the request argument of each setting the creator takes.
+        max_size(:obj:`int`, defaults to 256): Number of settings whose arguments are kept.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms.config import GenerationConfig, RequestBuilder
+
+            builder = RequestBuilder(arguments={'max_tokens': 'max_tokens', 'stop_sequences': 'stop'})
+            print(builder.build(GenerationConfig(stop_sequences=['\\n'])))
+    """
+
+    def __init__(self, arguments: dict[str, str], max_size: int = 256) -> None:
+        # Verify settings
+        settings = [field.name for field in fields(GenerationConfig)]
+        unknown = set(arguments) - set(settings)
+        if unknown:
+            raise ValueError(f'Unknown settings: {", ".join(sorted(unknown))}.')
+
+        # Compile the position of each setting in the settings tuple and its argument name
+        self._arguments = tuple((settings.index(setting), name) for setting, name in arguments.items())
+        self._unsupported = tuple(
+            (settings.index(setting), setting) for setting in settings if setting not in arguments
+        )
+        self._items = lru_cache(maxsize=max_size)(self._compile)
+
+    def build(self, config: GenerationConfig) -> dict:
+        """
+        Build the request arguments of generation settings.
+
+        Args:
+            config(GenerationConfig): Generation settings.
+
+        Raises:
+            ValueError: If a setting the creator does not take is set.
+
+        Returns:
+            dict: Request arguments of the settings that are set, a new dictionary the caller can add to. Stop
+                sequences are passed as a tuple, so the cached arguments cannot be changed through a request.
+        """
+
+        return dict(self._items(config))
+
+    def _compile(self, config: GenerationConfig) -> tuple:
+        values = astuple(config)
+        for position, setting in self._unsupported:
+            if values[position] is not None:
+                raise ValueError(f'Setting {setting} is not supported by the LLM.')
+
+        return tuple((name, values[position]) for position, name in self._arguments if values[position] is not None)
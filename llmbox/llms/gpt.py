@@ -1,10 +1,20 @@
 from enum import Enum
 import os
+from typing import AsyncIterator, Iterator
 
 import openai
 
-from .base import BaseLLM, LLMCreator
+from .base import BaseLLM, LLMCreator, StreamEvent
+from .cache import BaseCache
+from .coalesce import SingleFlight
+from .config import GenerationConfig, RequestBuilder
+from .hedging import HedgingPolicy
+from .models import model_registry
+from .sessions import collect_responses, install_requests_session, shared_aiosession
 from ..chat import Chat
+from ..chat.context import ContextPolicy
+from ..chat.tokens import count_messages_openai, openai_counter
+from ..tracing import tracer
 
 
 class GPTModels(Enum):
@@ -14,21 +24,31 @@ class GPTModels(Enum):
     GPT4 = 'gpt-4'
 
 
-class GPT35Turbo(BaseLLM):
+class GPT(BaseLLM):
     """
-    Class for GPT-3.5-Turbo LLM by OpenAI.
+    Class for GPT LLMs by OpenAI.
 
     Args:
         api_key(:obj:`str`, optional): API Key for OpenAI client.
+        organization(:obj:`str`, optional): Organization for OpenAI client.
+        base_url(:obj:`str`, optional): Base URL for OpenAI client.
+        cache(:obj:`BaseCache`, optional): Cache for generated responses.
+        single_flight(:obj:`SingleFlight`, optional): Group through which identical requests in flight are shared.
+        hedging(:obj:`HedgingPolicy`, optional): Policy for hedging slow requests with a duplicate request.
+        fallback(:obj:`BaseLLM`, optional): LLM the requests divert to while the circuit breaker of the API is open.
+        context_policy(:obj:`ContextPolicy`, optional): Policy choosing which turns of a chat are sent, within the
+            context window of the model.
+        model(:obj:`str`, optional): Name of the model, such as a value of `GPTModels`. Defaults to the model of
+            the class.
 
     Example:
 
         .. code-block:: python
 
-            from llmbox.llms import GPT35Turbo
+            from llmbox.llms.gpt import GPT, GPTModels
             from llmbox.chat import Chat, Message, Role
 
-            llm = GPT35Turbo()
+            llm = GPT(model=GPTModels.GPT4)
             chat = Chat()
 
             chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
@@ -41,9 +61,47 @@ class GPT35Turbo(BaseLLM):
             print(next_response)
     """
 
-    def __init__(self, api_key: str = None) -> None:
+    # Model of the class, set by the classes of specific models
+    _MODEL = None
+
+    # Builder of the request arguments, naming the settings as OpenAI does
+    _REQUEST_BUILDER = RequestBuilder(arguments={
+        'max_tokens': 'max_tokens',
+        'stop_sequences': 'stop',
+        'temperature': 'temperature',
+        'top_p': 'top_p'
+    })
+
+    def __init__(
+        self,
+        api_key: str = None,
+        organization: str = None,
+        base_url: str = None,
+        cache: BaseCache = None,
+        single_flight: SingleFlight = None,
+        hedging: HedgingPolicy = None,
+        fallback: BaseLLM = None,
+        context_policy: ContextPolicy = None,
+        model: str = None
+    ) -> None:
+        # Verify model
+        model = model or self._MODEL
+        if model is None:
+            raise ValueError('Model not set. Pass the name of the model using the `model` argument, such as a value '
+                             'of `GPTModels`.')
+        self._model = model.value if isinstance(model, Enum) else model
+
         # Initialize parent class
-        super().__init__(creator=LLMCreator.OPENAI)
+        super().__init__(
+            creator=LLMCreator.OPENAI,
+            api_key=api_key or os.environ.get('OPENAI_API_KEY'),
+            base_url=base_url,
+            cache=cache,
+            single_flight=single_flight,
+            hedging=hedging,
+            fallback=fallback,
+            context_policy=context_policy
+        )
 
         # Verify authentication
         if api_key is None and os.environ.get('OPENAI_API_KEY') is None:
@@ -51,20 +109,29 @@ class GPT35Turbo(BaseLLM):
                              'Set the environment variable OPENAI_API_KEY with your API key (recommended) or '
                              'pass the API key using the `api_key` argument while initializing the class.')
 
-        # Initialize OpenAI client
-        self._openai = openai
-        if api_key is not None:
-            self._openai.api_key = api_key
-        else:
-            self._openai.api_key = os.environ['OPENAI_API_KEY']
+        # Set input arguments
+        self._api_key = api_key if api_key is not None else os.environ['OPENAI_API_KEY']
+        self._organization = organization
+
+        # Create credentials for OpenAI requests, passed with every request instead of set on the openai module
+        self._openai_arguments = {'api_key': self._api_key}
+        if organization is not None:
+            self._openai_arguments['organization'] = organization
+        if base_url is not None:
+            self._openai_arguments['api_base'] = base_url
+
+        # Report the responses of OpenAI to the adaptive concurrency limits
+        install_requests_session()
 
     def generate(
-            self,
-            chat: Chat,
-            max_tokens: int = None,
-            stop_sequences: list[str] = None,
-            temperature: float = None,
-            top_p: float = None
+        self,
+        chat: Chat,
+        max_tokens: int = None,
+        stop_sequences: list[str] = None,
+        temperature: float = None,
+        top_p: float = None,
+        use_cache: bool = None,
+        config: GenerationConfig = None
     ) -> str:
         """
         Generate response to a prompt.
@@ -75,6 +142,9 @@ class GPT35Turbo(BaseLLM):
             stop_sequences(:obj:`list(str)`, optional): Sequences to stop generating completion text.
             temperature(:obj:`float`, optional): Amount of randomness injected into the response.
             top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
+            use_cache(:obj:`bool`, optional): Whether to use the cache of the LLM. Defaults to caching only
+                requests with zero temperature.
+            config(:obj:`GenerationConfig`, optional): Generation settings, used instead of the settings above.
 
         Returns:
             str: Generated response from the LLM
@@ -95,75 +165,159 @@ class GPT35Turbo(BaseLLM):
         """
 
         # Create arguments for LLM generation
-        generation_arguments = {
-            'model': 'gpt-3.5-turbo',
-            'messages': chat.generate_messages_openai()
-        }
-        generation_optionals = ['max_tokens', 'stop_sequences', 'temperature', 'top_p']
-        for argument in generation_optionals:
-            if eval(argument) is not None:
-                generation_arguments[argument] = eval(argument)
+        config = config or GenerationConfig(
+            max_tokens=max_tokens,
+            stop_sequences=stop_sequences,
+            temperature=temperature,
+            top_p=top_p
+        )
+        generation_arguments = self._generation_arguments(chat=chat, config=config)
 
         # Generate response
-        response = openai.ChatCompletion.create(**generation_arguments).choices[0].message.content
+        response = self._complete(
+            generation_arguments,
+            use_cache=use_cache,
+            fallback_arguments=self._fallback_arguments(chat, config, use_cache)
+        )
 
         return response
 
+    async def agenerate(
+        self,
+        chat: Chat,
+        max_tokens: int = None,
+        stop_sequences: list[str] = None,
+        temperature: float = None,
+        top_p: float = None,
+        use_cache: bool = None,
+        config: GenerationConfig = None
+    ) -> str:
+        """
+        Generate response to a prompt asynchronously.
 
-class GPT4(BaseLLM):
-    """
-    Class for GPT-4 LLM by OpenAI.
+        Args:
+            chat(Chat): Chat containing the messages.
+            max_tokens(:obj:`int`, optional): Maximum number of tokens to generate before stopping.
+            stop_sequences(:obj:`list(str)`, optional): Sequences to stop generating completion text.
+            temperature(:obj:`float`, optional): Amount of randomness injected into the response.
+            top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
+            use_cache(:obj:`bool`, optional): Whether to use the cache of the LLM. Defaults to caching only
+                requests with zero temperature.
+            config(:obj:`GenerationConfig`, optional): Generation settings, used instead of the settings above.
 
-    Args:
-        api_key(:obj:`str`, optional): API Key for OpenAI client.
+        Returns:
+            str: Generated response from the LLM
 
-    Example:
+        Example:
 
         .. code-block:: python
 
-            from llmbox.llms import GPT4
+            import asyncio
+
+            from llmbox.llms import GPT35Turbo
             from llmbox.chat import Chat, Message, Role
 
-            llm = GPT4()
+            llm = GPT35Turbo()
             chat = Chat()
 
             chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
-            response = llm.generate(chat=chat)
+            response = asyncio.run(llm.agenerate(chat=chat))
             print(response)
+        """
 
-            chat.add_message(message=Message(text=response, role=Role.Assistant))
-            chat.add_message(message=Message(text='What about the moon?', role=Role.User))
-            next_response = llm.generate(chat=chat)
-            print(next_response)
-    """
+        # Create arguments for LLM generation
+        config = config or GenerationConfig(
+            max_tokens=max_tokens,
+            stop_sequences=stop_sequences,
+            temperature=temperature,
+            top_p=top_p
+        )
+        generation_arguments = self._generation_arguments(chat=chat, config=config)
 
-    def __init__(self, api_key: str = None) -> None:
-        # Initialize parent class
-        super().__init__(creator=LLMCreator.OPENAI)
+        # Generate response
+        response = await self._acomplete(
+            generation_arguments,
+            use_cache=use_cache,
+            fallback_arguments=self._fallback_arguments(chat, config, use_cache)
+        )
 
-        # Verify authentication
-        if api_key is None and os.environ.get('OPENAI_API_KEY') is None:
-            raise ValueError('API key not found. '
-                             'Set the environment variable OPENAI_API_KEY with your API key (recommended) or '
-                             'pass the API key using the `api_key` argument while initializing the class.')
+        return response
 
-        # Initialize OpenAI client
-        self._openai = openai
-        if api_key is not None:
-            self._openai.api_key = api_key
-        else:
-            self._openai.api_key = os.environ['OPENAI_API_KEY']
+    def generate_stream(
+        self,
+        chat: Chat,
+        max_tokens: int = None,
+        stop_sequences: list[str] = None,
+        temperature: float = None,
+        top_p: float = None,
+        use_cache: bool = None,
+        config: GenerationConfig = None
+    ) -> Iterator[StreamEvent]:
+        """
+        Generate response to a prompt as a stream of events.
 
-    def generate(
+        Each event carries the newly generated text. The final event carries the stop reason and the token usage
+        instead. Closing the iterator before it is exhausted closes the connection to the LLM.
+
+        Args:
+            chat(Chat): Chat containing the messages.
+            max_tokens(:obj:`int`, optional): Maximum number of tokens to generate before stopping.
+            stop_sequences(:obj:`list(str)`, optional): Sequences to stop generating completion text.
+            temperature(:obj:`float`, optional): Amount of randomness injected into the response.
+            top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
+            use_cache(:obj:`bool`, optional): Whether to use the cache of the LLM. Defaults to caching only
+                requests with zero temperature.
+            config(:obj:`GenerationConfig`, optional): Generation settings, used instead of the settings above.
+
+        Returns:
+            Iterator(StreamEvent): Stream of events with the generated response from the LLM
+
+        Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import GPT35Turbo
+            from llmbox.chat import Chat, Message, Role
+
+            llm = GPT35Turbo()
+            chat = Chat()
+
+            chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
+            for event in llm.generate_stream(chat=chat):
+                print(event.text, end='')
+        """
+
+        # Create arguments for LLM generation
+        config = config or GenerationConfig(
+            max_tokens=max_tokens,
+            stop_sequences=stop_sequences,
+            temperature=temperature,
+            top_p=top_p
+        )
+        generation_arguments = self._generation_arguments(chat=chat, config=config)
+
+        # Stream response
+        return self._complete_stream(
+            generation_arguments,
+            use_cache=use_cache,
+            fallback_arguments=self._fallback_arguments(chat, config, use_cache)
+        )
+
+    def agenerate_stream(
         self,
         chat: Chat,
         max_tokens: int = None,
         stop_sequences: list[str] = None,
         temperature: float = None,
-        top_p: float = None
-    ) -> str:
+        top_p: float = None,
+        use_cache: bool = None,
+        config: GenerationConfig = None
+    ) -> AsyncIterator[StreamEvent]:
         """
-        Generate response to a prompt.
+        Generate response to a prompt as an asynchronous stream of events.
+
+        Each event carries the newly generated text. The final event carries the stop reason and the token usage
+        instead. Closing the iterator before it is exhausted closes the connection to the LLM.
 
         Args:
             chat(Chat): Chat containing the messages.
@@ -171,12 +325,174 @@ class GPT4(BaseLLM):
             stop_sequences(:obj:`list(str)`, optional): Sequences to stop generating completion text.
             temperature(:obj:`float`, optional): Amount of randomness injected into the response.
             top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
+            use_cache(:obj:`bool`, optional): Whether to use the cache of the LLM. Defaults to caching only
+                requests with zero temperature.
+            config(:obj:`GenerationConfig`, optional): Generation settings, used instead of the settings above.
 
         Returns:
-            str: Generated response from the LLM
+            AsyncIterator(StreamEvent): Stream of events with the generated response from the LLM
 
         Example:
 
+        .. code-block:: python
+
+            import asyncio
+
+            from llmbox.llms import GPT35Turbo
+            from llmbox.chat import Chat, Message, Role
+
+            async def main():
+                llm = GPT35Turbo()
+                chat = Chat()
+
+                chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
+                async for event in llm.agenerate_stream(chat=chat):
+                    print(event.text, end='')
+
+            asyncio.run(main())
+        """
+
+        # Create arguments for LLM generation
+        config = config or GenerationConfig(
+            max_tokens=max_tokens,
+            stop_sequences=stop_sequences,
+            temperature=temperature,
+            top_p=top_p
+        )
+        generation_arguments = self._generation_arguments(chat=chat, config=config)
+
+        # Stream response
+        return self._acomplete_stream(
+            generation_arguments,
+            use_cache=use_cache,
+            fallback_arguments=self._fallback_arguments(chat, config, use_cache)
+        )
+
+    def _generation_arguments(self, chat: Chat, config: GenerationConfig) -> dict:
+        with tracer.span('llm.build_request', {'llm.model': self._model}):
+            # Send only the turns chosen by the context policy
+            chat = self._fit_context(chat, config.max_tokens)
+
+            # Create arguments for LLM generation
+            generation_arguments = self._REQUEST_BUILDER.build(config)
+            generation_arguments['model'] = self._model
+            with tracer.span('chat.render', {'chat.format': 'openai', 'chat.messages': len(chat.messages)}):
+                generation_arguments['messages'] = chat.generate_messages_openai()
+
+        return generation_arguments
+
+    def _create(self, arguments: dict) -> str:
+        return openai.ChatCompletion.create(**self._openai_arguments, **arguments).choices[0].message.content
+
+    async def _acreate(self, arguments: dict) -> str:
+        async with shared_aiosession():
+            response = await openai.ChatCompletion.acreate(**self._openai_arguments, **arguments)
+
+        return response.choices[0].message.content
+
+    def _create_stream(self, arguments: dict) -> Iterator[StreamEvent]:
+        with collect_responses() as responses:
+            stream = openai.ChatCompletion.create(**self._openai_arguments, **arguments, stream=True)
+
+        completion = []
+        stop_reason = None
+        try:
+            for chunk in stream:
+                choice = chunk.choices[0]
+                if choice.finish_reason is not None:
+                    stop_reason = choice.finish_reason
+                text = choice.delta.get('content')
+                if text:
+                    completion.append(text)
+                    yield StreamEvent(text=text)
+        finally:
+            # Close the connection right away, also when the consumer stops iterating early, the client leaves the
+            # response open until it is garbage collected
+            stream.close()
+            for response in responses:
+                response.close()
+
+        yield StreamEvent(
+            stop_reason=stop_reason,
+            prompt_tokens=count_messages_openai(arguments['messages']),
+            completion_tokens=openai_counter().count(''.join(completion)),
+            final=True
+        )
+
+    async def _acreate_stream(self, arguments: dict) -> AsyncIterator[StreamEvent]:
+        async with shared_aiosession():
+            with collect_responses() as responses:
+                stream = await openai.ChatCompletion.acreate(**self._openai_arguments, **arguments, stream=True)
+
+        completion = []
+        stop_reason = None
+        try:
+            async for chunk in stream:
+                choice = chunk.choices[0]
+                if choice.finish_reason is not None:
+                    stop_reason = choice.finish_reason
+                text = choice.delta.get('content')
+                if text:
+                    completion.append(text)
+                    yield StreamEvent(text=text)
+        finally:
+            # Close the connection right away, also when the consumer stops iterating early, the client leaves the
+            # response open until it is garbage collected
+            await stream.aclose()
+            for response in responses:
+                response.close()
+
+        yield StreamEvent(
+            stop_reason=stop_reason,
+            prompt_tokens=count_messages_openai(arguments['messages']),
+            completion_tokens=openai_counter().count(''.join(completion)),
+            final=True
+        )
+
+    @property
+    def model(self):
+        """str: Name of the model."""
+
+        return self._model
+
+    @property
+    def context_window(self):
+        """int: Number of tokens the model can attend to, prompt and response included. None if unknown."""
+
+        info = model_registry.find(self._model)
+
+        return info.context_window if info is not None else None
+
+    @property
+    def organization(self):
+        """str: Organization for OpenAI client."""
+
+        return self._organization
+
+    @property
+    def base_url(self):
+        """str: Base URL for OpenAI client."""
+
+        return self._base_url
+
+
+class GPT35Turbo(GPT):
+    """
+    Class for GPT-3.5-Turbo LLM by OpenAI.
+
+    Args:
+        api_key(:obj:`str`, optional): API Key for OpenAI client.
+        organization(:obj:`str`, optional): Organization for OpenAI client.
+        base_url(:obj:`str`, optional): Base URL for OpenAI client.
+        cache(:obj:`BaseCache`, optional): Cache for generated responses.
+        single_flight(:obj:`SingleFlight`, optional): Group through which identical requests in flight are shared.
+        hedging(:obj:`HedgingPolicy`, optional): Policy for hedging slow requests with a duplicate request.
+        fallback(:obj:`BaseLLM`, optional): LLM the requests divert to while the circuit breaker of the API is open.
+        context_policy(:obj:`ContextPolicy`, optional): Policy choosing which turns of a chat are sent, within the
+            context window of the model.
+
+    Example:
+
         .. code-block:: python
 
             from llmbox.llms import GPT35Turbo
@@ -188,19 +504,49 @@ class GPT4(BaseLLM):
             chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
             response = llm.generate(chat=chat)
             print(response)
-        """
 
-        # Create arguments for LLM generation
-        generation_arguments = {
-            'model': 'gpt-4',
-            'messages': chat.generate_messages_openai()
-        }
-        generation_optionals = ['max_tokens', 'stop_sequences', 'temperature', 'top_p']
-        for argument in generation_optionals:
-            if eval(argument) is not None:
-                generation_arguments[argument] = eval(argument)
+            chat.add_message(message=Message(text=response, role=Role.Assistant))
+            chat.add_message(message=Message(text='What about the moon?', role=Role.User))
+            next_response = llm.generate(chat=chat)
+            print(next_response)
+    """
 
-        # Generate response
-        response = openai.ChatCompletion.create(**generation_arguments).choices[0].message.content
+    _MODEL = GPTModels.GPT35TURBO
 
-        return response
+
+class GPT4(GPT):
+    """
+    Class for GPT-4 LLM by OpenAI.
+
+    Args:
+        api_key(:obj:`str`, optional): API Key for OpenAI client.
+        organization(:obj:`str`, optional): Organization for OpenAI client.
+        base_url(:obj:`str`, optional): Base URL for OpenAI client.
+        cache(:obj:`BaseCache`, optional): Cache for generated responses.
+        single_flight(:obj:`SingleFlight`, optional): Group through which identical requests in flight are shared.
+        hedging(:obj:`HedgingPolicy`, optional): Policy for hedging slow requests with a duplicate request.
+        fallback(:obj:`BaseLLM`, optional): LLM the requests divert to while the circuit breaker of the API is open.
+        context_policy(:obj:`ContextPolicy`, optional): Policy choosing which turns of a chat are sent, within the
+            context window of the model.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import GPT4
+            from llmbox.chat import Chat, Message, Role
+
+            llm = GPT4()
+            chat = Chat()
+
+            chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
+            response = llm.generate(chat=chat)
+            print(response)
+
+            chat.add_message(message=Message(text=response, role=Role.Assistant))
+            chat.add_message(message=Message(text='What about the moon?', role=Role.User))
+            next_response = llm.generate(chat=chat)
+            print(next_response)
+    """
+
+    _MODEL = GPTModels.GPT4
@@ -0,0 +1,350 @@
+import asyncio
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+import contextvars
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Iterator
+
+
+class HedgingPolicy:
+    """
+    Class for a policy that hedges slow requests with a duplicate request.
+
+    When a request has not returned, or a stream has not produced its first event, within a percentile of the
+    recent latencies, a duplicate request is sent and whichever finishes first is used. The slower asynchronous
+    request or stream is cancelled, while a slower synchronous request is left to finish in the background and its
+    response is discarded. Hedges are capped to a share of the requests so hedging cannot overload the API.
+
+    Args:
+        percentile(:obj:`float`, defaults to 95.0): Percentile of the recent latencies after which a request is
+            hedged.
+        max_extra_load(:obj:`float`, defaults to 0.05): Maximum number of hedges as a share of the requests.
+        min_samples(:obj:`int`, defaults to 20): Number of latencies to observe before hedging.
+        window(:obj:`int`, defaults to 200): Number of recent latencies the percentile is computed over.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.llms.hedging import HedgingPolicy
+
+            hedging = HedgingPolicy(percentile=90.0, max_extra_load=0.1)
+            llm = Claude2(hedging=hedging)
+
+            responses = llm.generate_many(chats=chats)
+            print(hedging.stats)
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        max_extra_load: float = 0.05,
+        min_samples: int = 20,
+        window: int = 200
+    ) -> None:
+        # Verify arguments
+        if not 0 < percentile < 100:
+            raise ValueError('Percentile must be between 0 and 100.')
+        if max_extra_load < 0:
+            raise ValueError('Maximum extra load must not be negative.')
+        if not 1 <= min_samples <= window:
+            raise ValueError('Minimum number of samples must be between 1 and the window.')
+
+        self._percentile = percentile
+        self._max_extra_load = max_extra_load
+        self._min_samples = min_samples
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._requests = 0
+        self._hedges = 0
+        self._wins = 0
+
+    def run(self, function: Callable[[], object]) -> object:
+        """
+        Call a function, hedging it with a second call if it is slow.
+
+        Args:
+            function(callable): Function making the request.
+
+        Returns:
+            object: Result of the call that finished first.
+        """
+
+        delay = self._start()
+        if delay is None:
+            return self._timed(function)
+
+        primary = _thread(lambda: self._timed(function))
+        if wait([primary], timeout=delay).done or not self._hedge():
+            return primary.result()
+
+        hedge = _thread(lambda: self._timed(function))
+
+        return self._first([primary, hedge], lambda future: None).result()
+
+    async def arun(self, function: Callable[[], Awaitable]) -> object:
+        """
+        Await a coroutine function, hedging it with a second call if it is slow.
+
+        Args:
+            function(callable): Coroutine function making the request.
+
+        Returns:
+            object: Result of the call that finished first.
+        """
+
+        delay = self._start()
+        if delay is None:
+            return await self._atimed(function)
+
+        primary = asyncio.ensure_future(self._atimed(function))
+        try:
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if done or not self._hedge():
+                return await primary
+
+            hedge = asyncio.ensure_future(self._atimed(function))
+            try:
+                return (await self._afirst([primary, hedge])).result()
+            finally:
+                hedge.cancel()
+        finally:
+            primary.cancel()
+
+    def stream(self, function: Callable[[], Iterator]) -> Iterator:
+        """
+        Stream from a function, hedging it with a second stream if its first event is slow.
+
+        Args:
+            function(callable): Function returning the stream.
+
+        Returns:
+            Iterator: Events of the stream that produced its first event first.
+        """
+
+        delay = self._start()
+        if delay is None:
+            stream, event = self._first_event(function)
+        else:
+            primary = _thread(lambda: self._first_event(function))
+            if wait([primary], timeout=delay).done or not self._hedge():
+                stream, event = primary.result()
+            else:
+                hedge = _thread(lambda: self._first_event(function))
+                stream, event = self._first([primary, hedge], _close).result()
+
+        try:
+            if event is not _END:
+                yield event
+                yield from stream
+        finally:
+            stream.close()
+
+    async def astream(self, function: Callable[[], AsyncIterator]) -> AsyncIterator:
+        """
+        Stream asynchronously from a function, hedging it with a second stream if its first event is slow.
+
+        Args:
+            function(callable): Function returning the asynchronous stream.
+
+        Returns:
+            AsyncIterator: Events of the stream that produced its first event first.
+        """
+
+        delay = self._start()
+        if delay is None:
+            stream, event = await self._afirst_event(function)
+        else:
+            tasks = [asyncio.ensure_future(self._afirst_event(function))]
+            try:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if done or not self._hedge():
+                    stream, event = await tasks[0]
+                else:
+                    tasks.append(asyncio.ensure_future(self._afirst_event(function)))
+                    winner = await self._afirst(tasks)
+                    stream, event = winner.result()
+
+                    # Close the stream of the slower request
+                    loser = tasks[1] if winner is tasks[0] else tasks[0]
+                    loser.cancel()
+                    if loser.done() and not loser.cancelled() and loser.exception() is None:
+                        await loser.result()[0].aclose()
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                raise
+
+        try:
+            if event is not _END:
+                yield event
+                async for event in stream:
+                    yield event
+        finally:
+            await stream.aclose()
+
+    def _start(self) -> float:
+        # Count the request and get the delay after which it is hedged, or None while there are too few latencies
+        with self._lock:
+            self._requests += 1
+            if len(self._latencies) < self._min_samples:
+                return None
+
+            latencies = sorted(self._latencies)
+
+        return latencies[int(self._percentile / 100 * (len(latencies) - 1))]
+
+    def _hedge(self) -> bool:
+        # Take a hedge from the extra load budget
+        with self._lock:
+            if self._hedges + 1 > self._max_extra_load * self._requests:
+                return False
+            self._hedges += 1
+
+            return True
+
+    def _record(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _timed(self, function: Callable[[], object]) -> object:
+        start = time.monotonic()
+        result = function()
+        self._record(time.monotonic() - start)
+
+        return result
+
+    async def _atimed(self, function: Callable[[], Awaitable]) -> object:
+        start = time.monotonic()
+        result = await function()
+        self._record(time.monotonic() - start)
+
+        return result
+
+    def _first_event(self, function: Callable[[], Iterator]) -> tuple:
+        start = time.monotonic()
+        stream = function()
+        try:
+            event = next(stream, _END)
+        except BaseException:
+            stream.close()
+            raise
+        self._record(time.monotonic() - start)
+
+        return stream, event
+
+    async def _afirst_event(self, function: Callable[[], AsyncIterator]) -> tuple:
+        start = time.monotonic()
+        stream = function()
+        try:
+            event = await anext(stream, _END)
+        except BaseException:
+            await stream.aclose()
+            raise
+        self._record(time.monotonic() - start)
+
+        return stream, event
+
+    def _first(self, futures: list[Future], discard: Callable[[Future], None]) -> Future:
+        # Wait for the first successful call, or the last failed one
+        pending = set(futures)
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done if future.exception() is None), None)
+            if winner is not None or not pending:
+                break
+
+        if winner is None:
+            return futures[0]
+        if winner is futures[1]:
+            with self._lock:
+                self._wins += 1
+
+        # Let the slower call finish in the background and discard its result
+        for future in futures:
+            if future is not winner:
+                future.add_done_callback(discard)
+
+        return winner
+
+    async def _afirst(self, tasks: list[asyncio.Task]) -> asyncio.Task:
+        # Wait for the first successful call, or the last failed one
+        pending = set(tasks)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), None)
+            if winner is not None or not pending:
+                break
+
+        if winner is None:
+            return tasks[0]
+        if winner is tasks[1]:
+            with self._lock:
+                self._wins += 1
+
+        return winner
+
+    @property
+    def requests(self) -> int:
+        """int: Number of requests made through the policy."""
+
+        return self._requests
+
+    @property
+    def hedges(self) -> int:
+        """int: Number of duplicate requests sent."""
+
+        return self._hedges
+
+    @property
+    def wins(self) -> int:
+        """int: Number of duplicate requests that finished before the original request."""
+
+        return self._wins
+
+    @property
+    def stats(self) -> dict:
+        """dict: Requests, hedges sent and won, and the current delay after which a request is hedged."""
+
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+        delay = None
+        if len(latencies) >= self._min_samples:
+            delay = latencies[int(self._percentile / 100 * (len(latencies) - 1))]
+
+        return {
+            'requests': self._requests,
+            'hedges': self._hedges,
+            'wins': self._wins,
+            'hedge_rate': self._hedges / self._requests if self._requests else 0.0,
+            'delay': delay
+        }
+
+
+_END = object()
+
+
+def _thread(function: Callable[[], object]) -> Future:
+    # Run a function in its own daemon thread, with the context of the caller
+    future = Future()
+    context = contextvars.copy_context()
+
+    def target():
+        try:
+            future.set_result(context.run(function))
+        except BaseException as error:
+            future.set_exception(error)
+
+    future.set_running_or_notify_cancel()
+    threading.Thread(target=target, daemon=True).start()
+
+    return future
+
+
+def _close(future: Future) -> None:
+    # Close the stream of a slower request once it produced its first event
+    if future.exception() is None:
+        future.result()[0].close()
@@ -0,0 +1,821 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import deque
+from enum import Enum
+import os
+import tempfile
+import threading
+import time
+from typing import Callable
+
+from ..chat.tokens import anthropic_counter, count_messages_openai, openai_counter
+
+
+# Bounds of the histogram buckets, in seconds and tokens per second
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+TOKENS_PER_SECOND_BUCKETS = (1.0, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0, 320.0)
+
+
+class Histogram:
+    """
+    Class for a histogram of observations with fixed bucket bounds.
+
+    Args:
+        buckets(:obj:`tuple(float)`): Upper bounds of the buckets, in increasing order. Observations above the last
+            bound are counted in an overflow bucket.
+    """
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        # Verify buckets
+        if list(buckets) != sorted(set(buckets)):
+            raise ValueError('Bucket bounds must be unique and in increasing order.')
+
+        self._bounds = tuple(buckets)
+        self._counts = [0] * (len(buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = None
+
+    def observe(self, value: float) -> None:
+        """
+        Add an observation. Not thread-safe, the series holding the histogram locks around it.
+
+        Args:
+            value(float): Observed value.
+
+        Returns:
+            None: None
+        """
+
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self._count += 1
+        self._sum += value
+        if self._max is None or value > self._max:
+            self._max = value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile of the observations, as the upper bound of the bucket it falls in.
+
+        Args:
+            q(float): Quantile, between 0 and 1.
+
+        Returns:
+            float: Estimated quantile, the largest observation if it falls in the overflow bucket, or None without
+                observations.
+        """
+
+        if self._count == 0:
+            return None
+
+        rank = q * self._count
+        cumulative = 0
+        for bound, count in zip(self._bounds, self._counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+
+        return self._max
+
+    @property
+    def snapshot(self) -> dict:
+        """dict: Number, sum, mean, maximum, estimated median and 95th percentile, and cumulative bucket counts."""
+
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self._bounds, self._counts):
+            cumulative += count
+            buckets.append([bound, cumulative])
+
+        return {
+            'count': self._count,
+            'sum': self._sum,
+            'mean': self._sum / self._count if self._count else None,
+            'max': self._max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': buckets
+        }
+
+
+class ModelMetrics:
+    """
+    Class for the metrics of the generation requests to a model.
+
+    Args:
+        creator(str): Creator of the model.
+        model(str): Name of the model.
+        latency_buckets(:obj:`tuple(float)`): Upper bounds of the buckets of the latency histograms, in seconds.
+        tokens_per_second_buckets(:obj:`tuple(float)`): Upper bounds of the buckets of the throughput histogram.
+    """
+
+    def __init__(
+        self,
+        creator: str,
+        model: str,
+        latency_buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        tokens_per_second_buckets: tuple[float, ...] = TOKENS_PER_SECOND_BUCKETS
+    ) -> None:
+        self._creator = creator
+        self._model = model
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._streams = 0
+        self._cache_hits = 0
+        self._errors = {}
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+        self._latency = Histogram(latency_buckets)
+        self._time_to_first_token = Histogram(latency_buckets)
+        self._tokens_per_second = Histogram(tokens_per_second_buckets)
+
+    def record(self, measurement: 'Measurement', end: float) -> None:
+        """
+        Record a finished request. Token counts estimated are stored in the measurement.
+
+        Args:
+            measurement(Measurement): Measurement of the request.
+            end(float): Time the request finished, from `time.perf_counter`.
+
+        Returns:
+            None: None
+        """
+
+        latency = end - measurement.start
+        time_to_first_token = None
+        if measurement.first_token is not None:
+            time_to_first_token = measurement.first_token - measurement.start
+
+        # Count the tokens sent to and generated by the API, cached responses use none
+        prompt_tokens = completion_tokens = 0
+        if not measurement.cache_hit and measurement.error is None:
+            prompt_tokens = measurement.prompt_tokens
+            if prompt_tokens is None and measurement.arguments is not None:
+                prompt_tokens = _count_prompt(measurement.arguments)
+            completion_tokens = measurement.completion_tokens
+            if completion_tokens is None and measurement.completion is not None:
+                completion_tokens = _count_completion(self._creator, measurement.completion)
+            measurement.prompt_tokens = prompt_tokens
+            measurement.completion_tokens = completion_tokens
+
+        # Measure the throughput of the generation after the first token
+        tokens_per_second = None
+        if completion_tokens:
+            duration = end - (measurement.first_token or measurement.start)
+            if duration > 0:
+                tokens_per_second = completion_tokens / duration
+
+        with self._lock:
+            self._requests += 1
+            self._latency.observe(latency)
+            if measurement.stream:
+                self._streams += 1
+            if measurement.cache_hit:
+                self._cache_hits += 1
+            if measurement.error is not None:
+                self._errors[measurement.error] = self._errors.get(measurement.error, 0) + 1
+            if time_to_first_token is not None:
+                self._time_to_first_token.observe(time_to_first_token)
+            self._prompt_tokens += prompt_tokens or 0
+            self._completion_tokens += completion_tokens or 0
+            if tokens_per_second is not None:
+                self._tokens_per_second.observe(tokens_per_second)
+
+    @property
+    def creator(self) -> str:
+        """str: Creator of the model."""
+
+        return self._creator
+
+    @property
+    def model(self) -> str:
+        """str: Name of the model."""
+
+        return self._model
+
+    @property
+    def snapshot(self) -> dict:
+        """dict: Requests, streams, cache hits, errors by type, tokens in and out, and histograms of the timings."""
+
+        with self._lock:
+            return {
+                'creator': self._creator,
+                'model': self._model,
+                'requests': self._requests,
+                'streams': self._streams,
+                'cache_hits': self._cache_hits,
+                'errors': dict(self._errors),
+                'prompt_tokens': self._prompt_tokens,
+                'completion_tokens': self._completion_tokens,
+                'latency': self._latency.snapshot,
+                'time_to_first_token': self._time_to_first_token.snapshot,
+                'tokens_per_second': self._tokens_per_second.snapshot
+            }
+
+
+class Measurement:
+    """
+    Class for the measurement of a generation request, recorded when its context exits.
+
+    The request fills in what it learns as it goes, such as the arrival of the first token or the token usage, and
+    an exception leaving the context is recorded as an error of its type. Interruptions that are not errors, such as a
+    stream closed early or a cancelled task, are recorded without one.
+
+    Args:
+        series(:obj:`ModelMetrics`, optional): Metrics of the model the request is recorded in. Nothing is recorded
+            without it.
+        stream(:obj:`bool`, defaults to False): Whether the response is streamed.
+    """
+
+    __slots__ = (
+        'series', 'stream', 'start', 'first_token', 'cache_hit', 'error', 'arguments', 'completion', 'prompt_tokens',
+        'completion_tokens'
+    )
+
+    def __init__(self, series: ModelMetrics = None, stream: bool = False) -> None:
+        self.series = series
+        self.stream = stream
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.cache_hit = False
+        self.error = None
+        self.arguments = None
+        self.completion = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+
+    def mark_first_token(self) -> None:
+        """
+        Mark the arrival of the first token, later calls are ignored.
+
+        Returns:
+            None: None
+        """
+
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+
+    def fail(self, error: Exception) -> None:
+        """
+        Mark the request as failed with an error handled within the context.
+
+        Args:
+            error(Exception): Error of the request.
+
+        Returns:
+            None: None
+        """
+
+        self.error = type(error).__name__
+
+    def __enter__(self) -> 'Measurement':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self.series is None:
+            return False
+
+        if self.error is None and exc_type is not None and issubclass(exc_type, Exception):
+            self.error = exc_type.__name__
+        self.series.record(self, time.perf_counter())
+
+        return False
+
+
+class BaseExporter(ABC):
+    """
+    Base class for exporters of metrics.
+    """
+
+    @abstractmethod
+    def export(self, snapshot: list[dict]) -> None:
+        """
+        Export a snapshot of the metrics.
+
+        Args:
+            snapshot(:obj:`list(dict)`): Metrics of each model, as given by `MetricsRegistry.snapshot`.
+
+        Returns:
+            None: None
+        """
+
+        pass
+
+    def close(self) -> None:
+        """
+        Release the resources of the exporter.
+
+        Returns:
+            None: None
+        """
+
+        pass
+
+
+class MemoryExporter(BaseExporter):
+    """
+    Class for an exporter keeping the latest snapshots of the metrics in memory.
+
+    Args:
+        max_snapshots(:obj:`int`, defaults to 1): Number of snapshots kept.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms.metrics import MemoryExporter, metrics
+
+            exporter = MemoryExporter(max_snapshots=60)
+            metrics.add_exporter(exporter)
+            metrics.start(interval=60.0)
+            ...
+            print(exporter.snapshot)
+    """
+
+    def __init__(self, max_snapshots: int = 1) -> None:
+        self._lock = threading.Lock()
+        self._snapshots = deque(maxlen=max_snapshots)
+
+    def export(self, snapshot: list[dict]) -> None:
+        """
+        Keep a snapshot of the metrics, dropping the oldest one kept if needed.
+
+        Args:
+            snapshot(:obj:`list(dict)`): Metrics of each model.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._snapshots.append((time.time(), snapshot))
+
+    @property
+    def snapshot(self) -> list[dict]:
+        """list: Latest snapshot of the metrics, or None before the first export."""
+
+        with self._lock:
+            return self._snapshots[-1][1] if self._snapshots else None
+
+    @property
+    def snapshots(self) -> list[tuple]:
+        """list: Snapshots kept with the time they were exported, oldest first."""
+
+        with self._lock:
+            return list(self._snapshots)
+
+
+class PrometheusExporter(BaseExporter):
+    """
+    Class for an exporter of the metrics in the Prometheus text format, to a file or a local HTTP endpoint.
+
+    Exports write the file atomically, for the textfile collector of the node exporter. The endpoint renders the
+    metrics of the registry on every scrape, so it needs no periodic export.
+
+    Args:
+        path(:obj:`str`, optional): Path of the file the metrics are written to on export.
+        registry(:obj:`MetricsRegistry`, optional): Registry served by the endpoint. Defaults to `metrics`.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms.metrics import PrometheusExporter
+
+            # Serve the metrics at http://127.0.0.1:9464/metrics
+            exporter = PrometheusExporter()
+            exporter.serve(port=9464)
+    """
+
+    def __init__(self, path: str = None, registry: 'MetricsRegistry' = None) -> None:
+        self._path = path
+        self._registry = registry
+        self._server = None
+
+    def export(self, snapshot: list[dict]) -> None:
+        """
+        Write a snapshot of the metrics to the file, if any.
+
+        Args:
+            snapshot(:obj:`list(dict)`): Metrics of each model.
+
+        Returns:
+            None: None
+        """
+
+        if self._path is None:
+            return
+
+        directory = os.path.dirname(os.path.abspath(self._path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as file:
+            file.write(render_prometheus(snapshot))
+        os.replace(file.name, self._path)
+
+    def serve(self, port: int = 9464, host: str = '127.0.0.1') -> None:
+        """
+        Serve the metrics at the `/metrics` path of a local HTTP endpoint, from a background thread.
+
+        Args:
+            port(:obj:`int`, defaults to 9464): Port of the endpoint.
+            host(:obj:`str`, defaults to '127.0.0.1'): Address the endpoint listens on.
+
+        Returns:
+            None: None
+        """
+
+        if self._server is not None:
+            raise RuntimeError('Metrics are already served.')
+
+        # Import the HTTP server only when serving, it is slow to import
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self._registry or metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body = render_prometheus(registry.snapshot()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='llmbox-metrics', daemon=True).start()
+
+    def close(self) -> None:
+        """
+        Stop serving the metrics.
+
+        Returns:
+            None: None
+        """
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def path(self) -> str:
+        """str: Path of the file the metrics are written to on export."""
+
+        return self._path
+
+    @property
+    def port(self) -> int:
+        """int: Port the metrics are served on, or None if they are not served."""
+
+        return self._server.server_address[1] if self._server is not None else None
+
+
+class CallbackExporter(BaseExporter):
+    """
+    Class for an exporter passing the snapshots of the metrics to a function, such as a client of a metrics service.
+
+    Args:
+        callback(callable): Function called with each snapshot of the metrics.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms.metrics import CallbackExporter, metrics
+
+            metrics.add_exporter(CallbackExporter(callback=lambda snapshot: print(snapshot)))
+            metrics.start(interval=60.0)
+    """
+
+    def __init__(self, callback: Callable[[list[dict]], None]) -> None:
+        self._callback = callback
+
+    def export(self, snapshot: list[dict]) -> None:
+        """
+        Pass a snapshot of the metrics to the function.
+
+        Args:
+            snapshot(:obj:`list(dict)`): Metrics of each model.
+
+        Returns:
+            None: None
+        """
+
+        self._callback(snapshot)
+
+
+class MetricsRegistry:
+    """
+    Class for a registry of the metrics of the generation requests of every LLM, per creator and model.
+
+    Every request is recorded with its end-to-end latency, cache included, along with its errors by type, the time to
+    its first token when streamed, its tokens in and out and its tokens per second. Recording takes a lock per model
+    and a few microseconds, so metrics are enabled by default. Token counts are estimated unless the API reports
+    them. Snapshots are exported on demand or periodically from a background thread.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.llms.metrics import PrometheusExporter, metrics
+
+            # Write the metrics for the textfile collector every 15 seconds
+            metrics.add_exporter(PrometheusExporter(path='/var/lib/node_exporter/llmbox.prom'))
+            metrics.start(interval=15.0)
+
+            llm = Claude2()
+            response = llm.generate(chat=chat)
+            print(metrics.snapshot())
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._enabled = True
+        self._latency_buckets = LATENCY_BUCKETS
+        self._tokens_per_second_buckets = TOKENS_PER_SECOND_BUCKETS
+        self._series = {}
+        self._exporters = []
+        self._thread = None
+        self._stop = None
+
+    def configure(
+        self,
+        enabled: bool = True,
+        latency_buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        tokens_per_second_buckets: tuple[float, ...] = TOKENS_PER_SECOND_BUCKETS
+    ) -> None:
+        """
+        Enable or disable the metrics and set the buckets of the histograms. Recorded metrics are cleared.
+
+        Args:
+            enabled(:obj:`bool`, defaults to True): Whether requests are recorded.
+            latency_buckets(:obj:`tuple(float)`): Upper bounds of the buckets of the latency histograms, in seconds.
+            tokens_per_second_buckets(:obj:`tuple(float)`): Upper bounds of the buckets of the throughput histogram.
+
+        Returns:
+            None: None
+        """
+
+        # Verify buckets
+        Histogram(latency_buckets)
+        Histogram(tokens_per_second_buckets)
+
+        with self._lock:
+            self._enabled = enabled
+            self._latency_buckets = tuple(latency_buckets)
+            self._tokens_per_second_buckets = tuple(tokens_per_second_buckets)
+            self._series.clear()
+
+    def series(self, creator: Enum, model: str) -> ModelMetrics:
+        """
+        Get the metrics of a model.
+
+        Args:
+            creator(Enum): Creator of the model.
+            model(str): Name of the model.
+
+        Returns:
+            ModelMetrics: Metrics of the model, or None if metrics are disabled.
+        """
+
+        if not self._enabled:
+            return None
+
+        key = (creator, model)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.get(key)
+                if series is None:
+                    series = ModelMetrics(
+                        creator=creator.value if isinstance(creator, Enum) else creator,
+                        model=model,
+                        latency_buckets=self._latency_buckets,
+                        tokens_per_second_buckets=self._tokens_per_second_buckets
+                    )
+                    self._series[key] = series
+
+        return series
+
+    def measure(self, creator: Enum, model: str, stream: bool = False) -> Measurement:
+        """
+        Start the measurement of a request to a model, recorded when its context exits.
+
+        Args:
+            creator(Enum): Creator of the model.
+            model(str): Name of the model.
+            stream(:obj:`bool`, defaults to False): Whether the response is streamed.
+
+        Returns:
+            Measurement: Measurement of the request, recording nothing if metrics are disabled.
+        """
+
+        return Measurement(series=self.series(creator, model), stream=stream)
+
+    def snapshot(self) -> list[dict]:
+        """
+        Get the metrics of every model.
+
+        Returns:
+            list: Metrics of each model.
+        """
+
+        with self._lock:
+            series = list(self._series.values())
+
+        return [model_metrics.snapshot for model_metrics in series]
+
+    def add_exporter(self, exporter: BaseExporter) -> None:
+        """
+        Add an exporter the snapshots of the metrics are exported to.
+
+        Args:
+            exporter(BaseExporter): Exporter of the metrics.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._exporters.append(exporter)
+
+    def remove_exporter(self, exporter: BaseExporter) -> None:
+        """
+        Remove an exporter and release its resources.
+
+        Args:
+            exporter(BaseExporter): Exporter of the metrics.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._exporters.remove(exporter)
+        exporter.close()
+
+    def export(self) -> None:
+        """
+        Export a snapshot of the metrics to every exporter. An exporter failing does not stop the others.
+
+        Returns:
+            None: None
+        """
+
+        snapshot = self.snapshot()
+        with self._lock:
+            exporters = list(self._exporters)
+
+        for exporter in exporters:
+            try:
+                exporter.export(snapshot)
+            except Exception:
+                pass
+
+    def start(self, interval: float = 15.0) -> None:
+        """
+        Export the metrics periodically from a background thread.
+
+        Args:
+            interval(:obj:`float`, defaults to 15.0): Seconds between exports.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            if self._thread is not None:
+                raise RuntimeError('Metrics are already exported periodically.')
+
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(interval, self._stop), name='llmbox-metrics-export', daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop exporting the metrics periodically, after a last export.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            thread, stop = self._thread, self._stop
+            self._thread = self._stop = None
+
+        if thread is not None:
+            stop.set()
+            thread.join()
+            self.export()
+
+    def clear(self) -> None:
+        """
+        Remove the recorded metrics. Exporters and settings are kept.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._series.clear()
+
+    def _run(self, interval: float, stop: threading.Event) -> None:
+        while not stop.wait(interval):
+            self.export()
+
+    @property
+    def enabled(self) -> bool:
+        """bool: Whether requests are recorded."""
+
+        return self._enabled
+
+
+def render_prometheus(snapshot: list[dict]) -> str:
+    """
+    Render a snapshot of the metrics in the Prometheus text format.
+
+    Args:
+        snapshot(:obj:`list(dict)`): Metrics of each model, as given by `MetricsRegistry.snapshot`.
+
+    Returns:
+        str: Metrics in the Prometheus text format.
+    """
+
+    lines = []
+
+    def family(name: str, kind: str, description: str) -> None:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    def histogram(name: str, labels: str, values: dict) -> None:
+        for bound, count in values['buckets']:
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {values["count"]}')
+        lines.append(f'{name}_sum{{{labels}}} {values["sum"]}')
+        lines.append(f'{name}_count{{{labels}}} {values["count"]}')
+
+    labels = [_labels(creator=series['creator'], model=series['model']) for series in snapshot]
+    for name, key, description in [
+        ('llmbox_requests_total', 'requests', 'Number of generation requests.'),
+        ('llmbox_streams_total', 'streams', 'Number of streamed generation requests.'),
+        ('llmbox_cache_hits_total', 'cache_hits', 'Number of generation requests answered from the cache.'),
+        ('llmbox_prompt_tokens_total', 'prompt_tokens', 'Number of tokens sent to the API.'),
+        ('llmbox_completion_tokens_total', 'completion_tokens', 'Number of tokens generated by the API.')
+    ]:
+        family(name, 'counter', description)
+        for series, series_labels in zip(snapshot, labels):
+            lines.append(f'{name}{{{series_labels}}} {series[key]}')
+
+    family('llmbox_errors_total', 'counter', 'Number of failed generation requests by error type.')
+    for series in snapshot:
+        for error, count in sorted(series['errors'].items()):
+            error_labels = _labels(creator=series['creator'], model=series['model'], type=error)
+            lines.append(f'llmbox_errors_total{{{error_labels}}} {count}')
+
+    for name, key, description in [
+        ('llmbox_request_duration_seconds', 'latency', 'End-to-end latency of generation requests.'),
+        ('llmbox_time_to_first_token_seconds', 'time_to_first_token', 'Time to the first token of streamed requests.'),
+        ('llmbox_tokens_per_second', 'tokens_per_second', 'Tokens generated per second after the first token.')
+    ]:
+        family(name, 'histogram', description)
+        for series, series_labels in zip(snapshot, labels):
+            histogram(name, series_labels, series[key])
+
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels) -> str:
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _count_prompt(arguments: dict) -> int:
+    if 'prompt' in arguments:
+        return anthropic_counter(accurate=False).count(arguments['prompt'])
+    if 'messages' in arguments:
+        return count_messages_openai(arguments['messages'], counter=openai_counter(accurate=False))
+
+    return None
+
+
+def _count_completion(creator: str, completion: str) -> int:
+    if creator == 'anthropic':
+        return anthropic_counter(accurate=False).count(completion)
+
+    return openai_counter(accurate=False).count(completion)
+
+
+metrics = MetricsRegistry()
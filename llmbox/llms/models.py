@@ -0,0 +1,314 @@
+from collections import OrderedDict
+from enum import Enum
+import importlib
+import threading
+
+from .base import BaseLLM, LLMCreator
+
+
+class SpeedTier(Enum):
+    """List of speed tiers of LLMs."""
+
+    FAST = 'fast'
+    STANDARD = 'standard'
+    SLOW = 'slow'
+
+
+class ModelInfo:
+    """
+    Class for the capabilities of a model.
+
+    Args:
+        model(str): Name of the model, such as a value of `ClaudeModels` or `GPTModels`.
+        creator(LLMCreator): Creator of the model.
+        context_window(:obj:`int`, optional): Number of tokens the model can attend to, prompt and response included.
+        speed_tier(:obj:`SpeedTier`, defaults to SpeedTier.STANDARD): Speed of the model relative to other models.
+        streaming(:obj:`bool`, defaults to True): Whether the model can stream responses.
+        llm_class(:obj:`str`, optional): Import path of the class of the LLM, such as 'llmbox.llms.claude.Claude2'.
+            Defaults to the class for any model of the creator.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        creator: LLMCreator,
+        context_window: int = None,
+        speed_tier: SpeedTier = SpeedTier.STANDARD,
+        streaming: bool = True,
+        llm_class: str = None
+    ) -> None:
+        self._model = model
+        self._creator = creator
+        self._context_window = context_window
+        self._speed_tier = speed_tier
+        self._streaming = streaming
+        self._llm_class = llm_class or _CREATOR_CLASSES[creator]
+
+    def load_class(self) -> type:
+        """
+        Import the class of the LLM, along with the client of the creator.
+
+        Returns:
+            type: Class of the LLM.
+        """
+
+        module, name = self._llm_class.rsplit('.', 1)
+
+        return getattr(importlib.import_module(module), name)
+
+    @property
+    def model(self) -> str:
+        """str: Name of the model."""
+
+        return self._model
+
+    @property
+    def creator(self) -> LLMCreator:
+        """LLMCreator: Creator of the model."""
+
+        return self._creator
+
+    @property
+    def context_window(self) -> int:
+        """int: Number of tokens the model can attend to, prompt and response included."""
+
+        return self._context_window
+
+    @property
+    def speed_tier(self) -> SpeedTier:
+        """SpeedTier: Speed of the model relative to other models."""
+
+        return self._speed_tier
+
+    @property
+    def streaming(self) -> bool:
+        """bool: Whether the model can stream responses."""
+
+        return self._streaming
+
+    @property
+    def llm_class(self) -> str:
+        """str: Import path of the class of the LLM."""
+
+        return self._llm_class
+
+    def __repr__(self):
+        return f'<ModelInfo: {self._model}>'
+
+
+class ModelRegistry:
+    """
+    Class for a registry of models, their capabilities and a factory of LLMs for them.
+
+    Models are keyed by their name, the values of `ClaudeModels` and `GPTModels`, and the enum members can be used as
+    keys too. The factory shares one LLM per model and arguments, so sessions using the same credentials reuse it, and
+    keeps only the most recently used LLMs. Classes are imported on first use, so only the clients of the models used
+    are loaded.
+
+    Args:
+        max_llms(:obj:`int`, defaults to 64): Maximum number of shared LLMs kept.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms.base import LLMCreator
+            from llmbox.llms.models import ModelInfo, SpeedTier, model_registry
+
+            # Shared LLM for the model and API key
+            llm = model_registry.get('claude-2', api_key='...')
+            print(model_registry.info('claude-2').context_window)
+
+            # Add a model served by the generic class of its creator
+            model_registry.register(
+                ModelInfo(model='claude-2.1', creator=LLMCreator.ANTHROPIC, context_window=200000)
+            )
+            llm = model_registry.get('claude-2.1', api_key='...')
+    """
+
+    def __init__(self, max_llms: int = 64) -> None:
+        self._max_llms = max_llms
+        self._lock = threading.Lock()
+        self._models = {}
+        self._llms = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def register(self, info: ModelInfo) -> None:
+        """
+        Add a model to the registry, or replace it.
+
+        Args:
+            info(ModelInfo): Capabilities of the model.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._models[info.model] = info
+
+            # Drop the LLMs of a replaced model
+            for key in [key for key in self._llms if key[0] == info.model]:
+                del self._llms[key]
+
+    def find(self, model: str) -> ModelInfo:
+        """
+        Get the capabilities of a model if it is registered.
+
+        Args:
+            model(str): Name of the model.
+
+        Returns:
+            ModelInfo: Capabilities of the model, or None if the model is not registered.
+        """
+
+        return self._models.get(_name(model))
+
+    def info(self, model: str) -> ModelInfo:
+        """
+        Get the capabilities of a model.
+
+        Args:
+            model(str): Name of the model.
+
+        Raises:
+            KeyError: If the model is not registered.
+
+        Returns:
+            ModelInfo: Capabilities of the model.
+        """
+
+        info = self.find(model)
+        if info is None:
+            raise KeyError(f'Model {_name(model)} not found. Available models: {", ".join(self._models)}.')
+
+        return info
+
+    def create(self, model: str, **kwargs) -> BaseLLM:
+        """
+        Create a new LLM for a model.
+
+        Args:
+            model(str): Name of the model.
+            **kwargs: Arguments of the class of the LLM, such as the API key.
+
+        Returns:
+            BaseLLM: LLM for the model.
+        """
+
+        info = self.info(model)
+        llm_class = info.load_class()
+
+        # Classes for any model of a creator need the model
+        if getattr(llm_class, '_MODEL', None) is None:
+            kwargs['model'] = info.model
+
+        return llm_class(**kwargs)
+
+    def get(self, model: str, **kwargs) -> BaseLLM:
+        """
+        Get the LLM for a model shared by the callers with the same arguments, creating it on first use.
+
+        Args:
+            model(str): Name of the model.
+            **kwargs: Arguments of the class of the LLM, such as the API key. Values must be hashable.
+
+        Returns:
+            BaseLLM: LLM for the model.
+        """
+
+        key = (_name(model), tuple(sorted(kwargs.items())))
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is not None:
+                self._hits += 1
+                self._llms.move_to_end(key)
+                return llm
+
+        llm = self.create(model, **kwargs)
+        with self._lock:
+            self._misses += 1
+            llm = self._llms.setdefault(key, llm)
+
+            # Drop the least recently used LLMs, their clients are closed once no session holds them anymore
+            while len(self._llms) > self._max_llms:
+                self._llms.popitem(last=False)
+
+            return llm
+
+    def clear(self) -> None:
+        """
+        Remove the shared LLMs. Registered models are kept.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._llms.clear()
+
+    def models(self, creator: LLMCreator = None, speed_tier: SpeedTier = None) -> list[ModelInfo]:
+        """
+        List the registered models.
+
+        Args:
+            creator(:obj:`LLMCreator`, optional): Creator of the models to list.
+            speed_tier(:obj:`SpeedTier`, optional): Speed tier of the models to list.
+
+        Returns:
+            list: Capabilities of the models.
+        """
+
+        return [
+            info for info in self._models.values()
+            if (creator is None or info.creator is creator) and (speed_tier is None or info.speed_tier is speed_tier)
+        ]
+
+    @property
+    def stats(self) -> dict:
+        """dict: Number of models and shared LLMs, and LLMs reused and created."""
+
+        with self._lock:
+            return {'models': len(self._models), 'llms': len(self._llms), 'hits': self._hits, 'misses': self._misses}
+
+
+def _name(model: str) -> str:
+    return model.value if isinstance(model, Enum) else model
+
+
+# Classes for any model of each creator
+_CREATOR_CLASSES = {
+    LLMCreator.ANTHROPIC: 'llmbox.llms.claude.Claude',
+    LLMCreator.OPENAI: 'llmbox.llms.gpt.GPT'
+}
+
+model_registry = ModelRegistry()
+model_registry.register(ModelInfo(
+    model='claude-instant-1',
+    creator=LLMCreator.ANTHROPIC,
+    context_window=100000,
+    speed_tier=SpeedTier.FAST,
+    llm_class='llmbox.llms.claude.ClaudeInstant1'
+))
+model_registry.register(ModelInfo(
+    model='claude-2',
+    creator=LLMCreator.ANTHROPIC,
+    context_window=100000,
+    speed_tier=SpeedTier.STANDARD,
+    llm_class='llmbox.llms.claude.Claude2'
+))
+model_registry.register(ModelInfo(
+    model='gpt-3.5-turbo',
+    creator=LLMCreator.OPENAI,
+    context_window=4096,
+    speed_tier=SpeedTier.FAST,
+    llm_class='llmbox.llms.gpt.GPT35Turbo'
+))
+model_registry.register(ModelInfo(
+    model='gpt-4',
+    creator=LLMCreator.OPENAI,
+    context_window=8192,
+    speed_tier=SpeedTier.SLOW,
+    llm_class='llmbox.llms.gpt.GPT4'
+))
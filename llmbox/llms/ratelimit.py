@@ -0,0 +1,260 @@
+import asyncio
+from enum import Enum
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Class for a client-side rate limiter with requests per minute and tokens per minute budgets.
+
+    Each budget is a token bucket refilled continuously over the minute. Requests reserve their share of the
+    budgets in the order they arrive and wait until the reservation is covered, so queued requests are served
+    fairly instead of failing. Works for both threads and asyncio tasks.
+
+    Args:
+        requests_per_minute(:obj:`int`, optional): Maximum number of requests per minute.
+        tokens_per_minute(:obj:`int`, optional): Maximum number of tokens per minute.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms.ratelimit import RateLimiter
+
+            limiter = RateLimiter(requests_per_minute=50, tokens_per_minute=40000)
+            limiter.acquire(tokens=1200)
+    """
+
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None) -> None:
+        # Verify budgets
+        for budget in [requests_per_minute, tokens_per_minute]:
+            if budget is not None and budget <= 0:
+                raise ValueError('Rate limit budgets must be positive.')
+
+        self._requests_per_minute = requests_per_minute
+        self._tokens_per_minute = tokens_per_minute
+        self._request_bucket = _Bucket(requests_per_minute) if requests_per_minute is not None else None
+        self._token_bucket = _Bucket(tokens_per_minute) if tokens_per_minute is not None else None
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._tokens = 0
+        self._waits = 0
+        self._wait_time = 0.0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Wait until a request with the given number of tokens fits in the budgets.
+
+        Args:
+            tokens(:obj:`int`, defaults to 0): Estimated number of tokens of the request.
+
+        Returns:
+            float: Number of seconds waited.
+        """
+
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+        return delay
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        """
+        Wait asynchronously until a request with the given number of tokens fits in the budgets.
+
+        Args:
+            tokens(:obj:`int`, defaults to 0): Estimated number of tokens of the request.
+
+        Returns:
+            float: Number of seconds waited.
+        """
+
+        delay = self._reserve(tokens)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # Give the reservation back to the requests queued behind
+                self._release(tokens)
+                raise
+
+        return delay
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            delay = 0.0
+            if self._request_bucket is not None:
+                delay = max(delay, self._request_bucket.reserve(1, now))
+            if self._token_bucket is not None:
+                delay = max(delay, self._token_bucket.reserve(tokens, now))
+
+            # Update counters
+            self._requests += 1
+            self._tokens += tokens
+            if delay > 0:
+                self._waits += 1
+                self._wait_time += delay
+
+        return delay
+
+    def _release(self, tokens: int) -> None:
+        with self._lock:
+            if self._request_bucket is not None:
+                self._request_bucket.release(1)
+            if self._token_bucket is not None:
+                self._token_bucket.release(tokens)
+
+    @property
+    def requests_per_minute(self) -> int:
+        """int: Maximum number of requests per minute."""
+
+        return self._requests_per_minute
+
+    @property
+    def tokens_per_minute(self) -> int:
+        """int: Maximum number of tokens per minute."""
+
+        return self._tokens_per_minute
+
+    @property
+    def stats(self) -> dict:
+        """dict: Requests and tokens admitted, requests that had to wait and the total time waited."""
+
+        return {
+            'requests': self._requests,
+            'tokens': self._tokens,
+            'waits': self._waits,
+            'wait_time': self._wait_time
+        }
+
+
+class RateLimiterRegistry:
+    """
+    Class for a registry of rate limiters shared by all LLMs with the same creator and API key.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2, ClaudeInstant1
+            from llmbox.llms.base import LLMCreator
+            from llmbox.llms.ratelimit import rate_limiters
+
+            rate_limiters.configure(LLMCreator.ANTHROPIC, requests_per_minute=50, tokens_per_minute=40000)
+
+            # Both LLMs draw from the same budgets
+            llm = Claude2(api_key='...')
+            other_llm = ClaudeInstant1(api_key='...')
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._limits = {}
+        self._limiters = {}
+
+    def configure(
+        self,
+        creator: Enum,
+        requests_per_minute: int = None,
+        tokens_per_minute: int = None,
+        api_key: str = None
+    ) -> None:
+        """
+        Set the budgets of a creator's API keys. Budgets set for a specific API key take precedence.
+
+        Args:
+            creator(LLMCreator): Creator of the LLMs.
+            requests_per_minute(:obj:`int`, optional): Maximum number of requests per minute.
+            tokens_per_minute(:obj:`int`, optional): Maximum number of tokens per minute.
+            api_key(:obj:`str`, optional): API key the budgets apply to. Defaults to every API key of the creator.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._limits[(creator, api_key)] = (requests_per_minute, tokens_per_minute)
+
+            # Drop limiters with outdated budgets, they are recreated on the next request
+            for key in list(self._limiters):
+                if key[0] == creator and (api_key is None or key[1] == api_key):
+                    del self._limiters[key]
+
+    def limiter(self, creator: Enum, api_key: str) -> RateLimiter:
+        """
+        Get the rate limiter shared by the LLMs with the given creator and API key.
+
+        Args:
+            creator(LLMCreator): Creator of the LLM.
+            api_key(str): API key of the LLM.
+
+        Returns:
+            RateLimiter: Rate limiter, or None if no budgets are set.
+        """
+
+        with self._lock:
+            limiter = self._limiters.get((creator, api_key))
+            if limiter is None:
+                limits = self._limits.get((creator, api_key), self._limits.get((creator, None)))
+                if limits is None:
+                    return None
+
+                limiter = RateLimiter(requests_per_minute=limits[0], tokens_per_minute=limits[1])
+                self._limiters[(creator, api_key)] = limiter
+
+        return limiter
+
+    def clear(self) -> None:
+        """
+        Remove all budgets and rate limiters.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._limits.clear()
+            self._limiters.clear()
+
+    @property
+    def stats(self) -> list[dict]:
+        """list: Creator, budgets and statistics of each rate limiter."""
+
+        with self._lock:
+            limiters = list(self._limiters.items())
+
+        return [
+            {
+                'creator': creator.name,
+                'requests_per_minute': limiter.requests_per_minute,
+                'tokens_per_minute': limiter.tokens_per_minute,
+                **limiter.stats
+            }
+            for (creator, _), limiter in limiters
+        ]
+
+
+class _Bucket:
+    # Token bucket holding a minute of budget. Reservations may take the level below zero, the deficit is the time
+    # the reserving request has to wait.
+
+    def __init__(self, per_minute: int) -> None:
+        self._capacity = float(per_minute)
+        self._rate = per_minute / 60.0
+        self._level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._level = min(self._capacity, self._level + (now - self._updated) * self._rate)
+        self._updated = now
+        self._level -= amount
+
+        return max(0.0, -self._level / self._rate)
+
+    def release(self, amount: float) -> None:
+        self._level = min(self._capacity, self._level + amount)
+
+
+rate_limiters = RateLimiterRegistry()
@@ -0,0 +1,488 @@
+import threading
+import time
+from typing import AsyncIterator, Iterator
+
+from .base import BaseLLM, StreamEvent
+from ..chat import Chat
+from ..chat.tokens import anthropic_counter, openai_counter
+
+
+class Route:
+    """
+    Class for a backend LLM of a router.
+
+    The latency of a request is predicted as the time to the first event plus a time per generated token. The time to
+    the first event is learnt from streamed requests, and the time per token from all requests.
+
+    Args:
+        llm(BaseLLM): LLM the requests are sent to.
+        context_window(:obj:`int`, optional): Number of tokens the LLM can attend to, prompt and response included.
+            Defaults to the context window of the model.
+        max_prompt_tokens(:obj:`int`, optional): Maximum number of prompt tokens the route takes, so longer prompts
+            go to the next routes.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import ClaudeInstant1
+            from llmbox.llms.router import Route
+
+            route = Route(llm=ClaudeInstant1(), max_prompt_tokens=2000)
+    """
+
+    def __init__(self, llm: BaseLLM, context_window: int = None, max_prompt_tokens: int = None) -> None:
+        self._llm = llm
+        self._context_window = context_window or llm.context_window
+        self._max_prompt_tokens = max_prompt_tokens
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._latency = None
+        self._first_event_latency = None
+        self._seconds_per_token = None
+
+    def fits(self, prompt_tokens: int, max_tokens: int) -> bool:
+        """
+        Check whether a request fits the route.
+
+        Args:
+            prompt_tokens(int): Number of tokens in the prompt.
+            max_tokens(int): Maximum number of tokens to generate.
+
+        Returns:
+            bool: Whether the request fits.
+        """
+
+        if self._max_prompt_tokens is not None and prompt_tokens > self._max_prompt_tokens:
+            return False
+        if self._context_window is not None and prompt_tokens + max_tokens > self._context_window:
+            return False
+
+        return True
+
+    def predict_latency(self, max_tokens: int) -> float:
+        """
+        Predict the latency of a request from the recent requests of the route.
+
+        Args:
+            max_tokens(int): Maximum number of tokens to generate.
+
+        Returns:
+            float: Predicted number of seconds, or None before the first successful request.
+        """
+
+        if self._seconds_per_token is None:
+            return None
+
+        return (self._first_event_latency or 0.0) + self._seconds_per_token * max_tokens
+
+    def record(
+        self,
+        latency: float,
+        completion_tokens: int = None,
+        first_event_latency: float = None,
+        error: bool = False
+    ) -> None:
+        """
+        Record a request of the route.
+
+        Args:
+            latency(float): Number of seconds the request took.
+            completion_tokens(:obj:`int`, optional): Number of tokens in the generated response.
+            first_event_latency(:obj:`float`, optional): Number of seconds to the first event of a streamed request.
+            error(:obj:`bool`, defaults to False): Whether the request failed.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._requests += 1
+            if error:
+                self._errors += 1
+                return
+
+            self._latency = _average(self._latency, latency)
+            if first_event_latency is not None:
+                self._first_event_latency = _average(self._first_event_latency, first_event_latency)
+
+            # Time per token after the first event, measured for streams and estimated otherwise
+            if first_event_latency is None:
+                first_event_latency = self._first_event_latency or 0.0
+            seconds_per_token = max(0.0, latency - first_event_latency) / max(1, completion_tokens or 0)
+            self._seconds_per_token = _average(self._seconds_per_token, seconds_per_token)
+
+    @property
+    def llm(self) -> BaseLLM:
+        """BaseLLM: LLM the requests are sent to."""
+
+        return self._llm
+
+    @property
+    def stats(self) -> dict:
+        """dict: Requests, errors and average latencies of the route."""
+
+        return {
+            'model': self._llm.model,
+            'requests': self._requests,
+            'errors': self._errors,
+            'latency': self._latency,
+            'first_event_latency': self._first_event_latency,
+            'seconds_per_token': self._seconds_per_token
+        }
+
+
+class Router(BaseLLM):
+    """
+    Class for an LLM that routes every request to one of several backend LLMs.
+
+    Routes are tried in order of preference, so list the fast models first and the capable ones last. Each request
+    goes to the first route its prompt and response fit into and, given a latency budget, whose predicted
+    latency fits the budget according to the live statistics of the route. When the chosen LLM fails, the request
+    falls back to the next fitting route. Streams fall back only until their first event.
+
+    Args:
+        routes(:obj:`list(Route)`): Backend LLMs in order of preference.
+        latency_budget(:obj:`float`, optional): Default number of seconds a request should take.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2, ClaudeInstant1, GPT4
+            from llmbox.llms.router import Route, Router
+            from llmbox.chat import Chat, Message, Role
+
+            llm = Router(routes=[
+                Route(llm=ClaudeInstant1(), max_prompt_tokens=2000),
+                Route(llm=GPT4()),
+                Route(llm=Claude2())
+            ])
+            chat = Chat()
+
+            # Short chats go to Claude Instant, long ones to the next fitting model
+            chat.add_message(message=Message(text='How big is the earth?', role=Role.User))
+            response = llm.generate(chat=chat, latency_budget=5.0)
+            print(response)
+            print(llm.stats)
+    """
+
+    def __init__(self, routes: list[Route], latency_budget: float = None) -> None:
+        # Initialize parent class
+        super().__init__(creator=None)
+
+        # Verify routes
+        if len(routes) == 0:
+            raise ValueError('At least one route is required.')
+
+        self._routes = list(routes)
+        self._latency_budget = latency_budget
+
+    def generate(
+        self,
+        chat: Chat,
+        max_tokens: int = 300,
+        stop_sequences: list[str] = None,
+        temperature: float = None,
+        top_p: float = None,
+        latency_budget: float = None,
+        use_cache: bool = None
+    ) -> str:
+        """
+        Generate response to a prompt with the LLM of the chosen route.
+
+        Args:
+            chat(Chat): Chat containing the messages.
+            max_tokens(:obj:`int`, defaults to 300): Maximum number of tokens to generate before stopping.
+            stop_sequences(:obj:`list(str)`, optional): Sequences to stop generating completion text.
+            temperature(:obj:`float`, optional): Amount of randomness injected into the response.
+            top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
+            latency_budget(:obj:`float`, optional): Number of seconds the request should take. Defaults to the
+                latency budget of the router.
+            use_cache(:obj:`bool`, optional): Whether to use the cache of the chosen LLM.
+
+        Returns:
+            str: Generated response from the LLM
+        """
+
+        return self._create(self._generation_arguments(
+            chat, max_tokens, stop_sequences, temperature, top_p, latency_budget, use_cache
+        ))
+
+    async def agenerate(
+        self,
+        chat: Chat,
+        max_tokens: int = 300,
+        stop_sequences: list[str] = None,
+        temperature: float = None,
+        top_p: float = None,
+        latency_budget: float = None,
+        use_cache: bool = None
+    ) -> str:
+        """
+        Generate response to a prompt asynchronously with the LLM of the chosen route.
+
+        Args:
+            chat(Chat): Chat containing the messages.
+            max_tokens(:obj:`int`, defaults to 300): Maximum number of tokens to generate before stopping.
+            stop_sequences(:obj:`list(str)`, optional): Sequences to stop generating completion text.
+            temperature(:obj:`float`, optional): Amount of randomness injected into the response.
+            top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
+            latency_budget(:obj:`float`, optional): Number of seconds the request should take. Defaults to the
+                latency budget of the router.
+            use_cache(:obj:`bool`, optional): Whether to use the cache of the chosen LLM.
+
+        Returns:
+            str: Generated response from the LLM
+        """
+
+        return await self._acreate(self._generation_arguments(
+            chat, max_tokens, stop_sequences, temperature, top_p, latency_budget, use_cache
+        ))
+
+    def generate_stream(
+        self,
+        chat: Chat,
+        max_tokens: int = 300,
+        stop_sequences: list[str] = None,
+        temperature: float = None,
+        top_p: float = None,
+        latency_budget: float = None,
+        use_cache: bool = None
+    ) -> Iterator[StreamEvent]:
+        """
+        Generate response to a prompt as a stream of events with the LLM of the chosen route.
+
+        Args:
+            chat(Chat): Chat containing the messages.
+            max_tokens(:obj:`int`, defaults to 300): Maximum number of tokens to generate before stopping.
+            stop_sequences(:obj:`list(str)`, optional): Sequences to stop generating completion text.
+            temperature(:obj:`float`, optional): Amount of randomness injected into the response.
+            top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
+            latency_budget(:obj:`float`, optional): Number of seconds the request should take. Defaults to the
+                latency budget of the router.
+            use_cache(:obj:`bool`, optional): Whether to use the cache of the chosen LLM.
+
+        Returns:
+            Iterator(StreamEvent): Stream of events with the generated response from the LLM
+        """
+
+        return self._create_stream(self._generation_arguments(
+            chat, max_tokens, stop_sequences, temperature, top_p, latency_budget, use_cache
+        ))
+
+    def agenerate_stream(
+        self,
+        chat: Chat,
+        max_tokens: int = 300,
+        stop_sequences: list[str] = None,
+        temperature: float = None,
+        top_p: float = None,
+        latency_budget: float = None,
+        use_cache: bool = None
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        Generate response to a prompt asynchronously as a stream of events with the LLM of the chosen route.
+
+        Args:
+            chat(Chat): Chat containing the messages.
+            max_tokens(:obj:`int`, defaults to 300): Maximum number of tokens to generate before stopping.
+            stop_sequences(:obj:`list(str)`, optional): Sequences to stop generating completion text.
+            temperature(:obj:`float`, optional): Amount of randomness injected into the response.
+            top_p(:obj:`float`, optional): Cutoff probability for nucleus sampling of each subsequent token.
+            latency_budget(:obj:`float`, optional): Number of seconds the request should take. Defaults to the
+                latency budget of the router.
+            use_cache(:obj:`bool`, optional): Whether to use the cache of the chosen LLM.
+
+        Returns:
+            AsyncIterator(StreamEvent): Stream of events with the generated response from the LLM
+        """
+
+        return self._acreate_stream(self._generation_arguments(
+            chat, max_tokens, stop_sequences, temperature, top_p, latency_budget, use_cache
+        ))
+
+    def _generation_arguments(
+        self,
+        chat: Chat,
+        max_tokens: int,
+        stop_sequences: list[str],
+        temperature: float,
+        top_p: float,
+        latency_budget: float,
+        use_cache: bool
+    ) -> dict:
+        # Create arguments passed on to the LLM of the chosen route
+        generation_arguments = {'chat': chat, 'max_tokens': max_tokens}
+        for argument, value in [('stop_sequences', stop_sequences), ('temperature', temperature), ('top_p', top_p),
+                                ('use_cache', use_cache)]:
+            if value is not None:
+                generation_arguments[argument] = value
+
+        # Choose the routes to try, in order
+        latency_budget = latency_budget if latency_budget is not None else self._latency_budget
+
+        return {'routes': self._choose(chat, max_tokens, latency_budget), 'arguments': generation_arguments}
+
+    def _choose(self, chat: Chat, max_tokens: int, latency_budget: float) -> list[Route]:
+        # Count the prompt in the format of each route's creator, the chat caches the counts
+        routes = []
+        for route in self._routes:
+            if route.llm.creator == 'ANTHROPIC':
+                prompt_tokens = chat.count_tokens_anthropic()
+            else:
+                prompt_tokens = chat.count_tokens_openai()
+            if route.fits(prompt_tokens, max_tokens):
+                routes.append(route)
+        if len(routes) == 0:
+            raise ValueError(f'No route fits the prompt and {max_tokens} tokens to generate.')
+        if latency_budget is None:
+            return routes
+
+        # Prefer routes expected to meet the budget, then the fastest ones
+        within_budget, over_budget = [], []
+        for route in routes:
+            latency = route.predict_latency(max_tokens)
+            if latency is None or latency <= latency_budget:
+                within_budget.append(route)
+            else:
+                over_budget.append(route)
+
+        return within_budget + sorted(over_budget, key=lambda route: route.predict_latency(max_tokens))
+
+    def _create(self, arguments: dict) -> str:
+        error = None
+        for route in arguments['routes']:
+            start = time.monotonic()
+            try:
+                response = route.llm.generate(**arguments['arguments'])
+            except Exception as route_error:
+                # Fall back to the next route
+                route.record(time.monotonic() - start, error=True)
+                error = route_error
+                continue
+            route.record(time.monotonic() - start, completion_tokens=_count_tokens(route, response))
+
+            return response
+
+        raise error
+
+    async def _acreate(self, arguments: dict) -> str:
+        error = None
+        for route in arguments['routes']:
+            start = time.monotonic()
+            try:
+                response = await route.llm.agenerate(**arguments['arguments'])
+            except Exception as route_error:
+                # Fall back to the next route
+                route.record(time.monotonic() - start, error=True)
+                error = route_error
+                continue
+            route.record(time.monotonic() - start, completion_tokens=_count_tokens(route, response))
+
+            return response
+
+        raise error
+
+    def _create_stream(self, arguments: dict) -> Iterator[StreamEvent]:
+        error = None
+        for route in arguments['routes']:
+            start = time.monotonic()
+            stream = route.llm.generate_stream(**arguments['arguments'])
+            try:
+                event = next(stream, None)
+            except Exception as route_error:
+                # Fall back to the next route until the stream has started
+                route.record(time.monotonic() - start, error=True)
+                error = route_error
+                continue
+            first_event_latency = time.monotonic() - start
+
+            texts, completion_tokens = [], None
+            try:
+                while event is not None:
+                    texts.append(event.text)
+                    completion_tokens = event.completion_tokens or completion_tokens
+                    yield event
+                    event = next(stream, None)
+            except Exception:
+                route.record(time.monotonic() - start, error=True)
+                raise
+            finally:
+                stream.close()
+            route.record(
+                time.monotonic() - start,
+                completion_tokens=completion_tokens or _count_tokens(route, ''.join(texts)),
+                first_event_latency=first_event_latency
+            )
+
+            return
+
+        raise error
+
+    async def _acreate_stream(self, arguments: dict) -> AsyncIterator[StreamEvent]:
+        error = None
+        for route in arguments['routes']:
+            start = time.monotonic()
+            stream = route.llm.agenerate_stream(**arguments['arguments'])
+            try:
+                event = await anext(stream, None)
+            except Exception as route_error:
+                # Fall back to the next route until the stream has started
+                route.record(time.monotonic() - start, error=True)
+                error = route_error
+                continue
+            first_event_latency = time.monotonic() - start
+
+            texts, completion_tokens = [], None
+            try:
+                while event is not None:
+                    texts.append(event.text)
+                    completion_tokens = event.completion_tokens or completion_tokens
+                    yield event
+                    event = await anext(stream, None)
+            except Exception:
+                route.record(time.monotonic() - start, error=True)
+                raise
+            finally:
+                await stream.aclose()
+            route.record(
+                time.monotonic() - start,
+                completion_tokens=completion_tokens or _count_tokens(route, ''.join(texts)),
+                first_event_latency=first_event_latency
+            )
+
+            return
+
+        raise error
+
+    @property
+    def creator(self) -> str:
+        """str: Creator of the LLM, None as the routes may have different creators."""
+
+        return None
+
+    @property
+    def routes(self) -> list[Route]:
+        """list: Backend LLMs in order of preference."""
+
+        return self._routes
+
+    @property
+    def stats(self) -> list[dict]:
+        """list: Requests, errors and average latencies of each route."""
+
+        return [route.stats for route in self._routes]
+
+
+def _average(average: float, value: float) -> float:
+    # Exponentially weighted moving average, favoring recent requests
+    return value if average is None else 0.8 * average + 0.2 * value
+
+
+def _count_tokens(route: Route, text: str) -> int:
+    # Count in the format of the route's creator, as prompts are counted
+    counter = anthropic_counter() if route.llm.creator == 'ANTHROPIC' else openai_counter()
+
+    return counter.count(text)
@@ -0,0 +1,139 @@
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator
+import weakref
+
+import aiohttp
+import openai
+from openai.api_requestor import MAX_CONNECTION_RETRIES
+import requests
+
+from .concurrency import observe_response
+
+
+def install_requests_session() -> None:
+    """
+    Send the synchronous requests of the OpenAI client through sessions reporting their responses, unless the
+    application set `openai.requestssession` already.
+
+    The OpenAI client creates a session per thread, the sessions are created by :func:`requests_session` instead.
+
+    Returns:
+        None: None
+    """
+
+    if openai.requestssession is None:
+        openai.requestssession = requests_session
+
+
+def requests_session() -> requests.Session:
+    """
+    Create a session for the synchronous requests of the OpenAI client, like the client does, which reports the
+    responses to the adaptive concurrency limits.
+
+    Returns:
+        requests.Session: Session.
+    """
+
+    session = requests.Session()
+    if isinstance(openai.proxy, str):
+        session.proxies = {'http': openai.proxy, 'https': openai.proxy}
+    elif isinstance(openai.proxy, dict):
+        session.proxies = dict(openai.proxy)
+    session.mount('https://', requests.adapters.HTTPAdapter(max_retries=MAX_CONNECTION_RETRIES))
+    session.hooks['response'].append(_on_response)
+
+    return session
+
+
+@asynccontextmanager
+async def shared_aiosession() -> AsyncIterator[None]:
+    """
+    Send the asynchronous requests of the OpenAI client in this context through the session of the running event loop,
+    unless the application set `openai.aiosession`.
+
+    The OpenAI client otherwise opens a session per request, so no connection is reused. The session reports the
+    responses to the adaptive concurrency limits, and is closed when the event loop shuts its asynchronous generators
+    down, as `asyncio.run` does.
+    """
+
+    if openai.aiosession.get() is not None:
+        yield
+        return
+
+    token = openai.aiosession.set(await _loop_session())
+    try:
+        yield
+    finally:
+        openai.aiosession.reset(token)
+
+
+@contextmanager
+def collect_responses() -> Iterator[list]:
+    """
+    Collect the HTTP responses the OpenAI client receives in this context through the sessions of this module, for
+    instance to close the response of a stream.
+
+    Returns:
+        Iterator(list): List the responses are added to.
+    """
+
+    responses = []
+    token = _responses.set(responses)
+    try:
+        yield responses
+    finally:
+        _responses.reset(token)
+
+
+# Responses collected in the current context
+_responses = ContextVar('llmbox_openai_responses', default=None)
+
+# Shared session of each event loop, with the generator closing it
+_loop_sessions = weakref.WeakKeyDictionary()
+
+
+async def _loop_session() -> aiohttp.ClientSession:
+    loop = asyncio.get_running_loop()
+    entry = _loop_sessions.get(loop)
+    if entry is None:
+        trace = aiohttp.TraceConfig()
+        trace.on_request_end.append(_on_request_end)
+        session = aiohttp.ClientSession(trace_configs=[trace])
+
+        # Start the generator so the loop closes it on shutdown, it does not suspend
+        closer = _close_on_shutdown(loop, session)
+        await anext(closer)
+        entry = _loop_sessions[loop] = (session, closer)
+
+    return entry[0]
+
+
+async def _close_on_shutdown(loop: asyncio.AbstractEventLoop, session: aiohttp.ClientSession) -> AsyncIterator:
+    try:
+        yield
+    finally:
+        _loop_sessions.pop(loop, None)
+        await session.close()
+
+
+def _on_response(response: requests.Response, *args, **kwargs) -> None:
+    _observe(response.status_code, response.headers, response)
+
+
+async def _on_request_end(
+    session: aiohttp.ClientSession,
+    context: object,
+    params: aiohttp.TraceRequestEndParams
+) -> None:
+    _observe(params.response.status, params.response.headers, params.response)
+
+
+def _observe(status_code: int, headers: dict, response: object) -> None:
+    # Report rate limit headers and overload to the adaptive concurrency limit of the request
+    observe_response(status_code, headers)
+
+    responses = _responses.get()
+    if responses is not None:
+        responses.append(response)
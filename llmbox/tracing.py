@@ -0,0 +1,590 @@
+from abc import ABC, abstractmethod
+import atexit
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import random
+import threading
+import time
+from typing import Iterator
+
+
+class Span:
+    """
+    Class for a span, a timed operation within a trace.
+
+    Spans are created by the tracer, and nest under the span current in the context they are started in. The context
+    follows asyncio tasks, and the threads started by llmbox, so a trace covers a request end to end.
+
+    Args:
+        name(str): Name of the operation, such as 'llm.generate'.
+        trace_id(str): ID of the trace, 32 hexadecimal digits.
+        parent_id(:obj:`str`, optional): ID of the parent span, 16 hexadecimal digits. None for the root of a trace.
+        attributes(:obj:`dict`, optional): Attributes of the operation, such as the model or the token counts.
+        tracer(:obj:`Tracer`, optional): Tracer the span is exported through once it ends.
+    """
+
+    __slots__ = (
+        '_name', '_trace_id', '_span_id', '_parent_id', '_attributes', '_events', '_start_time', '_end_time',
+        '_error', '_thread', '_tracer', '_token'
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str = None,
+        attributes: dict = None,
+        tracer: 'Tracer' = None
+    ) -> None:
+        self._name = name
+        self._trace_id = trace_id
+        self._span_id = f'{random.getrandbits(64):016x}'
+        self._parent_id = parent_id
+        self._attributes = dict(attributes) if attributes else {}
+        self._events = []
+        self._start_time = time.time_ns()
+        self._end_time = None
+        self._error = None
+        self._thread = threading.current_thread().name
+        self._tracer = tracer
+        self._token = None
+
+    def set_attribute(self, key: str, value: object) -> None:
+        """
+        Set an attribute of the span.
+
+        Args:
+            key(str): Name of the attribute.
+            value(object): Value of the attribute, a string, number or boolean.
+
+        Returns:
+            None: None
+        """
+
+        self._attributes[key] = value
+
+    def set_attributes(self, attributes: dict) -> None:
+        """
+        Set attributes of the span, leaving out the ones without a value.
+
+        Args:
+            attributes(dict): Attributes of the span.
+
+        Returns:
+            None: None
+        """
+
+        for key, value in attributes.items():
+            if value is not None:
+                self._attributes[key] = value
+
+    def add_event(self, name: str, attributes: dict = None) -> None:
+        """
+        Add a timestamped event to the span, such as the arrival of the first token.
+
+        Args:
+            name(str): Name of the event.
+            attributes(:obj:`dict`, optional): Attributes of the event.
+
+        Returns:
+            None: None
+        """
+
+        self._events.append((name, time.time_ns(), attributes or {}))
+
+    def fail(self, error: Exception) -> None:
+        """
+        Mark the operation as failed.
+
+        Args:
+            error(Exception): Error of the operation.
+
+        Returns:
+            None: None
+        """
+
+        self._error = f'{type(error).__name__}: {error}'
+
+    def end(self) -> None:
+        """
+        End the span and hand it to the tracer for export, later calls are ignored.
+
+        Returns:
+            None: None
+        """
+
+        if self._end_time is not None:
+            return
+
+        self._end_time = time.time_ns()
+        if self._tracer is not None:
+            self._tracer._finish(self)
+
+    def to_dict(self) -> dict:
+        """
+        Get the span as a dictionary.
+
+        Returns:
+            dict: Span with its IDs, times in seconds since the epoch, duration in milliseconds, status, attributes
+                and events.
+        """
+
+        end_time = self._end_time if self._end_time is not None else time.time_ns()
+
+        return {
+            'trace_id': self._trace_id,
+            'span_id': self._span_id,
+            'parent_id': self._parent_id,
+            'name': self._name,
+            'start_time': self._start_time / 1e9,
+            'end_time': end_time / 1e9,
+            'duration_ms': (end_time - self._start_time) / 1e6,
+            'status': 'error' if self._error is not None else 'ok',
+            'error': self._error,
+            'thread': self._thread,
+            'attributes': dict(self._attributes),
+            'events': [
+                {'name': name, 'time': timestamp / 1e9, 'attributes': attributes}
+                for name, timestamp, attributes in self._events
+            ]
+        }
+
+    def __enter__(self) -> 'Span':
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current_span.reset(self._token)
+        self._token = None
+
+        # Only errors fail the operation, not a closed generator or a cancelled task
+        if exc is not None and isinstance(exc, Exception):
+            self.fail(exc)
+        self.end()
+
+        return False
+
+    @property
+    def name(self) -> str:
+        """str: Name of the operation."""
+
+        return self._name
+
+    @property
+    def trace_id(self) -> str:
+        """str: ID of the trace."""
+
+        return self._trace_id
+
+    @property
+    def span_id(self) -> str:
+        """str: ID of the span."""
+
+        return self._span_id
+
+    @property
+    def parent_id(self) -> str:
+        """str: ID of the parent span, None for the root of a trace."""
+
+        return self._parent_id
+
+    @property
+    def attributes(self) -> dict:
+        """dict: Attributes of the operation."""
+
+        return self._attributes
+
+    @property
+    def start_time(self) -> int:
+        """int: Time the span started, in nanoseconds since the epoch."""
+
+        return self._start_time
+
+    @property
+    def end_time(self) -> int:
+        """int: Time the span ended, in nanoseconds since the epoch, or None if it has not ended."""
+
+        return self._end_time
+
+    @property
+    def events(self) -> list[tuple]:
+        """list: Events of the span, as tuples of their name, time in nanoseconds since the epoch and attributes."""
+
+        return self._events
+
+    @property
+    def error(self) -> str:
+        """str: Error of the operation, or None if it succeeded."""
+
+        return self._error
+
+    @property
+    def thread(self) -> str:
+        """str: Name of the thread the span started in."""
+
+        return self._thread
+
+    def __repr__(self):
+        return f'<Span: {self._name}>'
+
+
+class _NoopSpan(Span):
+    # Span handed out while tracing is disabled, recording nothing
+
+    def __init__(self) -> None:
+        super().__init__(name='', trace_id='0' * 32)
+
+    def set_attribute(self, key: str, value: object) -> None:
+        pass
+
+    def set_attributes(self, attributes: dict) -> None:
+        pass
+
+    def add_event(self, name: str, attributes: dict = None) -> None:
+        pass
+
+    def fail(self, error: Exception) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> 'Span':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+class BaseSpanExporter(ABC):
+    """
+    Base class for exporters of spans.
+    """
+
+    @abstractmethod
+    def export(self, spans: list[Span]) -> None:
+        """
+        Export finished spans.
+
+        Args:
+            spans(:obj:`list(Span)`): Finished spans.
+
+        Returns:
+            None: None
+        """
+
+        pass
+
+    def close(self) -> None:
+        """
+        Release the resources of the exporter.
+
+        Returns:
+            None: None
+        """
+
+        pass
+
+
+class _FileExporter(BaseSpanExporter, ABC):
+    # Exporter appending lines to a file, shared by the threads exporting
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def export(self, spans: list[Span]) -> None:
+        lines = self._lines(spans)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.writelines(line + '\n' for line in lines)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @abstractmethod
+    def _lines(self, spans: list[Span]) -> list[str]:
+        pass
+
+    @property
+    def path(self) -> str:
+        """str: Path of the file the spans are written to."""
+
+        return self._path
+
+
+class JSONLExporter(_FileExporter):
+    """
+    Class for an exporter writing each span as a line of JSON to a local file.
+
+    Args:
+        path(str): Path of the file the spans are appended to.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.tracing import JSONLExporter, tracer
+
+            tracer.add_exporter(JSONLExporter(path='traces.jsonl'))
+    """
+
+    def _lines(self, spans: list[Span]) -> list[str]:
+        return [json.dumps(span.to_dict(), default=str) for span in spans]
+
+
+class OTLPFileExporter(_FileExporter):
+    """
+    Class for an exporter writing spans to a local file in the OTLP JSON format, one export request per line.
+
+    The file can be loaded by the OpenTelemetry Collector's file receiver, or sent to any OTLP endpoint.
+
+    Args:
+        path(str): Path of the file the spans are appended to.
+        service_name(:obj:`str`, defaults to 'llmbox'): Name of the service the spans are attributed to.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.tracing import OTLPFileExporter, tracer
+
+            tracer.add_exporter(OTLPFileExporter(path='traces.otlp.jsonl', service_name='claude-box'))
+    """
+
+    def __init__(self, path: str, service_name: str = 'llmbox') -> None:
+        super().__init__(path)
+        self._service_name = service_name
+
+    def _lines(self, spans: list[Span]) -> list[str]:
+        return [json.dumps({
+            'resourceSpans': [{
+                'resource': {'attributes': _otlp_attributes({'service.name': self._service_name})},
+                'scopeSpans': [{
+                    'scope': {'name': 'llmbox'},
+                    'spans': [_otlp_span(span) for span in spans]
+                }]
+            }]
+        })]
+
+
+class Tracer:
+    """
+    Class for a tracer recording nested spans of the operations of llmbox and the apps using it.
+
+    Spans are recorded only while an exporter is added, otherwise the tracer hands out a span that records nothing, so
+    instrumented code costs little when tracing is off. Finished spans are exported in batches, when the first span
+    of a trace in the process ends, and when the tracer is flushed or the process exits.
+
+    Args:
+        max_batch(:obj:`int`, defaults to 512): Number of finished spans from which a batch is exported.
+
+    Example:
+
+        .. code-block:: python
+
+            from llmbox.llms import Claude2
+            from llmbox.tracing import JSONLExporter, tracer
+
+            tracer.add_exporter(JSONLExporter(path='traces.jsonl'))
+
+            llm = Claude2()
+            with tracer.span('turn', {'chat.messages': len(chat.messages)}):
+                response = llm.generate(chat=chat)
+    """
+
+    def __init__(self, max_batch: int = 512) -> None:
+        self._max_batch = max_batch
+        self._lock = threading.Lock()
+        self._exporters = []
+        self._finished = []
+        self._enabled = False
+        self._registered = False
+
+    def span(self, name: str, attributes: dict = None) -> Span:
+        """
+        Start a span under the current span, to be used as a context manager making it current until it ends.
+
+        Args:
+            name(str): Name of the operation.
+            attributes(:obj:`dict`, optional): Attributes of the operation.
+
+        Returns:
+            Span: Span of the operation.
+        """
+
+        return self.start_span(name, attributes=attributes)
+
+    def start_span(self, name: str, attributes: dict = None, parent: Span = None) -> Span:
+        """
+        Start a span without making it current, for operations spanning the yields of a generator. The span must be
+        ended with `end`.
+
+        Args:
+            name(str): Name of the operation.
+            attributes(:obj:`dict`, optional): Attributes of the operation.
+            parent(:obj:`Span`, optional): Parent of the span. Defaults to the current span.
+
+        Returns:
+            Span: Span of the operation.
+        """
+
+        if not self._enabled:
+            return _NOOP_SPAN
+
+        parent = parent or _current_span.get()
+        if parent is None or parent is _NOOP_SPAN:
+            return Span(name, trace_id=f'{random.getrandbits(128):032x}', attributes=attributes, tracer=self)
+
+        return Span(name, trace_id=parent.trace_id, parent_id=parent.span_id, attributes=attributes, tracer=self)
+
+    @contextmanager
+    def activate(self, span: Span) -> Iterator[Span]:
+        """
+        Make a span current within the context, without ending it.
+
+        Args:
+            span(Span): Span to make current.
+        """
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+
+    def current_span(self) -> Span:
+        """
+        Get the current span.
+
+        Returns:
+            Span: Current span, or None outside of any span.
+        """
+
+        span = _current_span.get()
+
+        return None if span is _NOOP_SPAN else span
+
+    def add_exporter(self, exporter: BaseSpanExporter) -> None:
+        """
+        Add an exporter the finished spans are exported to, enabling tracing.
+
+        Args:
+            exporter(BaseSpanExporter): Exporter of the spans.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            self._exporters.append(exporter)
+            self._enabled = True
+
+            # Export the spans left when the process exits
+            if not self._registered:
+                atexit.register(self.flush)
+                self._registered = True
+
+    def remove_exporter(self, exporter: BaseSpanExporter) -> None:
+        """
+        Remove an exporter after exporting the finished spans, and release its resources. Tracing is disabled once no
+        exporter is left.
+
+        Args:
+            exporter(BaseSpanExporter): Exporter of the spans.
+
+        Returns:
+            None: None
+        """
+
+        self.flush()
+        with self._lock:
+            self._exporters.remove(exporter)
+            self._enabled = len(self._exporters) > 0
+        exporter.close()
+
+    def flush(self) -> None:
+        """
+        Export the finished spans not yet exported. An exporter failing does not stop the others.
+
+        Returns:
+            None: None
+        """
+
+        with self._lock:
+            spans, self._finished = self._finished, []
+            exporters = list(self._exporters)
+
+        if not spans:
+            return
+
+        for exporter in exporters:
+            try:
+                exporter.export(spans)
+            except Exception:
+                pass
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self._finished.append(span)
+            ready = span.parent_id is None or len(self._finished) >= self._max_batch
+
+        if ready:
+            self.flush()
+
+    @property
+    def enabled(self) -> bool:
+        """bool: Whether spans are recorded."""
+
+        return self._enabled
+
+
+_current_span = ContextVar('llmbox_current_span', default=None)
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_span(span: Span) -> dict:
+    otlp = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': 1,
+        'startTimeUnixNano': str(span.start_time),
+        'endTimeUnixNano': str(span.end_time),
+        'attributes': _otlp_attributes({**span.attributes, 'thread.name': span.thread}),
+        'events': [
+            {'name': name, 'timeUnixNano': str(timestamp), 'attributes': _otlp_attributes(attributes)}
+            for name, timestamp, attributes in span.events
+        ],
+        'status': {'code': 2, 'message': span.error} if span.error is not None else {'code': 1}
+    }
+    if span.parent_id is not None:
+        otlp['parentSpanId'] = span.parent_id
+
+    return otlp
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items()]
+
+
+def _otlp_value(value: object) -> dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+
+    return {'stringValue': str(value)}
+
+
+tracer = Tracer()